@@ -16,6 +16,7 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import urllib
 from maple.core import analyzer
 from maple.core import knob
 
@@ -45,6 +46,31 @@ class Pin(object):
             c.append(str(v))
         return c
 
+def fork_server_cmd(cmd, fd):
+    """ Return the command which runs the pin command cmd as a fork
+    server: the pintool stops before main and reads its requests from
+    fd (see the fork_server knob of the execution controller).
+    """
+    cmd = list(cmd)
+    pos = cmd.index('--')
+    cmd[pos:pos] = ['-fork_server', '1', '-fork_server_fd', str(fd)]
+    return cmd
+
+def knob_overrides(server_cmd, cmd):
+    """ Return the knob=value overrides which turn the pin command of a
+    fork server into cmd, only the values of the knobs may differ. The
+    values are %XX escaped, the requests are split on whitespace.
+    """
+    assert len(cmd) == len(server_cmd)
+    end = server_cmd.index('--')
+    result = []
+    for idx in range(len(cmd)):
+        if cmd[idx] == server_cmd[idx]:
+            continue
+        assert idx < end and server_cmd[idx - 1].startswith('-')
+        result.append('%s=%s' % (server_cmd[idx - 1][1:], urllib.quote(cmd[idx])))
+    return result
+
 class Pintool(knob.KnobUser):
     """ The abstract class for PIN tools.
     """
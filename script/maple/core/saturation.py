@@ -0,0 +1,80 @@
+"""Copyright 2011 The University of Michigan
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Authors - Jie Yu (jieyu@umich.edu)
+"""
+
+import math
+
+class DiscoveryCurve(object):
+    """ The discovery curve of a campaign: the number of new items
+    (iroots, races) found by each run. The expected number of new items
+    from the next run is estimated by fitting a geometric decay
+    new_k = a * r^(k-1) to the curve (Poisson maximum likelihood), the
+    unseen mass after the last run being a * r^n / (1 - r).
+    """
+    def __init__(self):
+        self.total = 0
+        self.new_counts = []
+    def add(self, total):
+        """ Record the total number of items found after a run. """
+        self.new_counts.append(max(total - self.total, 0))
+        self.total = max(total, self.total)
+    def num_runs(self):
+        return len(self.new_counts)
+    def log_likelihood(self, r):
+        # with a at its maximum likelihood for the given r
+        num_found = sum(self.new_counts)
+        weighted = 0.0
+        for (k, count) in enumerate(self.new_counts):
+            weighted += k * count
+        return weighted * math.log(r) - num_found * math.log(self.mass(r))
+    def mass(self, r):
+        return sum([r ** k for k in range(len(self.new_counts))])
+    def fit(self, tolerance=1e-6):
+        """ Return (a, r) of the fitted curve. r is at most 1, in which
+        case the runs are not slowing down at all.
+        """
+        num_found = sum(self.new_counts)
+        if num_found == 0:
+            return (0.0, 0.0)
+        # golden section search, the likelihood is unimodal in r
+        ratio = (math.sqrt(5) - 1) / 2
+        lo = tolerance
+        hi = 1.0
+        while hi - lo > tolerance:
+            r1 = hi - ratio * (hi - lo)
+            r2 = lo + ratio * (hi - lo)
+            if self.log_likelihood(r1) < self.log_likelihood(r2):
+                lo = r1
+            else:
+                hi = r2
+        r = (lo + hi) / 2
+        return (num_found / self.mass(r), r)
+    def expected_new(self):
+        """ Return the expected number of new items from the next run. """
+        if self.num_runs() == 0:
+            return float('inf')
+        (a, r) = self.fit()
+        return a * r ** self.num_runs()
+    def unseen(self):
+        """ Return the expected number of items never found so far. """
+        if self.num_runs() == 0:
+            return float('inf')
+        (a, r) = self.fit()
+        if r >= 1.0 - 1e-3:
+            return float('inf')
+        return a * r ** self.num_runs() / (1 - r)
+    def saturated(self, epsilon, min_runs=2):
+        return self.num_runs() >= min_runs and self.expected_new() < epsilon
@@ -16,6 +16,8 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import mmap
+import array
 from maple.core import logging
 from maple.core import proto
 
@@ -26,7 +28,6 @@ class Image(object):
     def __init__(self, proto, db):
         self.proto = proto
         self.db = db
-        self.offset_map = {}
     def id(self):
         return self.proto.id
     def name(self):
@@ -41,8 +42,6 @@ class Image(object):
             return n1
         else:
             return n2
-    def add_inst(self, inst):
-        self.offset_map[inst.offset()] = inst
     def __str__(self):
         content = []
         content.append('%-2d' % self.id())
@@ -50,9 +49,16 @@ class Image(object):
         return ' '.join(content)
 
 class Inst(object):
-    def __init__(self, proto, db):
-        self.proto = proto
+    """ An inst of the static info database, a view of one row of its
+    inst table.
+    """
+    __slots__ = ('db', 'row')
+    def __init__(self, db, row):
         self.db = db
+        self.row = row
+    @property
+    def proto(self):
+        return self.db.proto.inst[self.row]
     def id(self):
         return self.proto.id
     def image(self):
@@ -78,33 +84,123 @@ class Inst(object):
         return ' '.join(content)
 
 class StaticInfo(object):
+    """ The static info database. The proto is parsed straight from the
+    memory mapped file and only an id to row index of the insts is built
+    on load, Inst objects are created when they are looked up.
+    """
     def __init__(self):
         self.proto = static_info_pb2().StaticInfoProto()
         self.image_map = {}
         self.inst_map = {}
+        self.rows = {}
     def load(self, db_name):
         if not os.path.exists(db_name):
             return
         f = open(db_name, 'rb')
-        self.proto.ParseFromString(f.read())
+        if os.fstat(f.fileno()).st_size > 0:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.proto.ParseFromString(buffer(data))
+            data.close()
         f.close()
         for image_proto in self.proto.image:
             image = Image(image_proto, self)
             self.image_map[image.id()] = image
-        for inst_proto in self.proto.inst:
-            inst = Inst(inst_proto, self)
-            self.inst_map[inst.id()] = inst
-            self.image_map[inst.image().id()].add_inst(inst)
+        inst_ids = array.array('L', [inst_proto.id for inst_proto in self.proto.inst])
+        if len(inst_ids) > 0 and max(inst_ids) < 2 * len(inst_ids):
+            # dense ids (the usual case), index the rows by id
+            self.rows = array.array('l', [-1]) * (max(inst_ids) + 1)
+        for row in xrange(len(inst_ids)):
+            self.rows[inst_ids[row]] = row
     def find_image(self, image_id):
         return self.image_map[image_id]
+    def find_row(self, inst_id):
+        if isinstance(self.rows, dict):
+            return self.rows.get(inst_id, -1)
+        elif inst_id < 0 or inst_id >= len(self.rows):
+            return -1
+        else:
+            return self.rows[inst_id]
     def find_inst(self, inst_id):
+        if not inst_id in self.inst_map:
+            row = self.find_row(inst_id)
+            if row == -1:
+                raise KeyError(inst_id)
+            self.inst_map[inst_id] = Inst(self, row)
         return self.inst_map[inst_id]
     def display_image_table(self, f):
         for image in self.image_map.itervalues():
             f.write(str(image))
             f.write('\n')
     def display_inst_table(self, f):
-        for inst in self.inst_map.itervalues():
-            f.write(str(inst))
+        for inst_proto in self.proto.inst:
+            f.write(str(self.find_inst(inst_proto.id)))
             f.write('\n')
 
+
+class StaticInfoMerger(object):
+    """ Merge static info databases written by independent runs. Images
+    are matched by name and insts by (image name, offset), so the same
+    inst keeps one id. The base database keeps its ids, new entries get
+    ids after the largest one in use.
+    """
+    def __init__(self):
+        self.proto = static_info_pb2().StaticInfoProto()
+        self.image_ids = {}
+        self.inst_ids = {}
+        self.max_image_id = 0
+        self.max_inst_id = 0
+    def load(self, db_name):
+        self.proto = static_info_pb2().StaticInfoProto()
+        if os.path.exists(db_name):
+            f = open(db_name, 'rb')
+            self.proto.ParseFromString(f.read())
+            f.close()
+        names = {}
+        for image_proto in self.proto.image:
+            self.image_ids[image_proto.name] = image_proto.id
+            names[image_proto.id] = image_proto.name
+            self.max_image_id = max(self.max_image_id, image_proto.id)
+        for inst_proto in self.proto.inst:
+            key = (names[inst_proto.image_id], inst_proto.offset)
+            self.inst_ids[key] = inst_proto.id
+            self.max_inst_id = max(self.max_inst_id, inst_proto.id)
+    def merge(self, db_name):
+        """ Merge a database, return the map from its inst ids to the
+        inst ids of the merged database.
+        """
+        other = static_info_pb2().StaticInfoProto()
+        if os.path.exists(db_name):
+            f = open(db_name, 'rb')
+            other.ParseFromString(f.read())
+            f.close()
+        names = {}
+        for image_proto in other.image:
+            names[image_proto.id] = image_proto.name
+            if not image_proto.name in self.image_ids:
+                self.max_image_id += 1
+                new_image = self.proto.image.add()
+                new_image.id = self.max_image_id
+                new_image.name = image_proto.name
+                self.image_ids[image_proto.name] = new_image.id
+        inst_map = {}
+        for inst_proto in other.inst:
+            key = (names[inst_proto.image_id], inst_proto.offset)
+            if not key in self.inst_ids:
+                self.max_inst_id += 1
+                new_inst = self.proto.inst.add()
+                new_inst.CopyFrom(inst_proto)
+                new_inst.id = self.max_inst_id
+                new_inst.image_id = self.image_ids[key[0]]
+                self.inst_ids[key] = new_inst.id
+            inst_map[inst_proto.id] = self.inst_ids[key]
+        return inst_map
+    def save(self, db_name):
+        save_proto(self.proto, db_name)
+
+def save_proto(proto, db_name):
+    # write to a temporary file first, so readers never see half a file
+    tmp_name = '%s.tmp.%d' % (db_name, os.getpid())
+    f = open(tmp_name, 'wb')
+    f.write(proto.SerializeToString())
+    f.close()
+    os.rename(tmp_name, db_name)
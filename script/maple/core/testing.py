@@ -19,12 +19,73 @@ Modified by DKeeper at 2013.12.26
 """
 
 import os
+import sys
 import copy
+import Queue
 import time
+import shutil
+import multiprocessing
+import errno
+import fcntl
+import select
+import signal
 import subprocess
+import threading
 from maple.core import config
+from maple.core import pintool
 from maple.core import util
 
+def tool_paths(tool):
+    paths = set()
+    for k, v in tool.knobs.iteritems():
+        if tool.knob_types[k] == 'string' and tool.knob_metavars[k] == 'PATH':
+            paths.add(os.path.realpath(v))
+    return paths
+
+def setup_worker_dir(test, tool, idx):
+    """ Give the worker idx of a parallel death test its own scratch
+    directory: the files named by the PATH knobs of the tool are copied
+    there and the prefix of the test is changed to use the copies. The
+    worker is also moved to its own cpu if the tool has a cpu knob.
+    """
+    directory = os.path.realpath('worker.%d' % idx)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.mkdir(directory)
+    paths = tool_paths(tool)
+    for path in paths:
+        # along with the journal of the database, if any
+        for name in [path, path + '.journal']:
+            if os.path.isfile(name):
+                shutil.copy(name, directory)
+    prefix = []
+    for arg in test.prefix:
+        if arg in paths:
+            arg = os.path.join(directory, os.path.basename(arg))
+        prefix.append(arg)
+    if '-cpu' in prefix:
+        pos = prefix.index('-cpu') + 1
+        prefix[pos] = str((int(prefix[pos]) + idx) % multiprocessing.cpu_count())
+    test.set_prefix(prefix)
+    test.worker_dir = directory
+
+def worker_path(test, path):
+    return os.path.join(test.worker_dir, os.path.basename(os.path.realpath(path)))
+
+def cleanup_worker_dir(test):
+    shutil.rmtree(test.worker_dir, True)
+
+def run_and_notify(test, idx, finished):
+    """ Run a test in a worker thread, then queue its index along with
+    the exception it raised, if any.
+    """
+    try:
+        test.run()
+    except:
+        finished.put((idx, sys.exc_info()))
+        return
+    finished.put((idx, None))
+
 class TestResult:
     INVALID   = 0
     NORMAL    = 1
@@ -32,6 +93,7 @@ class TestResult:
     HANG      = 3
     MISMATCH  = 4
     NOT_FOUND = 5
+    CANCELLED = 6
 
 class Test(object):
     """ The abstract class for tests.
@@ -44,6 +106,7 @@ class Test(object):
         self.result = TestResult.INVALID
         self.start_time = 0.0
         self.end_time = 0.0
+        self.cancelled = False
     def input(self):
         if self.input_idx == 'default':
             return self.default_input()
@@ -75,6 +138,14 @@ class Test(object):
             return True
         else:
             return False
+    def is_cancelled(self):
+        assert self.done
+        return self.result == TestResult.CANCELLED
+    def cancel(self):
+        """ Ask a running test to stop (from another thread). A test
+        that supports it stops early with the CANCELLED result.
+        """
+        self.cancelled = True
     def setup(self):
         pass
     def tear_down(self):
@@ -89,6 +160,182 @@ class Test(object):
         self.tear_down()
         self.done = True
 
+class ExitMonitor(object):
+    """ Wake up the supervisor of a child process as soon as a child
+    exits. In the main thread, SIGCHLD is turned into a write to a pipe
+    which the supervisor waits on with select(). Signals cannot be
+    handled in other threads, where the supervisor falls back to sleep
+    intervals that grow up to max_delay.
+    """
+    def __init__(self, max_delay=0.05):
+        self.max_delay = max_delay
+        self.delay = 0.001
+        self.fds = None
+        self.old_handler = None
+        self.old_wakeup_fd = -1
+    def start(self):
+        fds = os.pipe()
+        for fd in fds:
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        try:
+            self.old_handler = signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+        except ValueError:
+            # not in the main thread
+            os.close(fds[0])
+            os.close(fds[1])
+            return
+        signal.siginterrupt(signal.SIGCHLD, False)
+        self.old_wakeup_fd = signal.set_wakeup_fd(fds[1])
+        self.fds = fds
+    def stop(self):
+        if self.fds == None:
+            return
+        signal.set_wakeup_fd(self.old_wakeup_fd)
+        signal.signal(signal.SIGCHLD, self.old_handler)
+        os.close(self.fds[0])
+        os.close(self.fds[1])
+        self.fds = None
+    def wait(self, timeout):
+        if timeout <= 0:
+            return
+        if self.fds == None:
+            time.sleep(min(timeout, self.delay))
+            self.delay = min(self.delay * 2, self.max_delay)
+            return
+        try:
+            select.select([self.fds[0]], [], [], timeout)
+        except select.error, e:
+            if e.args[0] != errno.EINTR:
+                raise
+        try:
+            while os.read(self.fds[0], 512):
+                pass
+        except OSError, e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+class ForkServer(object):
+    """ Run the iterations of a cmdline test as processes forked by one
+    instrumented process (see the fork_server knob of the pintools).
+    The server runs the command of the first test, initializes once and
+    stops before main. For each test, the knobs in which its command
+    differs from the command of the server are passed to the forked
+    process. The stdio files are the ones of the first test.
+    """
+    def __init__(self, fd=198):
+        self.fd = fd
+        self.cmd = None
+        self.proc = None
+        self.ctl_fd = None
+        self.status_fd = None
+        self.buf = ''
+    def alive(self):
+        return self.proc != None
+    def start(self, test):
+        self.cmd = test.cmd()
+        assert '--' in self.cmd
+        cmd = pintool.fork_server_cmd(self.cmd, self.fd)
+        ctl_fds = os.pipe()
+        status_fds = os.pipe()
+        def setup_fds():
+            os.dup2(ctl_fds[0], self.fd)
+            os.dup2(status_fds[1], self.fd + 1)
+        test.open_stdio()
+        self.proc = subprocess.Popen(cmd,
+                                     stdin=test.fio[0],
+                                     stdout=test.fio[1],
+                                     stderr=test.fio[2],
+                                     preexec_fn=setup_fds)
+        test.close_stdio()
+        os.close(ctl_fds[0])
+        os.close(status_fds[1])
+        self.ctl_fd = ctl_fds[1]
+        self.status_fd = status_fds[0]
+        self.buf = ''
+        self.expect('ready')
+    def stop(self):
+        if self.proc == None:
+            return
+        try:
+            os.write(self.ctl_fd, 'quit\n')
+        except OSError:
+            pass
+        os.close(self.ctl_fd)
+        os.close(self.status_fd)
+        self.proc.wait()
+        self.proc = None
+    def fork(self, test):
+        request = ' '.join(['run'] + pintool.knob_overrides(self.cmd, test.cmd()))
+        os.write(self.ctl_fd, request + '\n')
+        pid = int(self.expect('pid') or -1)
+        proc = ForkedProcess(self, pid)
+        if pid < 0:
+            # no status follows if the server could not fork
+            proc.update('')
+        return proc
+    def readline(self, timeout=None):
+        while not '\n' in self.buf:
+            if timeout != None:
+                try:
+                    ready = select.select([self.status_fd], [], [], timeout)[0]
+                except select.error, e:
+                    if e.args[0] != errno.EINTR:
+                        raise
+                    ready = []
+                if len(ready) == 0:
+                    return None
+            data = os.read(self.status_fd, 512)
+            if not data:
+                # the server is gone
+                self.stop()
+                return ''
+            self.buf += data
+        (line, self.buf) = self.buf.split('\n', 1)
+        return line
+    def expect(self, name, timeout=None):
+        line = self.readline(timeout)
+        if not line:
+            return line
+        (key, value) = line.split(' ', 1)
+        assert key == name
+        return value
+    def wait(self, timeout):
+        # the monitor interface used by CmdlineTest.supervise
+        if timeout > 0 and self.alive() and not '\n' in self.buf:
+            try:
+                select.select([self.status_fd], [], [], timeout)
+            except select.error, e:
+                if e.args[0] != errno.EINTR:
+                    raise
+
+class ForkedProcess(object):
+    """ A process forked by a fork server, polled like a Popen object.
+    """
+    def __init__(self, server, pid):
+        self.server = server
+        self.pid = pid
+        self.returncode = None
+    def update(self, status):
+        if status == '':
+            self.returncode = -signal.SIGKILL
+            return
+        status = int(status)
+        if os.WIFSIGNALED(status):
+            self.returncode = -os.WTERMSIG(status)
+        else:
+            self.returncode = os.WEXITSTATUS(status)
+    def poll(self):
+        if self.returncode == None:
+            status = self.server.expect('status', 0)
+            if status != None:
+                self.update(status)
+        return self.returncode
+    def wait(self):
+        if self.returncode == None:
+            self.update(self.server.expect('status'))
+        return self.returncode
+
 class CmdlineTest(Test):
     """ Represents cmdline tests. The input format is a tuple (A, I)
     in which A is a list of arguments and I is a tuple of standard
@@ -97,6 +344,9 @@ class CmdlineTest(Test):
     def __init__(self, input_idx):
         Test.__init__(self, input_idx)
         self.fio = [None, None, None]
+        self.deadline = None        # seconds after which a run is a hang
+        self.check_interval = 0.1   # seconds between check_hang/check_online
+        self.fork_server = None
     def cmd(self):
         c = []
         if self.prefix != None:
@@ -106,18 +356,31 @@ class CmdlineTest(Test):
     def sio(self):
         return self.input()[1]
     def body(self):
+        if self.fork_server != None:
+            proc = self.fork_server.fork(self)
+            self.supervise(proc, self.fork_server)
+            proc.wait()
+            return
         self.open_stdio()
-        proc = subprocess.Popen(self.cmd(),
-                                stdin=self.fio[0],
-                                stdout=self.fio[1],
-                                stderr=self.fio[2])
-        x = 0
+        monitor = ExitMonitor()
+        monitor.start()
+        try:
+            proc = subprocess.Popen(self.cmd(),
+                                    stdin=self.fio[0],
+                                    stdout=self.fio[1],
+                                    stderr=self.fio[2])
+            self.supervise(proc, monitor)
+        finally:
+            monitor.stop()
+        self.close_stdio()
+    def supervise(self, proc, monitor):
+        deadline = None
+        if self.deadline != None:
+            deadline = self.start_time + float(self.deadline)
+        next_check = time.time() + self.check_interval
         while True:
-            time.sleep(0.1)
-            x += 1
             retcode = proc.poll()
             if retcode != None:
-                proc.wait()
                 if retcode < 0:
                     self.result = TestResult.CRASH
                 else:
@@ -126,16 +389,29 @@ class CmdlineTest(Test):
                     else:
                         self.result = TestResult.NORMAL
                 break
-            if self.check_hang():
-            #if x >= 100:
-                self.result = TestResult.HANG
+            if self.cancelled:
+                self.result = TestResult.CANCELLED
                 util.kill_process(proc.pid)
                 break
-            if self.check_online():
-                self.result = TestResult.MISMATCH
+            now = time.time()
+            if deadline != None and now >= deadline:
+                self.result = TestResult.HANG
                 util.kill_process(proc.pid)
                 break
-        self.close_stdio()
+            if now >= next_check:
+                next_check = now + self.check_interval
+                if self.check_hang():
+                    self.result = TestResult.HANG
+                    util.kill_process(proc.pid)
+                    break
+                if self.check_online():
+                    self.result = TestResult.MISMATCH
+                    util.kill_process(proc.pid)
+                    break
+            timeout = next_check - now
+            if deadline != None:
+                timeout = min(timeout, deadline - now)
+            monitor.wait(timeout)
     def check_hang(self):
         return False
     def check_online(self):
@@ -245,6 +521,8 @@ class DeathTestCase(TestCase):
         self.threshold = threshold
         self.test_history = []
         self.result = None
+        self.workers = 1
+        self.fork_server = False
     def used_runs(self):
         assert self.done
         return len(self.test_history)
@@ -255,6 +533,12 @@ class DeathTestCase(TestCase):
         else:
             return False
     def body(self):
+        if self.workers > 1:
+            self.parallel_body()
+            return
+        if self.fork_server:
+            self.fork_body()
+            return
         self.before_all_tests()
         while True:
             test = copy.deepcopy(self.test)
@@ -269,6 +553,96 @@ class DeathTestCase(TestCase):
                 self.result = 'NORMAL'
                 break
         self.after_all_tests()
+    def parallel_body(self):
+        """ Run the iterations in waves of up to self.workers tests at
+        once. prepare_worker sets up each test of a wave before it runs.
+        As soon as a test of a wave is fatal, the other tests of the wave
+        still running are cancelled. Then the tests are merged and handed
+        to the per-iteration hooks one by one, in order, as if they had
+        run one after another: before_each_test and after_each_test are
+        called around merge_worker, with the test added to the history.
+        The cancelled tests and the tests after the one that stops the
+        death test are discarded, and no hook is called for them.
+        """
+        self.before_all_tests()
+        while self.result == None:
+            wave = []
+            for idx in range(self.wave_size()):
+                test = copy.deepcopy(self.test)
+                self.prepare_worker(test, idx)
+                wave.append(test)
+            finished = Queue.Queue()
+            threads = []
+            for idx, test in enumerate(wave):
+                thread = threading.Thread(target=run_and_notify, args=(test, idx, finished))
+                thread.start()
+                threads.append(thread)
+            error = None
+            for k in range(len(wave)):
+                (idx, exc_info) = finished.get()
+                test = wave[idx]
+                if exc_info != None:
+                    if error == None:
+                        error = exc_info
+                    for other in wave:
+                        other.cancel()
+                elif test.is_fatal() and not test.is_cancelled():
+                    for other in wave:
+                        other.cancel()
+            for thread in threads:
+                thread.join()
+            if error != None:
+                # a test did not finish, give up the wave and re-raise
+                for idx, test in enumerate(wave):
+                    self.discard_worker(test, idx)
+                raise error[0], error[1], error[2]
+            for idx, test in enumerate(wave):
+                if self.result != None or test.is_cancelled():
+                    self.discard_worker(test, idx)
+                    continue
+                self.test_history.append(test)
+                self.before_each_test()
+                self.merge_worker(test, idx)
+                self.after_each_test()
+                if test.is_fatal():
+                    self.result = 'FATAL'
+                elif self.threshold_check():
+                    self.result = 'NORMAL'
+        self.after_all_tests()
+    def fork_body(self):
+        """ Run the iterations as processes forked by a fork server, so
+        that the program is instrumented only once. The test of each
+        iteration is set up by prepare_worker and merged by merge_worker
+        as in parallel_body. The databases loaded by the server are the
+        ones when it started, so the outputs must be merged.
+        """
+        self.before_all_tests()
+        server = ForkServer()
+        try:
+            while self.result == None:
+                if not server.alive():
+                    self.prepare_fork_server()
+                    server.start(self.test)
+                test = copy.deepcopy(self.test)
+                test.fork_server = server
+                self.prepare_worker(test, 0)
+                self.before_each_test()
+                test.run()
+                self.merge_worker(test, 0)
+                self.test_history.append(test)
+                self.after_each_test()
+                if test.is_fatal():
+                    self.result = 'FATAL'
+                elif self.threshold_check():
+                    self.result = 'NORMAL'
+        finally:
+            server.stop()
+        self.after_all_tests()
+    def wave_size(self):
+        size = self.workers
+        if self.mode == 'runout':
+            size = min(size, int(self.threshold) - len(self.test_history))
+        return max(size, 1)
     def threshold_check(self):
         if self.mode == 'runout':
             if len(self.test_history) >= int(self.threshold):
@@ -285,4 +659,12 @@ class DeathTestCase(TestCase):
         pass
     def after_all_tests(self):
         pass
+    def prepare_fork_server(self):
+        pass
+    def prepare_worker(self, test, idx):
+        pass
+    def merge_worker(self, test, idx):
+        pass
+    def discard_worker(self, test, idx):
+        pass
 
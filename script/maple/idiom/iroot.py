@@ -16,6 +16,7 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import zlib
 from maple.core import logging
 from maple.core import proto
 
@@ -101,12 +102,18 @@ class iRootDB(object):
         self.proto = iroot_pb2().iRootDBProto()
         self.event_map = {}
         self.iroot_map = {}
+        # the size and checksum of the loaded file, which tell its versions apart
+        self.db_size = 0
+        self.db_crc = 0
     def load(self, db_name):
         if not os.path.exists(db_name):
             return
         f = open(db_name, 'rb')
-        self.proto.ParseFromString(f.read())
+        data = f.read()
         f.close()
+        self.proto.ParseFromString(data)
+        self.db_size = len(data)
+        self.db_crc = zlib.crc32(data) & 0xffffffff
         for event_proto in self.proto.event:
             event = iRootEvent(event_proto, self)
             self.event_map[event.id()] = event
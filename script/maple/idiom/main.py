@@ -23,8 +23,12 @@ import shutil
 ##==============================================================
 import os
 import sys
+import glob
+import itertools
 import subprocess
 import optparse
+import multiprocessing
+import traceback
 from maple.core import config
 from maple.core import logging
 from maple.core import pintool
@@ -34,10 +38,14 @@ from maple.pct import history as pct_history
 from maple.race import pintool as race_pintool
 from maple.idiom import iroot
 from maple.idiom import memo
+from maple.idiom import merge
 from maple.idiom import history as idiom_history
 from maple.idiom import pintool as idiom_pintool
 from maple.idiom import offline_tool as idiom_offline_tool
 from maple.idiom import testing as idiom_testing
+from maple.idiom import session
+from maple.idiom import store
+from maple.idiom import selection
 
 # global variables
 _separator = '---'
@@ -122,6 +130,21 @@ def __display_pct_history_summary(output, options):
     history.load(options.pct_history)
     history.display_summary(output)
 
+def __display_pct_estimate(output, options):
+    history = pct_history.History()
+    history.load(options.pct_history)
+    history.display_estimate(output, options.depth, options.confidence, options.run_time)
+
+def __display_pct_hit_rate(output, options):
+    history = pct_history.History()
+    history.load(options.pct_history)
+    history.display_hit_rate(output)
+
+def __display_rand_hit_rate(output, options):
+    history = pct_history.History(pct_history.rand_history_pb2)
+    history.load(options.rand_history)
+    history.display_hit_rate(output)
+
 def valid_display_set():
     result = set()
     for name in dir(sys.modules[__name__]):
@@ -221,6 +244,38 @@ def register_display_options(parser):
             default='pct.histo',
             metavar='PATH',
             help='the PCT history path')
+    parser.add_option(
+            '--rand_history',
+            action='store',
+            type='string',
+            dest='rand_history',
+            default='rand.histo',
+            metavar='PATH',
+            help='the random scheduler history path')
+    parser.add_option(
+            '--depth',
+            action='store',
+            type='int',
+            dest='depth',
+            default=3,
+            metavar='DEPTH',
+            help='the target bug depth of the PCT estimate')
+    parser.add_option(
+            '--confidence',
+            action='store',
+            type='float',
+            dest='confidence',
+            default=0.95,
+            metavar='C',
+            help='the probability with which the PCT estimate should expose a bug')
+    parser.add_option(
+            '--run_time',
+            action='store',
+            type='float',
+            dest='run_time',
+            default=None,
+            metavar='SECONDS',
+            help='the average time of a run, to estimate the remaining time')
 
 def __command_display(argv):
     parser = optparse.OptionParser(display_usage())
@@ -303,6 +358,30 @@ def __modify_memo_merge(options):
     memo_db.save(options.memo_out)
     logging.msg('memo merge done!\n')
 
+def find_merge_inputs(options):
+    """ Return the (sinfo, iroot, memo) database names of the run
+    directories (or memoization databases) matched by --merge_in.
+    """
+    inputs = set()
+    for pattern in options.merge_in:
+        for path in glob.glob(pattern):
+            if os.path.isdir(path):
+                directory = path
+            else:
+                directory = os.path.dirname(path)
+            inputs.add(tuple([os.path.join(directory, os.path.basename(name))
+                              for name in [options.sinfo_in, options.iroot_in, options.memo_in]]))
+    return sorted(inputs)
+
+def __modify_memo_merge_all(options):
+    inputs = find_merge_inputs(options)
+    if len(inputs) == 0:
+        return
+    merger = merge.TreeMerger(options.merge_workers)
+    maps = merger.merge(inputs, (options.sinfo_out, options.iroot_out, options.memo_out))
+    merge.save_remap(inputs, maps, options.remap_out)
+    logging.msg('memo merge all done! (%d databases)\n' % len(inputs))
+
 def __modify_memo_apply(options):
     if not os.path.exists(options.memo_in):
         return
@@ -396,6 +475,30 @@ def register_modify_options(parser):
             default='memo_merge.db',
             metavar='PATH',
             help='the to-merge memoization database path')
+    parser.add_option(
+            '--merge_in',
+            action='append',
+            type='string',
+            dest='merge_in',
+            default=[],
+            metavar='PATTERN',
+            help='the run directories (or memoization databases) to merge, as a glob (memo_merge_all)')
+    parser.add_option(
+            '--merge_workers',
+            action='store',
+            type='int',
+            dest='merge_workers',
+            default=multiprocessing.cpu_count(),
+            metavar='N',
+            help='the number of merges to run at once (memo_merge_all)')
+    parser.add_option(
+            '--remap_out',
+            action='store',
+            type='string',
+            dest='remap_out',
+            default='iroot_remap.txt',
+            metavar='PATH',
+            help='the output iroot id map of the merged runs (memo_merge_all)')
     parser.add_option(
             '--no_memo_failed',
             action='store_false',
@@ -429,6 +532,28 @@ def register_profile_cmdline_options(parser, prefix=''):
             default=1,
             metavar='N',
             help='the threshold (depends on mode)')
+    parser.add_option(
+            '--%sepsilon' % prefix,
+            action='store',
+            type='float',
+            dest='%sepsilon' % prefix,
+            default=None,
+            metavar='E',
+            help='in stable mode, stop once the expected number of new iroots from another run is below E (threshold is then the least number of runs)')
+    parser.add_option(
+            '--%sworkers' % prefix,
+            action='store',
+            type='int',
+            dest='%sworkers' % prefix,
+            default=1,
+            metavar='N',
+            help='the number of iterations to run in parallel')
+    parser.add_option(
+            '--%sfork_server' % prefix,
+            action='store_true',
+            dest='%sfork_server' % prefix,
+            default=False,
+            help='whether fork the iterations from one instrumented process, needs pintools built with -D_USING_FORK_SERVER [default: False]')
 
 def __command_profile(argv):
     pin = pintool.Pin(config.pin_home())
@@ -453,6 +578,9 @@ def __command_profile(argv):
                                              options.mode,
                                              options.threshold,
                                              profiler)
+    testcase.epsilon = options.epsilon
+    testcase.workers = options.workers
+    testcase.fork_server = options.fork_server
     testcase.run()
 
 def register_active_cmdline_options(parser, prefix=''):
@@ -513,6 +641,20 @@ def register_random_cmdline_options(parser, prefix=''):
             default=1,
             metavar='N',
             help='the threshold (depends on mode)')
+    parser.add_option(
+            '--%sworkers' % prefix,
+            action='store',
+            type='int',
+            dest='%sworkers' % prefix,
+            default=1,
+            metavar='N',
+            help='the number of iterations to run in parallel')
+    parser.add_option(
+            '--%sfork_server' % prefix,
+            action='store_true',
+            dest='%sfork_server' % prefix,
+            default=False,
+            help='whether fork the iterations from one instrumented process, needs pintools built with -D_USING_FORK_SERVER [default: False]')
 
 def __command_native(argv):
     # parse cmdline options
@@ -529,6 +671,7 @@ def __command_native(argv):
     testcase = idiom_testing.NativeTestCase(test,
                                             options.mode,
                                             options.threshold)
+    testcase.workers = options.workers
     testcase.run()
 
 def __command_pinbase(argv):
@@ -548,6 +691,7 @@ def __command_pinbase(argv):
     testcase = idiom_testing.NativeTestCase(test,
                                             options.mode,
                                             options.threshold)
+    testcase.workers = options.workers
     testcase.run()
 
 def __command_pct(argv):
@@ -572,6 +716,8 @@ def __command_pct(argv):
                                             options.mode,
                                             options.threshold,
                                             profiler)
+    testcase.workers = options.workers
+    testcase.fork_server = options.fork_server
     testcase.run()
 
 def __command_pct_large(argv):
@@ -595,6 +741,8 @@ def __command_pct_large(argv):
                                             options.mode,
                                             options.threshold,
                                             profiler)
+    testcase.workers = options.workers
+    testcase.fork_server = options.fork_server
     testcase.run()
 
 def __command_rand_delay(argv):
@@ -619,6 +767,8 @@ def __command_rand_delay(argv):
                                             options.mode,
                                             options.threshold,
                                             profiler)
+    testcase.workers = options.workers
+    testcase.fork_server = options.fork_server
     testcase.run()
 
 def register_chess_cmdline_options(parser, prefix=''):
@@ -681,6 +831,14 @@ def register_race_cmdline_options(parser, prefix=''):
             default=1,
             metavar='N',
             help='the threshold (depends on mode)')
+    parser.add_option(
+            '--%sepsilon' % prefix,
+            action='store',
+            type='float',
+            dest='%sepsilon' % prefix,
+            default=None,
+            metavar='E',
+            help='in stable mode, stop once the expected number of new races from another run is below E (threshold is then the least number of runs)')
 
 def __command_chess_race(argv):
     pin = pintool.Pin(config.pin_home())
@@ -717,6 +875,7 @@ def __command_chess_race(argv):
                                                options.race_mode,
                                                options.race_threshold,
                                                profiler)
+    race_testcase.epsilon = options.race_epsilon
     # create chess testcase
     chess_test = testing.InteractiveTest(prog_argv)
     chess_test.set_prefix(get_prefix(pin, controller))
@@ -761,6 +920,7 @@ def __command_default(argv):
                                                      options.profile_mode,
                                                      options.profile_threshold,
                                                      profiler)
+    profile_testcase.epsilon = options.profile_epsilon
     # create active testcase
     active_test = testing.InteractiveTest(prog_argv)
     active_test.set_prefix(get_prefix(pin, scheduler))
@@ -825,6 +985,7 @@ def __command_profile_script(argv):
                                              options.mode,
                                              options.threshold,
                                              profiler) 
+    testcase.epsilon = options.epsilon
     testcase.run()
 
 def __command_active_script(argv):
@@ -1105,6 +1266,7 @@ def __command_chess_race_script(argv):
                                                options.race_mode,
                                                options.race_threshold,
                                                profiler)
+    race_testcase.epsilon = options.race_epsilon
     # create chess testcase
     chess_test = bench.get_test(input_idx)
     chess_test.set_prefix(get_prefix(pin, controller))
@@ -1160,6 +1322,7 @@ def __command_default_script(argv):
                                                      options.profile_mode,
                                                      options.profile_threshold,
                                                      profiler)
+    profile_testcase.epsilon = options.profile_epsilon
     # create active testcase
     active_test = bench.get_test(input_idx)
     active_test.set_prefix(get_prefix(pin, scheduler))
@@ -1181,6 +1344,100 @@ def __command_memo_tool(argv):
     memo_tool.set_cmdline_options(options, args)
     memo_tool.call()
 
+def sweep_settings(predictor, sweep):
+    """ Expand the --sweep options (KNOB=V1,V2,...) into the list of
+    knob settings to run, one dict per combination of values.
+    """
+    names = []
+    values = []
+    for spec in sweep:
+        (name, vals) = spec.split('=', 1)
+        if not name in predictor.knobs:
+            logging.err('unknown predictor knob "%s"\n' % name)
+        converted = []
+        for v in vals.split(','):
+            if predictor.knob_types[name] == 'bool':
+                converted.append(v in ['1', 'true', 'True'])
+            elif predictor.knob_types[name] == 'int':
+                converted.append(int(v))
+            else:
+                converted.append(v)
+        names.append(name)
+        values.append(converted)
+    settings = []
+    for combination in itertools.product(*values):
+        settings.append(dict(zip(names, combination)))
+    return settings
+
+def setting_name(setting):
+    content = []
+    for name in sorted(setting.keys()):
+        v = setting[name]
+        if isinstance(v, bool):
+            v = int(v)
+        content.append('%s=%s' % (name, v))
+    return ','.join(content)
+
+def __command_predict(argv):
+    usage = 'usage: <script> predict [options]'
+    parser = optparse.OptionParser(usage)
+    predictor = idiom_offline_tool.OfflinePredictor()
+    predictor.register_cmdline_options(parser)
+    parser.add_option(
+            '--sweep',
+            action='append',
+            dest='sweep',
+            default=[],
+            metavar='KNOB=V1,V2,...',
+            help='the predictor knob values to sweep, each combination is '
+                 'predicted into its own directory under --sweep_dir '
+                 '(can be given multiple times)')
+    parser.add_option(
+            '--sweep_dir',
+            action='store',
+            type='string',
+            dest='sweep_dir',
+            default='sweep',
+            metavar='PATH',
+            help='the directory holding the sweep results [default: sweep]')
+    parser.add_option(
+            '--sweep_workers',
+            action='store',
+            type='int',
+            dest='sweep_workers',
+            default=multiprocessing.cpu_count(),
+            metavar='N',
+            help='the number of concurrent predictor runs in a sweep [default: %default]')
+    (options, args) = parser.parse_args(argv)
+    predictor.set_cmdline_options(options, args)
+    if len(options.sweep) == 0:
+        predictor.call()
+        return
+    # every setting gets a complete run directory, so that the results
+    # can be compared, or merged with "modify memo_merge_all"
+    cmds = []
+    out_dirs = []
+    for setting in sweep_settings(predictor, options.sweep):
+        out_dir = os.path.join(options.sweep_dir, setting_name(setting))
+        if not os.path.exists(out_dir):
+            os.makedirs(out_dir)
+        predictor.knobs.update(setting)
+        for name in ['sinfo_out', 'iroot_out', 'memo_out']:
+            predictor.knobs[name] = os.path.join(out_dir, os.path.basename(predictor.knob_defaults[name]))
+        cmds.append(predictor.cmd())
+        out_dirs.append(out_dir)
+    pool = multiprocessing.Pool(max(1, min(options.sweep_workers, len(cmds))))
+    results = pool.map(subprocess.call, cmds)
+    pool.close()
+    pool.join()
+    failed = []
+    for (out_dir, retcode) in zip(out_dirs, results):
+        if retcode != 0:
+            failed.append('%s (%d)' % (out_dir, retcode))
+    if len(failed) != 0:
+        logging.err('predictor runs failed: %s\n' % ', '.join(failed))
+    logging.msg('predict sweep done! (%d settings)\n' % len(cmds))
+
 def valid_command_set():
     result = set()
     for name in dir(sys.modules[__name__]):
@@ -1213,6 +1470,12 @@ IS_FATAL = False
 _MIN_NUM = 99
 _CHOSEN_SET = set()
 
+_session = session.Session()    # databases loaded by the campaign drivers
+_store = store.iRootStore()     # global iroot ids shared by the campaign inputs
+_selection_mode = 'greedy'       # 'greedy' or 'exact' cover of the candidate iroots
+_selection_time_limit = 10.0     # seconds the 'exact' mode may search
+_selector = selection.Selector(_selection_mode, _selection_time_limit)
+
 
 _wrong_edge = 89
 _num_of_candidate_testcase = 4
@@ -1221,8 +1484,93 @@ _rand_lower = -99
 _is_remove = True
 _is_update_memo = True
 _is_fatal = False
+_num_profile_workers = multiprocessing.cpu_count()   # inputs profiled at once
+_profile_cpus = None
 
 
+def cpu_option(argv):
+    """ Return the cpu given by the --cpu option in argv, 0 if none. """
+    (opt_argv, prog_argv) = separate_opt_prog(argv)
+    cpu = 0
+    for idx in range(len(opt_argv)):
+        if opt_argv[idx].startswith('--cpu='):
+            cpu = int(opt_argv[idx][len('--cpu='):])
+        elif opt_argv[idx] == '--cpu' and idx + 1 < len(opt_argv):
+            cpu = int(opt_argv[idx + 1])
+    return cpu
+
+def set_cpu_option(argv, cpu):
+    (opt_argv, prog_argv) = separate_opt_prog(argv)
+    return opt_argv + ['--cpu=%d' % cpu, _separator] + prog_argv
+
+def profile_worker_init(cpu_queue):
+    global _profile_cpus
+    _profile_cpus = cpu_queue
+
+def profile_testcase(argv, test_case, directory):
+    """ Profile a test case in its directory. Return an error message,
+    None if the profile succeeded. No exception leaves this function, and
+    the current directory is restored.
+    """
+    cwd = os.getcwd()
+    try:
+        os.chdir(directory)
+        __command_my_profile(argv + test_case)
+        return None
+    except SystemExit, e:
+        return 'exited with status %s' % e.code
+    except Exception:
+        return traceback.format_exc()
+    finally:
+        os.chdir(cwd)
+
+def profile_worker(job):
+    """ Profile a job on a free cpu. Return the job and an error message,
+    None if the profile succeeded. The pool does not survive a worker
+    that raises SystemExit, so no exception may leave this function.
+    """
+    (argv, test_case, directory) = job
+    cpu = _profile_cpus.get()
+    try:
+        return (job, profile_testcase(set_cpu_option(argv, cpu), test_case, directory))
+    finally:
+        _profile_cpus.put(cpu)
+
+def profile_testcases(argv, jobs):
+    """ Profile each (test_case, directory) job in its directory. Up to
+    _num_profile_workers jobs run at once, each on its own cpu, counted
+    from the cpu given by --cpu. Jobs are yielded as soon as their
+    profile is finished, the jobs whose profile failed are reported and
+    skipped.
+    """
+    num_workers = min(_num_profile_workers, len(jobs))
+    if num_workers <= 1:
+        for (test_case, directory) in jobs:
+            error = profile_testcase(argv, test_case, directory)
+            if error != None:
+                logging.msg('profile of %s failed: %s\n' % (directory, error))
+                continue
+            yield (test_case, directory)
+        return
+    cpu_queue = multiprocessing.Queue()
+    base_cpu = cpu_option(argv)
+    for idx in range(num_workers):
+        cpu_queue.put((base_cpu + idx) % multiprocessing.cpu_count())
+    pool = multiprocessing.Pool(num_workers, profile_worker_init, (cpu_queue,))
+    try:
+        work = [(argv, test_case, os.path.abspath(directory)) for (test_case, directory) in jobs]
+        for ((argv, test_case, directory), error) in pool.imap_unordered(profile_worker, work):
+            if error != None:
+                logging.msg('profile of %s failed: %s\n' % (os.path.relpath(directory), error))
+                continue
+            yield (test_case, os.path.relpath(directory))
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
 def __command_my_profile(argv):
     pin = pintool.Pin(config.pin_home())
     profiler = idiom_pintool.PctProfiler()
@@ -1252,6 +1600,7 @@ def __command_my_profile(argv):
                                              options.mode,
                                              options.threshold,
                                              profiler)
+    testcase.epsilon = options.epsilon
     testcase.run()
     
 def __command_my_active(argv):
@@ -1292,17 +1641,17 @@ def __command_my_test(argv):
         logging.err("testcase file not exists!!\n")
         
     all_candidate_set = set()            # memo.myCandidate; testcase with its candidate iroots
-    all_exposed_set = set()              # memo.myIRoot; all exposed iroots  (from memo.myMemo.exposed_set)
-    all_failed_set = set()               # memo.myIRoot; all failed iroots  (from memo.myMemo.failed_set)
-    all_predicted_set = set()            # memo.myIRoot; all predicted iroots  (from memo.myMemo.predicted_set)
-    all_shadow_exposed_set = set()       # memo.myIRoot; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
+    all_exposed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all exposed iroots  (from memo.myMemo.exposed_set)
+    all_failed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all failed iroots  (from memo.myMemo.failed_set)
+    all_predicted_set = set()            # global iroot ids from iRootStore; all predicted iroots  (from memo.myMemo.predicted_set)
+    all_shadow_exposed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
+    coverage = selection.CoverageMatrix()  # candidate iroots of each input against the sets above
 
     f = open("testcase2.txt")
     
     ### profile
+    jobs = list()
     while 1:
-        print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
-        ### get a testcase and do profile
         line = f.readline()
         if not line:
             break
@@ -1314,16 +1663,14 @@ def __command_my_test(argv):
             logging.err("%s already existed!!!\n" % directory)
             return
         os.mkdir(directory)
+        jobs.append((test_case, directory))
+    f.close()
+    for (test_case, directory) in profile_testcases(argv, jobs):
+        print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
         os.chdir(directory)
-        eval('__command_my_profile(argv + test_case)')
         ### update all_candidate_set, and all memo set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_exposed_set):
                 all_exposed_set.add(my_iroot)
@@ -1341,17 +1688,16 @@ def __command_my_test(argv):
         print "predicted_set length      = %d" % len(all_predicted_set)
         if len(all_shadow_exposed_set) != 0:
             print "shadow_exposed_set length = %d" % len(all_shadow_exposed_set)
-        my_candidate = memo.myCandidate(memo_db, test_case)
+        my_candidate = memo.myCandidate(memo_db, test_case, _store)
         #print "this_candidate_map length = %d" % len(my_candidate.candidate_map)
         all_candidate_set.add(my_candidate)
         os.chdir("..")
-    f.close()
     
     ### active
     while len(all_candidate_set) != 0:
         print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
         ### choose a testcase
-        (best_testcase, max_count, id_set) = get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set)
+        (best_testcase, max_count, id_set) = get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set, coverage)
         print "best testcase is %s : count = %d" % (best_testcase, max_count)
         if max_count == 0:
             for aset in all_candidate_set:
@@ -1368,13 +1714,8 @@ def __command_my_test(argv):
         eval('__command_my_active(argv + best_testcase)')
         update_memo_mark_unexposed_failed()
         ### update all_exposed_set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_exposed_set):
                 all_exposed_set.add(my_iroot)
@@ -1424,10 +1765,11 @@ def __command_my_test_gen(argv):
     start_time = time.time()
     
     all_candidate_set = set()            # memo.myCandidate; testcase with its candidate iroots
-    all_exposed_set = set()              # memo.myIRoot; all exposed iroots  (from memo.myMemo.exposed_set)
-    all_failed_set = set()               # memo.myIRoot; all failed iroots  (from memo.myMemo.failed_set)
-    all_predicted_set = set()            # memo.myIRoot; all predicted iroots  (from memo.myMemo.predicted_set)
-    all_shadow_exposed_set = set()       # memo.myIRoot; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
+    all_exposed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all exposed iroots  (from memo.myMemo.exposed_set)
+    all_failed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all failed iroots  (from memo.myMemo.failed_set)
+    all_predicted_set = set()            # global iroot ids from iRootStore; all predicted iroots  (from memo.myMemo.predicted_set)
+    all_shadow_exposed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
+    coverage = selection.CoverageMatrix()  # candidate iroots of each input against the sets above
     
     testcase_list = list()               # readline.split(); all testcase
     chosen_list = list()                 # readline.split(); chosen testcase
@@ -1441,9 +1783,8 @@ def __command_my_test_gen(argv):
     f = open("testcase.txt")
     
     ### profile
+    jobs = list()
     while 1:
-        print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
-        ### get a testcase and do profile
         line = f.readline()
         if not line:
             break
@@ -1455,16 +1796,14 @@ def __command_my_test_gen(argv):
             logging.err("%s already existed!!!\n" % directory)
             return
         os.mkdir(directory)
+        jobs.append((test_case, directory))
+    f.close()
+    for (test_case, directory) in profile_testcases(argv, jobs):
+        print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
         os.chdir(directory)
-        eval('__command_my_profile(argv + test_case)')
         ### update all_candidate_set, testcase_list, and all memo set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_exposed_set):
                 all_exposed_set.add(my_iroot)
@@ -1482,10 +1821,9 @@ def __command_my_test_gen(argv):
         print "predicted_set length      = %d" % len(all_predicted_set)
         if len(all_shadow_exposed_set) != 0:
             print "shadow_exposed_set length = %d" % len(all_shadow_exposed_set)
-        my_candidate = memo.myCandidate(memo_db, test_case)
+        my_candidate = memo.myCandidate(memo_db, test_case, _store)
         all_candidate_set.add(my_candidate)
         os.chdir("..")
-    f.close()
     
     count = 0
     pre_predicted_num = 0
@@ -1494,7 +1832,7 @@ def __command_my_test_gen(argv):
     while len(all_candidate_set) != 0:
         print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
         ### choose a testcase
-        (best_testcase, max_count, id_set) = get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set)
+        (best_testcase, max_count, id_set) = get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set, coverage)
         print "best testcase is %s : count = %d" % (best_testcase, max_count)
         if max_count == 0:
             for aset in all_candidate_set:
@@ -1512,13 +1850,8 @@ def __command_my_test_gen(argv):
         eval('__command_my_active(argv + best_testcase)')
         update_memo_mark_unexposed_failed()
         ### update all_exposed_set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_exposed_set):
                 all_exposed_set.add(my_iroot)
@@ -1579,13 +1912,8 @@ def __command_my_test_gen(argv):
             os.chdir(directory)
             eval('__command_my_profile(argv + new_testcase)')
             ### update all_candidate_set, testcase_list, and all memo set
-            sinfo = static_info.StaticInfo()
-            sinfo.load("sinfo.db")
-            iroot_db = iroot.iRootDB(sinfo)
-            iroot_db.load("iroot.db")
-            memo_db = memo.Memo(sinfo, iroot_db)
-            memo_db.load("memo.db")
-            my_memo = memo.myMemo(memo_db)
+            (sinfo, iroot_db, memo_db) = _session.load()
+            my_memo = memo.myMemo(memo_db, _store)
             for my_iroot in my_memo.exposed_set:
                 if not is_in_set(my_iroot, all_exposed_set):
                     all_exposed_set.add(my_iroot)
@@ -1603,7 +1931,7 @@ def __command_my_test_gen(argv):
             print "predicted_set length      = %d" % len(all_predicted_set)
             if len(all_shadow_exposed_set) != 0:
                 print "shadow_exposed_set length = %d" % len(all_shadow_exposed_set)
-            my_candidate = memo.myCandidate(memo_db, new_testcase)
+            my_candidate = memo.myCandidate(memo_db, new_testcase, _store)
             all_candidate_set.add(my_candidate)
             testcase_list.append(new_testcase)
             os.chdir("..")
@@ -1638,96 +1966,34 @@ def __command_my_test_gen(argv):
 
 
 def update_memo(all_exposed_set, all_failed_set, all_shadow_exposed_set):
-    sinfo = static_info.StaticInfo()
-    sinfo.load("sinfo.db")
-    iroot_db = iroot.iRootDB(sinfo)
-    iroot_db.load("iroot.db")
-    memo_db = memo.Memo(sinfo, iroot_db)
-    memo_db.load("memo.db")
-    memo_db.my_update("memo.db", all_exposed_set, all_failed_set, all_shadow_exposed_set)
+    (sinfo, iroot_db, memo_db) = _session.load()
+    memo_db.my_update("memo.db", all_exposed_set, all_failed_set, all_shadow_exposed_set, _store)
+    _session.sync("memo.db")
 
 def update_memo_mark_unexposed_failed():
-    sinfo = static_info.StaticInfo()
-    sinfo.load("sinfo.db")
-    iroot_db = iroot.iRootDB(sinfo)
-    iroot_db.load("iroot.db")
-    memo_db = memo.Memo(sinfo, iroot_db)
-    memo_db.load("memo.db")
+    (sinfo, iroot_db, memo_db) = _session.load()
     memo_db.mark_unexposed_failed()
     memo_db.save("memo.db")
+    _session.sync("memo.db")
     #logging.msg('memo mark unexposed failed done!\n')
 
 
-def get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set):
-    max_count = 0
-    best_testcase = None
-    id_set = set()
-    current_set = set()
-    for aset in all_candidate_set:
-        count = 0
-        current_set.clear()
-        for candidate_id in aset.candidate_map.keys():
-            if not is_in_set(aset.candidate_map[candidate_id], all_exposed_set):
-                if not is_in_set(aset.candidate_map[candidate_id], all_failed_set):
-                        if not is_in_set(aset.candidate_map[candidate_id], all_shadow_exposed_set):
-                            count += 1
-                            current_set.add(candidate_id)
-        print "%s : count = %d" % (aset.test_case, count) 
-        if count > max_count:
-            max_count = count
-            best_testcase = aset.test_case
-            id_set.clear()
-            id_set |= current_set
-    print "id_set = %s" % str(id_set)
+def get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set, coverage=None):
+    if coverage == None:
+        coverage = selection.CoverageMatrix()
+    coverage.sync(all_exposed_set, all_failed_set, all_shadow_exposed_set)
+    (best_testcase, max_count, id_set) = coverage.best(all_candidate_set)
+    logging.msg("id_set = %s\n" % str(id_set), 2)
     return (best_testcase, max_count, id_set)
 
 #====
-def get_fit_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set):
-    max_count = 0
-    best_testcase = None
-    id_set = set()
-    current_set = set()
-    whole_set = all_exposed_set | all_failed_set | all_shadow_exposed_set
-    for aset in all_candidate_set:
-        count = 0
-        current_set.clear()
-        for candidate_id in aset.candidate_map.keys():
-            if not is_in_set(aset.candidate_map[candidate_id], whole_set):
-                count += 1
-                current_set.add(candidate_id)
-        print "%s : count = %d" % (aset.test_case, count) 
-        if count > max_count:
-            max_count = count
-            best_testcase = aset.test_case
-            id_set.clear()
-            id_set |= current_set
-    print "id_set = %s" % str(id_set)
-    return (best_testcase, max_count, id_set)
+def get_fit_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set, coverage=None):
+    return get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set, coverage)
 #====
 
 
-def event_equal(e1, e2):
-    if e1.type != e2.type:
-        return False
-    if e1.inst_offset != e2.inst_offset:
-        return False
-    return True
-
 def is_in_set(myMemo_info, myIRoot_set):
-    if len(myIRoot_set) == 0:
-        return False
-    for myI in myIRoot_set:
-        if myMemo_info.idiom == myI.idiom:
-            length = len(myMemo_info.event_list)
-            count = 0
-            for idx in range(length):
-                if event_equal(myI.event_list[idx], myMemo_info.event_list[idx]):
-                    count += 1
-                else:
-                    break
-            if count == length:
-                return True
-    return False
+    return memo.is_in_set(myMemo_info, myIRoot_set)
 
 def is_in_testcase(t, t_list):
     length = len(t_list)
@@ -1836,14 +2102,9 @@ def __command_my_old(argv):
         eval('__command_my_profile(argv + test_case)')
         eval('__command_my_active(argv + test_case)')
         
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
+        (sinfo, iroot_db, memo_db) = _session.load()
         
-        my_memo = memo.myMemo(memo_db)
+        my_memo = memo.myMemo(memo_db, _store)
         for exp in my_memo.exposed_set:
             if not is_in_set(exp, all_exposed_set):
                 all_exposed_set.add(exp)
@@ -1871,10 +2132,10 @@ def __command_my_rand(argv):
         logging.err("testcase file not exists!!\n")
         
     all_candidate_set = set()            # memo.myCandidate; testcase with its candidate iroots
-    all_exposed_set = set()              # memo.myIRoot; all exposed iroots  (from memo.myMemo.exposed_set)
-    all_failed_set = set()               # memo.myIRoot; all failed iroots  (from memo.myMemo.failed_set)
-    all_predicted_set = set()            # memo.myIRoot; all predicted iroots  (from memo.myMemo.predicted_set)
-    all_shadow_exposed_set = set()       # memo.myIRoot; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
+    all_exposed_set = set()              # global iroot ids from iRootStore; all exposed iroots  (from memo.myMemo.exposed_set)
+    all_failed_set = set()               # global iroot ids from iRootStore; all failed iroots  (from memo.myMemo.failed_set)
+    all_predicted_set = set()            # global iroot ids from iRootStore; all predicted iroots  (from memo.myMemo.predicted_set)
+    all_shadow_exposed_set = set()       # global iroot ids from iRootStore; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
     
     f = open("testcase2.txt")
     
@@ -1897,13 +2158,8 @@ def __command_my_rand(argv):
         eval('__command_my_active(argv + test_case)')
         update_memo_mark_unexposed_failed()
         
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_exposed_set):
                 all_exposed_set.add(my_iroot)
@@ -1939,10 +2195,10 @@ def __command_my_rand(argv):
 def __command_my_rand_gen(argv):
     start_time = time.time()
     
-    all_exposed_set = set()              # memo.myIRoot; all exposed iroots  (from memo.myMemo.exposed_set)
-    all_failed_set = set()               # memo.myIRoot; all failed iroots  (from memo.myMemo.failed_set)
-    all_predicted_set = set()            # memo.myIRoot; all predicted iroots  (from memo.myMemo.predicted_set)
-    all_shadow_exposed_set = set()       # memo.myIRoot; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
+    all_exposed_set = set()              # global iroot ids from iRootStore; all exposed iroots  (from memo.myMemo.exposed_set)
+    all_failed_set = set()               # global iroot ids from iRootStore; all failed iroots  (from memo.myMemo.failed_set)
+    all_predicted_set = set()            # global iroot ids from iRootStore; all predicted iroots  (from memo.myMemo.predicted_set)
+    all_shadow_exposed_set = set()       # global iroot ids from iRootStore; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
     
     testcase_list = list()     # readline.split(); all testcase
     chosen_list = list()         # readline.split(); chosen testcase
@@ -1975,13 +2231,8 @@ def __command_my_rand_gen(argv):
         eval('__command_my_active(argv + test_case)')
         update_memo_mark_unexposed_failed()
         ### update all_exposed_set and testcase_list
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_exposed_set):
                 all_exposed_set.add(my_iroot)
@@ -2177,12 +2428,7 @@ def __command_my_test_genp(argv):
         os.chdir(directory)
         eval('__command_my_profile(argv + test_case)')
         ### update all_candidate_set, testcase_list, and all memo set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
+        (sinfo, iroot_db, memo_db) = _session.load()
         my_memo = memo.myMemop(memo_db)
         all_exposed_set |= my_memo.exposed_set
         all_failed_set |= my_memo.failed_set
@@ -2226,12 +2472,7 @@ def __command_my_test_genp(argv):
         eval('__command_my_active(argv + best_testcase)')
         update_memo_mark_unexposed_failed()
         ### update all_exposed_set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
+        (sinfo, iroot_db, memo_db) = _session.load()
         my_memo = memo.myMemop(memo_db)
         all_exposed_set |= my_memo.exposed_set
         all_failed_set |= my_memo.failed_set
@@ -2293,12 +2534,7 @@ def __command_my_test_genp(argv):
             os.chdir(directory)
             eval('__command_my_profile(argv + new_testcase)')
             ### update all_candidate_set, testcase_list, and all memo set
-            sinfo = static_info.StaticInfo()
-            sinfo.load("sinfo.db")
-            iroot_db = iroot.iRootDB(sinfo)
-            iroot_db.load("iroot.db")
-            memo_db = memo.Memo(sinfo, iroot_db)
-            memo_db.load("memo.db")
+            (sinfo, iroot_db, memo_db) = _session.load()
             my_memo = memo.myMemop(memo_db)
             all_exposed_set |= my_memo.exposed_set
             all_failed_set |= my_memo.failed_set
@@ -2402,12 +2638,7 @@ def __command_my_rand_genp(argv):
         eval('__command_my_active(argv + test_case)')
         update_memo_mark_unexposed_failed()
         ### update all_exposed_set and testcase_list
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
+        (sinfo, iroot_db, memo_db) = _session.load()
         my_memo = memo.myMemop(memo_db)
         all_exposed_set |= my_memo.exposed_set
         all_failed_set |= my_memo.failed_set
@@ -2479,18 +2710,21 @@ def __command_my_rand_genp(argv):
 def get_best_testcasep(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set):
     best_testcase = None
     current_set = set()
-    chosen_set = set()
     new_set = set()
     whole_set = all_exposed_set | all_failed_set | all_shadow_exposed_set
     for aset in all_candidate_set:
         current_set.clear()
         current_set = aset.candidate_set - whole_set
         new_set |= current_set
-    ggeett(all_candidate_set, chosen_set, new_set, 0)
-    
-    max_count = 0
     global _MIN_NUM
     global _CHOSEN_SET
+    chosen = _selector.cover(all_candidate_set, new_set)
+    if len(chosen) < _MIN_NUM:
+        _MIN_NUM = len(chosen)
+        _CHOSEN_SET.clear()
+        _CHOSEN_SET |= set(chosen)
+    
+    max_count = 0
     for aset in _CHOSEN_SET:
         count = len(aset.candidate_set - whole_set)
         print "%s : count = %d" % (aset.test_case, count) 
@@ -2501,31 +2735,6 @@ def get_best_testcasep(all_candidate_set, all_exposed_set, all_failed_set, all_s
     print "_CHOSEN_LEN = %d" % len(_CHOSEN_SET)
     return (best_testcase, max_count)
 
-def ggeett(candidate_set, chosen_set, new_set, min_count):
-    #print "len cand_set = %d" % len(candidate_set)
-    #print "len chos_set = %d" % len(chosen_set)
-    #print "len new_set = %d" % len(new_set)
-    #print "min_count = %d" % min_count
-    global _MIN_NUM
-    global _CHOSEN_SET
-    #print "_MIN_NUM = %d" % _MIN_NUM
-    #print "==========="
-    if len(new_set)==0:
-        if min_count<_MIN_NUM:
-            _MIN_NUM = min_count
-            _CHOSEN_SET.clear()
-            _CHOSEN_SET |= chosen_set
-    elif min_count < _MIN_NUM:
-        for aset in candidate_set:
-            curr_new = new_set - aset.candidate_set
-            if len(curr_new) < len(new_set):
-                curr_candidate = set(candidate_set)
-                curr_candidate.remove(aset)
-                curr_chosen = set(chosen_set)
-                curr_chosen.add(aset)
-                ggeett(curr_candidate, curr_chosen, curr_new, min_count+1)
-    
-
 def get_best_testcasep_backup(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set):
     max_count = 0
     best_testcase = None
@@ -2551,13 +2760,9 @@ def is_in_setp(myMemo_info_int, myIRoot_set):
     return False
 '''
 def update_memop(all_exposed_set, all_failed_set, all_shadow_exposed_set):
-    sinfo = static_info.StaticInfo()
-    sinfo.load("sinfo.db")
-    iroot_db = iroot.iRootDB(sinfo)
-    iroot_db.load("iroot.db")
-    memo_db = memo.Memo(sinfo, iroot_db)
-    memo_db.load("memo.db")
+    (sinfo, iroot_db, memo_db) = _session.load()
     memo_db.my_updatep("memo.db", all_exposed_set, all_failed_set, all_shadow_exposed_set)
+    _session.sync("memo.db")
 
 
 
@@ -2607,13 +2812,8 @@ def __command_my_rand_pro(argv):
         eval('__command_my_profile(argv + test_case)')
 
         ### update all_exposed_set and testcase_list
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_pro_set):
                 all_pro_set.add(my_iroot)
@@ -2673,10 +2873,11 @@ def __command_my_test_pro(argv):
     start_time = time.time()
     
     all_candidate_set = set()            # memo.myCandidate; testcase with its candidate iroots
-    all_exposed_set = set()              # memo.myIRoot; all exposed iroots  (from memo.myMemo.exposed_set)
-    all_failed_set = set()               # memo.myIRoot; all failed iroots  (from memo.myMemo.failed_set)
-    all_predicted_set = set()            # memo.myIRoot; all predicted iroots  (from memo.myMemo.predicted_set)
-    all_shadow_exposed_set = set()       # memo.myIRoot; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
+    all_exposed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all exposed iroots  (from memo.myMemo.exposed_set)
+    all_failed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all failed iroots  (from memo.myMemo.failed_set)
+    all_predicted_set = set()            # global iroot ids from iRootStore; all predicted iroots  (from memo.myMemo.predicted_set)
+    all_shadow_exposed_set = selection.ResolvedSet() # global iroot ids from iRootStore; all shadow_exposed iroots  (from memo.myMemo.shadow_exposed_set)
+    coverage = selection.CoverageMatrix()  # candidate iroots of each input against the sets above
     
     testcase_list = list()               # readline.split(); all testcase
     chosen_list = list()                 # readline.split(); chosen testcase
@@ -2690,9 +2891,8 @@ def __command_my_test_pro(argv):
     f = open("testcase.txt")
     
     ### profile
+    jobs = list()
     while 1:
-        print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
-        ### get a testcase and do profile
         line = f.readline()
         if not line:
             break
@@ -2702,16 +2902,14 @@ def __command_my_test_pro(argv):
         directory = "MyTestGen_%s" % "_".join(test_case)
         if not os.path.exists(directory):
             os.mkdir(directory)
+        jobs.append((test_case, directory))
+    f.close()
+    for (test_case, directory) in profile_testcases(argv, jobs):
+        print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
         os.chdir(directory)
-        eval('__command_my_profile(argv + test_case)')
         ### update all_candidate_set, testcase_list, and all memo set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_exposed_set):
                 all_exposed_set.add(my_iroot)
@@ -2729,10 +2927,9 @@ def __command_my_test_pro(argv):
         print "predicted_set length      = %d" % len(all_predicted_set)
         if len(all_shadow_exposed_set) != 0:
             print "shadow_exposed_set length = %d" % len(all_shadow_exposed_set)
-        my_candidate = memo.myCandidate(memo_db, test_case)
+        my_candidate = memo.myCandidate(memo_db, test_case, _store)
         all_candidate_set.add(my_candidate)
         os.chdir("..")
-    f.close()
     
     count = 0
     pre_predicted_num = 0
@@ -2741,7 +2938,7 @@ def __command_my_test_pro(argv):
     while len(all_candidate_set) != 0:
         print "++++++++++++++++++++++++++++++++++++++++++++++++++++++++"
         ### choose a testcase
-        (best_testcase, max_count, id_set) = get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set)
+        (best_testcase, max_count, id_set) = get_best_testcase(all_candidate_set, all_exposed_set, all_failed_set, all_shadow_exposed_set, coverage)
         print "best testcase is %s : count = %d" % (best_testcase, max_count)
         if max_count == 0:
             for aset in all_candidate_set:
@@ -2755,13 +2952,8 @@ def __command_my_test_pro(argv):
         os.chdir(directory)
 
         ### update all_exposed_set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
-        my_memo = memo.myMemo(memo_db)
+        (sinfo, iroot_db, memo_db) = _session.load()
+        my_memo = memo.myMemo(memo_db, _store)
         for my_iroot in my_memo.exposed_set:
             if not is_in_set(my_iroot, all_exposed_set):
                 all_exposed_set.add(my_iroot)
@@ -2820,13 +3012,8 @@ def __command_my_test_pro(argv):
             os.chdir(directory)
             eval('__command_my_profile(argv + new_testcase)')
             ### update all_candidate_set, testcase_list, and all memo set
-            sinfo = static_info.StaticInfo()
-            sinfo.load("sinfo.db")
-            iroot_db = iroot.iRootDB(sinfo)
-            iroot_db.load("iroot.db")
-            memo_db = memo.Memo(sinfo, iroot_db)
-            memo_db.load("memo.db")
-            my_memo = memo.myMemo(memo_db)
+            (sinfo, iroot_db, memo_db) = _session.load()
+            my_memo = memo.myMemo(memo_db, _store)
             for my_iroot in my_memo.exposed_set:
                 if not is_in_set(my_iroot, all_exposed_set):
                     all_exposed_set.add(my_iroot)
@@ -2844,7 +3031,7 @@ def __command_my_test_pro(argv):
             print "predicted_set length      = %d" % len(all_predicted_set)
             if len(all_shadow_exposed_set) != 0:
                 print "shadow_exposed_set length = %d" % len(all_shadow_exposed_set)
-            my_candidate = memo.myCandidate(memo_db, new_testcase)
+            my_candidate = memo.myCandidate(memo_db, new_testcase, _store)
             all_candidate_set.add(my_candidate)
             testcase_list.append(new_testcase)
             os.chdir("..")
@@ -2910,12 +3097,7 @@ def __command_my_test_prop(argv):
         os.chdir(directory)
         eval('__command_my_profile(argv + test_case)')
         ### update all_candidate_set, testcase_list, and all memo set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
+        (sinfo, iroot_db, memo_db) = _session.load()
         my_memo = memo.myMemop(memo_db)
         all_exposed_set |= my_memo.exposed_set
         all_failed_set |= my_memo.failed_set
@@ -2955,12 +3137,7 @@ def __command_my_test_prop(argv):
         os.chdir(directory)
         
         ### update all_exposed_set
-        sinfo = static_info.StaticInfo()
-        sinfo.load("sinfo.db")
-        iroot_db = iroot.iRootDB(sinfo)
-        iroot_db.load("iroot.db")
-        memo_db = memo.Memo(sinfo, iroot_db)
-        memo_db.load("memo.db")
+        (sinfo, iroot_db, memo_db) = _session.load()
         my_memo = memo.myMemop(memo_db)
         all_exposed_set |= my_memo.exposed_set
         all_exposed_set |= my_memo.failed_set
@@ -3025,12 +3202,7 @@ def __command_my_test_prop(argv):
                 os.chdir(directory)
                 eval('__command_my_profile(argv + new_testcase)')
                 ### update all_candidate_set, testcase_list, and all memo set
-                sinfo = static_info.StaticInfo()
-                sinfo.load("sinfo.db")
-                iroot_db = iroot.iRootDB(sinfo)
-                iroot_db.load("iroot.db")
-                memo_db = memo.Memo(sinfo, iroot_db)
-                memo_db.load("memo.db")
+                (sinfo, iroot_db, memo_db) = _session.load()
                 my_memo = memo.myMemop(memo_db)
                 all_exposed_set |= my_memo.exposed_set
                 all_failed_set |= my_memo.failed_set
@@ -3103,6 +3275,7 @@ def main(argv):
         logging.err(command_usage())
     command = argv[0]
     logging.msg('performing command: %s ...\n' % command, 2) 
+    _store.load('iroot_store.db')
     if valid_command(command):
         eval('__command_%s(argv[1:])' % command)
     else:
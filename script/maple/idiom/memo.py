@@ -16,11 +16,14 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import struct
 from maple.core import logging
 from maple.core import proto
+from maple.core import static_info
 
 _memo_failed_limit = 2
 _memo_total_failed_limit = 6
+_memo_journal_limit = 1024
 
 def iroot_pb2():
     return proto.module('idiom.iroot_pb2')
@@ -28,12 +31,46 @@ def iroot_pb2():
 def memo_pb2():
     return proto.module('idiom.memo_pb2')
 
+def journal_name(db_name):
+    return db_name + '.journal'
+
+def load_proto(db_name):
+    """ Return the memoization proto of a database, journal included. """
+    memo = Memo(None, None)
+    memo.load(db_name)
+    memo.sync_proto()
+    return memo.proto
+
+def load_generation(db_name):
+    """ Return the generation of the snapshot of a database on disk. """
+    if not os.path.exists(db_name):
+        return 0
+    proto = memo_pb2().MemoProto()
+    f = open(db_name, 'rb')
+    proto.ParseFromString(f.read())
+    f.close()
+    return proto.generation
+
+def save_snapshot_proto(proto, db_name):
+    """ Write a full memoization database and drop its journal. The
+    journal is ignored on load once the generation of the snapshot has
+    changed, so a crash in between leaves a consistent database.
+    """
+    static_info.save_proto(proto, db_name)
+    if os.path.exists(journal_name(db_name)):
+        os.remove(journal_name(db_name))
+
 class iRootInfo(object):
     def __init__(self, proto, memo):
         self.proto = proto
         self.memo = memo
+        self.idiom_type = None
     def iroot(self):
         return self.memo.iroot_db.find_iroot(self.proto.iroot_id)
+    def idiom(self):
+        if self.idiom_type == None:
+            self.idiom_type = self.iroot().idiom()
+        return self.idiom_type
     def total_test_runs(self):
         return self.proto.total_test_runs
     def has_async(self):
@@ -63,36 +100,181 @@ class Memo(object):
         self.predicted_set = set()
         self.shadow_exposed_set = set()
         self.candidate_map = {}
+        # per idiom buckets of the sets above, keyed by (set name, idiom).
+        # they need the iroot database, see load_proto
+        self.buckets = {}
+        # journal state, see save()
+        self.db_name = None
+        self.generation = 0
+        self.journal = []
+        self.journal_entries = 0
+        self.journal_bytes = 0
+        self.journal_size = 0
+        self.dirty = False
+        self.replaying = False
     def load(self, db_name):
         if not os.path.exists(db_name):
             return
         f = open(db_name, 'rb')
         self.proto.ParseFromString(f.read())
         f.close()
+        # iroot ids are looked up in the info map only, so that the proto
+        # can be loaded without the iroot database (see load_proto)
         for iroot_info_proto in self.proto.iroot_info:
             iroot_info = iRootInfo(iroot_info_proto, self)
-            self.iroot_info_map[iroot_info.iroot().id()] = iroot_info
+            self.iroot_info_map[iroot_info_proto.iroot_id] = iroot_info
         for iroot_id in self.proto.exposed:
-            iroot = self.iroot_db.find_iroot(iroot_id)
-            iroot_info = self.find_iroot_info(iroot)
-            self.exposed_set.add(iroot_info)
+            self.add_exposed(self.iroot_info_map[iroot_id])
         for iroot_id in self.proto.failed:
-            iroot = self.iroot_db.find_iroot(iroot_id)
-            iroot_info = self.find_iroot_info(iroot)
-            self.failed_set.add(iroot_info)
+            self.add_failed(self.iroot_info_map[iroot_id])
         for iroot_id in self.proto.predicted:
-            iroot = self.iroot_db.find_iroot(iroot_id)
-            iroot_info = self.find_iroot_info(iroot)
-            self.predicted_set.add(iroot_info)
+            self.add_predicted(self.iroot_info_map[iroot_id])
         for iroot_id in self.proto.shadow_exposed:
-            iroot = self.iroot_db.find_iroot(iroot_id)
-            iroot_info = self.find_iroot_info(iroot)
-            self.shadow_exposed_set.add(iroot_info)
+            self.add_shadow_exposed(self.iroot_info_map[iroot_id])
         for cand_proto in self.proto.candidate:
-            iroot = self.iroot_db.find_iroot(cand_proto.iroot_id)
-            iroot_info = self.find_iroot_info(iroot)
-            self.candidate_map[iroot_info] = cand_proto.test_runs
+            iroot_info = self.iroot_info_map[cand_proto.iroot_id]
+            self.add_candidate(iroot_info, cand_proto.test_runs)
+        self.db_name = os.path.realpath(db_name)
+        self.generation = self.proto.generation
+        self.replay(journal_name(db_name))
+    def replay(self, name):
+        self.journal_entries = 0
+        self.journal_bytes = 0
+        self.journal_size = 0
+        if not os.path.exists(name):
+            return
+        f = open(name, 'rb')
+        data = f.read()
+        f.close()
+        self.journal_size = len(data)
+        self.replay_data(data)
+    def replay_data(self, data):
+        """ Apply the records of the journal data past journal_bytes.
+        Return whether all of them could be applied.
+        """
+        pos = self.journal_bytes
+        self.replaying = True
+        while pos + 4 <= len(data):
+            size = struct.unpack('<I', data[pos:pos + 4])[0]
+            if pos + 4 + size > len(data):
+                # torn write at the end of the journal
+                break
+            delta = memo_pb2().MemoDeltaProto()
+            delta.ParseFromString(data[pos + 4:pos + 4 + size])
+            if self.journal_entries == 0:
+                # a journal left from an older snapshot is ignored
+                if (delta.type != memo_pb2().MEMO_DELTA_JOURNAL_START or
+                    delta.generation != self.generation):
+                    break
+            else:
+                self.apply_delta(delta)
+            pos += 4 + size
+            self.journal_entries += 1
+            self.journal_bytes = pos
+        self.replaying = False
+        return self.journal_bytes == len(data)
+    def apply_delta(self, delta):
+        pb = memo_pb2()
+        if delta.type == pb.MEMO_DELTA_MARK_UNEXPOSED_FAILED:
+            self.mark_unexposed_failed()
+        elif delta.type == pb.MEMO_DELTA_REFINE_CANDIDATE:
+            self.refine_candidate(delta.flag)
+        else:
+            iroot_info = self.get_iroot_info(delta.iroot_id)
+            if delta.type == pb.MEMO_DELTA_TEST_SUCCESS:
+                self.test_success(iroot_info)
+            elif delta.type == pb.MEMO_DELTA_TEST_FAIL:
+                self.test_fail(iroot_info)
+            elif delta.type == pb.MEMO_DELTA_PREDICTED:
+                self.predicted(iroot_info)
+            elif delta.type == pb.MEMO_DELTA_OBSERVED:
+                self.observed(iroot_info, delta.flag)
+            elif delta.type == pb.MEMO_DELTA_SET_ASYNC:
+                self.set_async(iroot_info)
+            elif delta.type != pb.MEMO_DELTA_IROOT_INFO:
+                self.resolve_candidate(iroot_info, delta.type)
+    def record(self, delta_type, iroot_info=None, flag=None):
+        if self.replaying:
+            return
+        delta = memo_pb2().MemoDeltaProto()
+        delta.type = delta_type
+        if iroot_info != None:
+            delta.iroot_id = iroot_info.proto.iroot_id
+        if flag != None:
+            delta.flag = flag
+        self.journal.append(delta)
     def save(self, db_name):
+        """ Save the changes since the last load or save. They are
+        appended to the journal of the database they were loaded from,
+        unless they cannot be journaled or the journal is too long, in
+        which case a new snapshot is written (compaction).
+        """
+        journaled = False
+        if (not self.dirty and os.path.realpath(db_name) == self.db_name and
+            self.journal_entries + len(self.journal) <= _memo_journal_limit):
+            journaled = self.append_journal(db_name)
+        if not journaled:
+            self.save_snapshot(db_name)
+        self.journal = []
+        self.dirty = False
+    def append_journal(self, db_name):
+        """ Append the recorded deltas to the journal. Return False if the
+        database changed on disk in a way that needs a new snapshot.
+        """
+        if len(self.journal) == 0:
+            return True
+        name = journal_name(db_name)
+        # another writer may have written a snapshot since the load
+        if load_generation(db_name) != self.generation:
+            return False
+        size = 0
+        if os.path.exists(name):
+            size = os.path.getsize(name)
+        if size < self.journal_bytes:
+            return False
+        if size != self.journal_size:
+            # another writer appended to the journal, pick up its records
+            f = open(name, 'rb')
+            data = f.read()
+            f.close()
+            self.journal_size = len(data)
+            if not self.replay_data(data):
+                return False
+        deltas = list(self.journal)
+        if self.journal_bytes == 0:
+            start = memo_pb2().MemoDeltaProto()
+            start.type = memo_pb2().MEMO_DELTA_JOURNAL_START
+            start.generation = self.generation
+            deltas.insert(0, start)
+        data = []
+        for delta in deltas:
+            content = delta.SerializeToString()
+            data.append(struct.pack('<I', len(content)))
+            data.append(content)
+        data = ''.join(data)
+        if os.path.exists(name):
+            f = open(name, 'r+b')
+        else:
+            f = open(name, 'wb')
+        # drop the torn write that was already there on the last read
+        f.truncate(self.journal_bytes)
+        f.seek(self.journal_bytes)
+        f.write(data)
+        f.close()
+        self.journal_entries += len(deltas)
+        self.journal_bytes += len(data)
+        self.journal_size = self.journal_bytes
+        return True
+    def save_snapshot(self, db_name):
+        self.sync_proto()
+        self.generation += 1
+        self.proto.generation = self.generation
+        save_snapshot_proto(self.proto, db_name)
+        self.db_name = os.path.realpath(db_name)
+        self.journal_entries = 0
+        self.journal_bytes = 0
+        self.journal_size = 0
+    def sync_proto(self):
         del self.proto.iroot_info[:]
         del self.proto.exposed[:]
         del self.proto.failed[:]
@@ -106,20 +288,55 @@ class Memo(object):
             if (iroot_info.has_async()):
                 iroot_info_proto.async = iroot_info.async()
         for iroot_info in self.exposed_set:
-            self.proto.exposed.append(iroot_info.iroot().id())
+            self.proto.exposed.append(iroot_info.proto.iroot_id)
         for iroot_info in self.failed_set:
-            self.proto.failed.append(iroot_info.iroot().id())
+            self.proto.failed.append(iroot_info.proto.iroot_id)
         for iroot_info in self.predicted_set:
-            self.proto.predicted.append(iroot_info.iroot().id())
+            self.proto.predicted.append(iroot_info.proto.iroot_id)
         for iroot_info in self.shadow_exposed_set:
-            self.proto.shadow_exposed.append(iroot_info.iroot().id())
+            self.proto.shadow_exposed.append(iroot_info.proto.iroot_id)
         for iroot_info, test_runs in self.candidate_map.iteritems():
             cand_proto = self.proto.candidate.add()
-            cand_proto.iroot_id = iroot_info.iroot().id()
+            cand_proto.iroot_id = iroot_info.proto.iroot_id
             cand_proto.test_runs = test_runs
-        f = open(db_name, 'wb')
-        f.write(self.proto.SerializeToString())
-        f.close()
+    def bucket(self, name, idiom):
+        key = (name, idiom)
+        if not key in self.buckets:
+            self.buckets[key] = set()
+        return self.buckets[key]
+    def index(self, name, iroot_info):
+        if self.iroot_db != None:
+            self.bucket(name, iroot_info.idiom()).add(iroot_info)
+    def unindex(self, name, iroot_info):
+        if self.iroot_db != None:
+            self.bucket(name, iroot_info.idiom()).discard(iroot_info)
+    def clear_index(self, name):
+        for key in self.buckets.keys():
+            if key[0] == name:
+                del self.buckets[key]
+    def count(self, name, idiom):
+        key = (name, idiom)
+        if not key in self.buckets:
+            return 0
+        return len(self.buckets[key])
+    def add_exposed(self, iroot_info):
+        self.exposed_set.add(iroot_info)
+        self.index('exposed', iroot_info)
+    def add_failed(self, iroot_info):
+        self.failed_set.add(iroot_info)
+        self.index('failed', iroot_info)
+    def add_predicted(self, iroot_info):
+        self.predicted_set.add(iroot_info)
+        self.index('predicted', iroot_info)
+    def add_shadow_exposed(self, iroot_info):
+        self.shadow_exposed_set.add(iroot_info)
+        self.index('shadow_exposed', iroot_info)
+    def add_candidate(self, iroot_info, test_runs):
+        self.candidate_map[iroot_info] = test_runs
+        self.index('candidate', iroot_info)
+    def remove_candidate(self, iroot_info):
+        del self.candidate_map[iroot_info]
+        self.unindex('candidate', iroot_info)
     def size(self):
         return len(self.iroot_info_map)
     def predicted_size(self):
@@ -128,34 +345,38 @@ class Memo(object):
         return len(self.candidate_map)
     def clear_predicted_set(self):
         self.predicted_set = set()
+        self.clear_index('predicted')
+        self.dirty = True
     def clear_candidate_map(self):
         self.candidate_map = {}
+        self.clear_index('candidate')
+        self.dirty = True
     def has_candidate(self, idiom):
         if idiom == 0:
             return len(self.candidate_map) > 0
-        for iroot_info in self.candidate_map:
-            if iroot_info.iroot().idiom() == idiom:
-                return True
-        return False
+        return self.count('candidate', idiom) > 0
     def refine_candidate(self, memo_failed=True):
+        self.record(memo_pb2().MEMO_DELTA_REFINE_CANDIDATE, flag=memo_failed)
         to_remove = []
         for iroot_info, test_runs in self.candidate_map.iteritems():
             if test_runs >= _memo_failed_limit:
                 to_remove.append(iroot_info)
         for iroot_info in to_remove:
-            del self.candidate_map[iroot_info]
+            self.remove_candidate(iroot_info)
         for iroot_info in self.exposed_set:
             if iroot_info in self.candidate_map:
-                del self.candidate_map[iroot_info]
+                self.remove_candidate(iroot_info)
         if memo_failed:
             for iroot_info in self.failed_set:
                 if iroot_info in self.candidate_map:
-                    del self.candidate_map[iroot_info]
+                    self.remove_candidate(iroot_info)
     def mark_unexposed_failed(self):
+        self.record(memo_pb2().MEMO_DELTA_MARK_UNEXPOSED_FAILED)
         for iroot_id, iroot_info in self.iroot_info_map.iteritems():
             if not iroot_info in self.exposed_set:
-                self.failed_set.add(iroot_info)
+                self.add_failed(iroot_info)
     def merge(self, other):
+        self.dirty = True
         for other_iroot_id, other_iroot_info in other.iroot_info_map.iteritems():
             if other_iroot_id in self.iroot_info_map:
                 iroot_info = self.iroot_info_map[other_iroot_id]
@@ -168,19 +389,19 @@ class Memo(object):
         for other_iroot_info in other.exposed_set:
             assert other_iroot_info.iroot().id() in self.iroot_info_map
             iroot_info = self.iroot_info_map[other_iroot_info.iroot().id()]
-            self.exposed_set.add(iroot_info)
+            self.add_exposed(iroot_info)
         for other_iroot_info in other.failed_set:
             assert other_iroot_info.iroot().id() in self.iroot_info_map
             iroot_info = self.iroot_info_map[other_iroot_info.iroot().id()]
-            self.failed_set.add(iroot_info)
+            self.add_failed(iroot_info)
         for other_iroot_info in other.predicted_set:
             assert other_iroot_info.iroot().id() in self.iroot_info_map
             iroot_info = self.iroot_info_map[other_iroot_info.iroot().id()]
-            self.predicted_set.add(iroot_info)
+            self.add_predicted(iroot_info)
         for other_iroot_info in other.shadow_exposed_set:
             assert other_iroot_info.iroot().id() in self.iroot_info_map
             iroot_info = self.iroot_info_map[other_iroot_info.iroot().id()]
-            self.shadow_exposed_set.add(iroot_info)
+            self.add_shadow_exposed(iroot_info)
         for other_iroot_info, test_runs in other.candidate_map.iteritems():
             assert other_iroot_info.iroot().id() in self.iroot_info_map
             iroot_info = self.iroot_info_map[other_iroot_info.iroot().id()]
@@ -188,90 +409,105 @@ class Memo(object):
                 if test_runs > self.candidate_map[iroot_info]:
                     self.candidate_map[iroot_info] = test_runs
             else:
-                self.candidate_map[iroot_info] = test_runs
+                self.add_candidate(iroot_info, test_runs)
     def test_success(self, iroot_info):
         self.candidate_map[iroot_info] += 1
         iroot_info.set_total_test_runs(iroot_info.total_test_runs() + 1)
-        self.exposed_set.add(iroot_info)
+        self.add_exposed(iroot_info)
+        self.record(memo_pb2().MEMO_DELTA_TEST_SUCCESS, iroot_info)
     def test_fail(self, iroot_info):
         self.candidate_map[iroot_info] += 1
         iroot_info.set_total_test_runs(iroot_info.total_test_runs() + 1)
         if iroot_info.total_test_runs() >= _memo_total_failed_limit:
-            self.failed_set.add(iroot_info)
+            self.add_failed(iroot_info)
+        self.record(memo_pb2().MEMO_DELTA_TEST_FAIL, iroot_info)
+    def predicted(self, iroot_info):
+        if not iroot_info in self.predicted_set:
+            self.add_predicted(iroot_info)
+            self.add_candidate(iroot_info, 0)
+            self.record(memo_pb2().MEMO_DELTA_PREDICTED, iroot_info)
+    def observed(self, iroot_info, shadow):
+        if shadow:
+            observed_set = self.shadow_exposed_set
+            add = self.add_shadow_exposed
+        else:
+            observed_set = self.exposed_set
+            add = self.add_exposed
+        if not iroot_info in observed_set:
+            add(iroot_info)
+            self.record(memo_pb2().MEMO_DELTA_OBSERVED, iroot_info, shadow)
+    def set_async(self, iroot_info):
+        if not (iroot_info.has_async() and iroot_info.async()):
+            iroot_info.set_async(True)
+            self.record(memo_pb2().MEMO_DELTA_SET_ASYNC, iroot_info)
+    def resolve_candidate(self, iroot_info, delta_type):
+        """ Move a candidate to the set given by the delta type. """
+        self.remove_candidate(iroot_info)
+        self.record(delta_type, iroot_info)
+        if delta_type == memo_pb2().MEMO_DELTA_RESOLVE_EXPOSED:
+            self.add_exposed(iroot_info)
+        elif delta_type == memo_pb2().MEMO_DELTA_RESOLVE_FAILED:
+            self.add_failed(iroot_info)
+        else:
+            self.add_shadow_exposed(iroot_info)
     def find_iroot_info(self, iroot):
         return self.iroot_info_map[iroot.id()]
+    def get_iroot_info(self, iroot_id):
+        if not iroot_id in self.iroot_info_map:
+            iroot_info_proto = self.proto.iroot_info.add()
+            iroot_info_proto.iroot_id = iroot_id
+            iroot_info_proto.total_test_runs = 0
+            self.iroot_info_map[iroot_id] = iRootInfo(iroot_info_proto, self)
+            self.record(memo_pb2().MEMO_DELTA_IROOT_INFO, self.iroot_info_map[iroot_id])
+        return self.iroot_info_map[iroot_id]
     def get_exposed_set(self, idiom):
-        results = set()
-        for iroot_info in self.exposed_set:
-            if iroot_info.iroot().idiom() == idiom:
-                results.add(iroot_info)
-        return results
+        return set(self.bucket('exposed', idiom))
     def get_failed_set(self, idiom):
-        results = set()
-        for iroot_info in self.failed_set:
-            if iroot_info.iroot().idiom() == idiom:
-                results.add(iroot_info)
-        return results
+        return set(self.bucket('failed', idiom))
     def get_predicted_set(self, idiom):
-        results = set()
-        for iroot_info in self.predicted_set:
-            if iroot_info.iroot().idiom() == idiom:
-                results.add(iroot_info)
-        return results
+        return set(self.bucket('predicted', idiom))
     def get_shadow_exposed_set(self, idiom):
-        results = set()
-        for iroot_info in self.shadow_exposed_set:
-            if iroot_info.iroot().idiom() == idiom:
-                results.add(iroot_info)
-        return results
+        return set(self.bucket('shadow_exposed', idiom))
     def get_candidates(self, idiom):
         results = {}
-        for iroot_info, test_runs in self.candidate_map.iteritems():
-            if iroot_info.iroot().idiom() == idiom:
-                results[iroot_info] = test_runs
+        for iroot_info in self.bucket('candidate', idiom):
+            results[iroot_info] = self.candidate_map[iroot_info]
         return results
     def observed_iroot_set(self, idiom):
-        results = set()
-        for iroot_info in self.exposed_set:
-            if iroot_info.iroot().idiom() == idiom:
-                results.add(iroot_info)
-        for iroot_info in self.shadow_exposed_set:
-            if iroot_info.iroot().idiom() == idiom:
-                results.add(iroot_info)
-        return results
+        return self.bucket('exposed', idiom) | self.bucket('shadow_exposed', idiom)
     def display_summary(self, f):
         f.write('Memoization Summary\n')
         f.write('---------------------------\n')
         f.write('# total exposed    = %d\n' % len(self.exposed_set))
-        f.write('  # Idiom1         = %d\n' % len(self.get_exposed_set(iroot_pb2().IDIOM_1)))
-        f.write('  # Idiom2         = %d\n' % len(self.get_exposed_set(iroot_pb2().IDIOM_2)))
-        f.write('  # Idiom3         = %d\n' % len(self.get_exposed_set(iroot_pb2().IDIOM_3)))
-        f.write('  # Idiom4         = %d\n' % len(self.get_exposed_set(iroot_pb2().IDIOM_4)))
-        f.write('  # Idiom5         = %d\n' % len(self.get_exposed_set(iroot_pb2().IDIOM_5)))
+        f.write('  # Idiom1         = %d\n' % self.count('exposed', iroot_pb2().IDIOM_1))
+        f.write('  # Idiom2         = %d\n' % self.count('exposed', iroot_pb2().IDIOM_2))
+        f.write('  # Idiom3         = %d\n' % self.count('exposed', iroot_pb2().IDIOM_3))
+        f.write('  # Idiom4         = %d\n' % self.count('exposed', iroot_pb2().IDIOM_4))
+        f.write('  # Idiom5         = %d\n' % self.count('exposed', iroot_pb2().IDIOM_5))
         f.write('# total failed     = %d\n' % len(self.failed_set))
-        f.write('  # Idiom1         = %d\n' % len(self.get_failed_set(iroot_pb2().IDIOM_1)))
-        f.write('  # Idiom2         = %d\n' % len(self.get_failed_set(iroot_pb2().IDIOM_2)))
-        f.write('  # Idiom3         = %d\n' % len(self.get_failed_set(iroot_pb2().IDIOM_3)))
-        f.write('  # Idiom4         = %d\n' % len(self.get_failed_set(iroot_pb2().IDIOM_4)))
-        f.write('  # Idiom5         = %d\n' % len(self.get_failed_set(iroot_pb2().IDIOM_5)))
+        f.write('  # Idiom1         = %d\n' % self.count('failed', iroot_pb2().IDIOM_1))
+        f.write('  # Idiom2         = %d\n' % self.count('failed', iroot_pb2().IDIOM_2))
+        f.write('  # Idiom3         = %d\n' % self.count('failed', iroot_pb2().IDIOM_3))
+        f.write('  # Idiom4         = %d\n' % self.count('failed', iroot_pb2().IDIOM_4))
+        f.write('  # Idiom5         = %d\n' % self.count('failed', iroot_pb2().IDIOM_5))
         f.write('# total predicted  = %d\n' % len(self.predicted_set))
-        f.write('  # Idiom1         = %d\n' % len(self.get_predicted_set(iroot_pb2().IDIOM_1)))
-        f.write('  # Idiom2         = %d\n' % len(self.get_predicted_set(iroot_pb2().IDIOM_2)))
-        f.write('  # Idiom3         = %d\n' % len(self.get_predicted_set(iroot_pb2().IDIOM_3)))
-        f.write('  # Idiom4         = %d\n' % len(self.get_predicted_set(iroot_pb2().IDIOM_4)))
-        f.write('  # Idiom5         = %d\n' % len(self.get_predicted_set(iroot_pb2().IDIOM_5)))
+        f.write('  # Idiom1         = %d\n' % self.count('predicted', iroot_pb2().IDIOM_1))
+        f.write('  # Idiom2         = %d\n' % self.count('predicted', iroot_pb2().IDIOM_2))
+        f.write('  # Idiom3         = %d\n' % self.count('predicted', iroot_pb2().IDIOM_3))
+        f.write('  # Idiom4         = %d\n' % self.count('predicted', iroot_pb2().IDIOM_4))
+        f.write('  # Idiom5         = %d\n' % self.count('predicted', iroot_pb2().IDIOM_5))
         f.write('# total shadow ex  = %d\n' % len(self.shadow_exposed_set))
-        f.write('  # Idiom1         = %d\n' % len(self.get_shadow_exposed_set(iroot_pb2().IDIOM_1)))
-        f.write('  # Idiom2         = %d\n' % len(self.get_shadow_exposed_set(iroot_pb2().IDIOM_2)))
-        f.write('  # Idiom3         = %d\n' % len(self.get_shadow_exposed_set(iroot_pb2().IDIOM_3)))
-        f.write('  # Idiom4         = %d\n' % len(self.get_shadow_exposed_set(iroot_pb2().IDIOM_4)))
-        f.write('  # Idiom5         = %d\n' % len(self.get_shadow_exposed_set(iroot_pb2().IDIOM_5)))
+        f.write('  # Idiom1         = %d\n' % self.count('shadow_exposed', iroot_pb2().IDIOM_1))
+        f.write('  # Idiom2         = %d\n' % self.count('shadow_exposed', iroot_pb2().IDIOM_2))
+        f.write('  # Idiom3         = %d\n' % self.count('shadow_exposed', iroot_pb2().IDIOM_3))
+        f.write('  # Idiom4         = %d\n' % self.count('shadow_exposed', iroot_pb2().IDIOM_4))
+        f.write('  # Idiom5         = %d\n' % self.count('shadow_exposed', iroot_pb2().IDIOM_5))
         f.write('# total candidates = %d\n' % len(self.candidate_map))
-        f.write('  # Idiom1         = %d\n' % len(self.get_candidates(iroot_pb2().IDIOM_1)))
-        f.write('  # Idiom2         = %d\n' % len(self.get_candidates(iroot_pb2().IDIOM_2)))
-        f.write('  # Idiom3         = %d\n' % len(self.get_candidates(iroot_pb2().IDIOM_3)))
-        f.write('  # Idiom4         = %d\n' % len(self.get_candidates(iroot_pb2().IDIOM_4)))
-        f.write('  # Idiom5         = %d\n' % len(self.get_candidates(iroot_pb2().IDIOM_5)))
+        f.write('  # Idiom1         = %d\n' % self.count('candidate', iroot_pb2().IDIOM_1))
+        f.write('  # Idiom2         = %d\n' % self.count('candidate', iroot_pb2().IDIOM_2))
+        f.write('  # Idiom3         = %d\n' % self.count('candidate', iroot_pb2().IDIOM_3))
+        f.write('  # Idiom4         = %d\n' % self.count('candidate', iroot_pb2().IDIOM_4))
+        f.write('  # Idiom5         = %d\n' % self.count('candidate', iroot_pb2().IDIOM_5))
         f.write('# total iroot_info = %d\n' % len(self.iroot_info_map))
     def display_exposed_set(self, f):
         for iroot_info in self.exposed_set:
@@ -279,76 +515,33 @@ class Memo(object):
 ##==============================================================
 ## my_save
 ##==============================================================
-    def my_update(self, db_name, all_exposed_set, all_failed_set, all_shadow_exposed_set):
-        del self.proto.iroot_info[:]
-        del self.proto.exposed[:]
-        del self.proto.failed[:]
-        del self.proto.predicted[:]
-        del self.proto.shadow_exposed[:]
-        del self.proto.candidate[:]
-        for iroot_id, iroot_info in self.iroot_info_map.iteritems():
-            iroot_info_proto = self.proto.iroot_info.add()
-            iroot_info_proto.iroot_id = iroot_id
-            iroot_info_proto.total_test_runs = iroot_info.total_test_runs()
-            if (iroot_info.has_async()):
-                iroot_info_proto.async = iroot_info.async()
-        for iroot_info in self.exposed_set:
-            self.proto.exposed.append(iroot_info.iroot().id())
-        for iroot_info in self.failed_set:
-            self.proto.failed.append(iroot_info.iroot().id())
-        for iroot_info in self.predicted_set:
-            self.proto.predicted.append(iroot_info.iroot().id())
-        for iroot_info in self.shadow_exposed_set:
-            self.proto.shadow_exposed.append(iroot_info.iroot().id())
-        for iroot_info, test_runs in self.candidate_map.iteritems():
-            if is_in_set(myIRoot(iroot_info.iroot()), all_exposed_set):
-                self.proto.exposed.append(iroot_info.iroot().id())
-            elif is_in_set(myIRoot(iroot_info.iroot()), all_failed_set):
-                self.proto.failed.append(iroot_info.iroot().id())
-            elif is_in_set(myIRoot(iroot_info.iroot()), all_shadow_exposed_set):
-                self.proto.shadow_exposed.append(iroot_info.iroot().id())
+    def my_update(self, db_name, all_exposed_set, all_failed_set, all_shadow_exposed_set, store=None):
+        pb = memo_pb2()
+        if store != None:
+            global_ids = store.global_ids(self)
+        for iroot_info in self.candidate_map.keys():
+            if store != None:
+                my_iroot = global_ids[iroot_info.proto.iroot_id]
             else:
-                cand_proto = self.proto.candidate.add()
-                cand_proto.iroot_id = iroot_info.iroot().id()
-                cand_proto.test_runs = test_runs
-        f = open(db_name, 'wb')
-        f.write(self.proto.SerializeToString())
-        f.close()
+                my_iroot = myIRoot(iroot_info.iroot())
+            if is_in_set(my_iroot, all_exposed_set):
+                self.resolve_candidate(iroot_info, pb.MEMO_DELTA_RESOLVE_EXPOSED)
+            elif is_in_set(my_iroot, all_failed_set):
+                self.resolve_candidate(iroot_info, pb.MEMO_DELTA_RESOLVE_FAILED)
+            elif is_in_set(my_iroot, all_shadow_exposed_set):
+                self.resolve_candidate(iroot_info, pb.MEMO_DELTA_RESOLVE_SHADOW_EXPOSED)
+        self.save(db_name)
     def my_updatep(self, db_name, all_exposed_set, all_failed_set, all_shadow_exposed_set):
-        del self.proto.iroot_info[:]
-        del self.proto.exposed[:]
-        del self.proto.failed[:]
-        del self.proto.predicted[:]
-        del self.proto.shadow_exposed[:]
-        del self.proto.candidate[:]
-        for iroot_id, iroot_info in self.iroot_info_map.iteritems():
-            iroot_info_proto = self.proto.iroot_info.add()
-            iroot_info_proto.iroot_id = iroot_id
-            iroot_info_proto.total_test_runs = iroot_info.total_test_runs()
-            if (iroot_info.has_async()):
-                iroot_info_proto.async = iroot_info.async()
-        for iroot_info in self.exposed_set:
-            self.proto.exposed.append(iroot_info.iroot().id())
-        for iroot_info in self.failed_set:
-            self.proto.failed.append(iroot_info.iroot().id())
-        for iroot_info in self.predicted_set:
-            self.proto.predicted.append(iroot_info.iroot().id())
-        for iroot_info in self.shadow_exposed_set:
-            self.proto.shadow_exposed.append(iroot_info.iroot().id())
-        for iroot_info, test_runs in self.candidate_map.iteritems():
-            if int(myIRootp(iroot_info.iroot()).event_list) in all_exposed_set:
-                self.proto.exposed.append(iroot_info.iroot().id())
-            elif int(myIRootp(iroot_info.iroot()).event_list) in all_failed_set:
-                self.proto.failed.append(iroot_info.iroot().id())
-            elif int(myIRootp(iroot_info.iroot()).event_list) in all_shadow_exposed_set:
-                self.proto.shadow_exposed.append(iroot_info.iroot().id())
-            else:
-                cand_proto = self.proto.candidate.add()
-                cand_proto.iroot_id = iroot_info.iroot().id()
-                cand_proto.test_runs = test_runs
-        f = open(db_name, 'wb')
-        f.write(self.proto.SerializeToString())
-        f.close()
+        pb = memo_pb2()
+        for iroot_info in self.candidate_map.keys():
+            event_list = int(myIRootp(iroot_info.iroot()).event_list)
+            if event_list in all_exposed_set:
+                self.resolve_candidate(iroot_info, pb.MEMO_DELTA_RESOLVE_EXPOSED)
+            elif event_list in all_failed_set:
+                self.resolve_candidate(iroot_info, pb.MEMO_DELTA_RESOLVE_FAILED)
+            elif event_list in all_shadow_exposed_set:
+                self.resolve_candidate(iroot_info, pb.MEMO_DELTA_RESOLVE_SHADOW_EXPOSED)
+        self.save(db_name)
 
 ##==============================================================
 ## Start
@@ -380,34 +573,17 @@ def iroot_event_type_name(t):
     else:
         return 'INVALID'
         
-def event_equal(e1, e2):
-    if e1.type != e2.type:
-        return False
-    if e1.inst_offset != e2.inst_offset:
-        return False
-    return True
-
 def is_in_set(myMemo_info, myIRoot_set):
-    if len(myIRoot_set) == 0:
-        return False
-    for myI in myIRoot_set:
-        if myMemo_info.idiom == myI.idiom:
-            length = len(myMemo_info.event_list)
-            count = 0
-            for idx in range(length):
-                if event_equal(myI.event_list[idx], myMemo_info.event_list[idx]):
-                    count += 1
-                else:
-                    break
-            if count == length:
-                return True
-    return False
+    # myIRoot hashes on its signature, so this is a plain set lookup.
+    return myMemo_info in myIRoot_set
 
 
 class myIRootEvent(object):
     def __init__(self, event):
         self.type = event.type()
         self.inst_offset = event.inst().offset()
+    def signature(self):
+        return (self.type, self.inst_offset)
     def __str__(self):
         content = []
         content.append('%-7s' % iroot_event_type_name(self.type))
@@ -422,6 +598,15 @@ class myIRoot(object):
         for idx in range(len(iroot_info.proto.event_id)):
             myE = myIRootEvent(iroot_info.event(idx))
             self.event_list.append(myE)
+        self.sig = (self.idiom, tuple([e.signature() for e in self.event_list]))
+    def signature(self):
+        return self.sig
+    def __hash__(self):
+        return hash(self.sig)
+    def __eq__(self, other):
+        return isinstance(other, myIRoot) and self.sig == other.sig
+    def __ne__(self, other):
+        return not self.__eq__(other)
     def __str__(self):
         content = []
         content.append('%-7s' % idiom_type_name(self.idiom))
@@ -444,11 +629,22 @@ class myMemo_old(object):
 """
 
 class myMemo(object):
-    def __init__(self, memo):
+    """ The iroot sets of a memoization database in a form that can be
+    compared across inputs: myIRoot signatures, or the global ids of the
+    iroot store if one is given.
+    """
+    def __init__(self, memo, store=None):
         self.exposed_set = set()
         self.failed_set = set()
         self.predicted_set = set()
         self.shadow_exposed_set = set()
+        if store != None:
+            global_ids = store.global_ids(memo)
+            for name in ['exposed_set', 'failed_set', 'predicted_set', 'shadow_exposed_set']:
+                my_set = getattr(self, name)
+                for iroot_info in getattr(memo, name):
+                    my_set.add(global_ids[iroot_info.proto.iroot_id])
+            return
         for iroot_info in memo.exposed_set:
             my_iRoot = myIRoot(iroot_info.iroot())
             self.exposed_set.add(my_iRoot)
@@ -473,9 +669,15 @@ class myCandidate_set(object):
 """
 
 class myCandidate(object):
-    def __init__(self, memo, testCase):
+    def __init__(self, memo, testCase, store=None):
         self.test_case = testCase
         self.candidate_map = {}
+        if store != None:
+            global_ids = store.global_ids(memo)
+            for iroot_info in memo.candidate_map.keys():
+                iroot_id = iroot_info.proto.iroot_id
+                self.candidate_map[iroot_id] = global_ids[iroot_id]
+            return
         for iroot_info in memo.candidate_map.keys():
             my_iRoot = myIRoot(iroot_info.iroot())
             self.candidate_map[iroot_info.iroot().id()] = my_iRoot
@@ -0,0 +1,250 @@
+"""Copyright 2011 The University of Michigan
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Authors - Jie Yu (jieyu@umich.edu)
+"""
+
+import os
+import errno
+import shutil
+import tempfile
+import multiprocessing
+from maple.core import static_info
+from maple.idiom import iroot
+from maple.idiom import memo
+
+def load_proto(proto, db_name):
+    if os.path.exists(db_name):
+        f = open(db_name, 'rb')
+        proto.ParseFromString(f.read())
+        f.close()
+    return proto
+
+class Merger(object):
+    """ Merge the static info, iroot and memoization databases written by
+    independent runs (e.g. in different directories). Iroot events are
+    matched by (inst, type) and iroots by (idiom, events), after the insts
+    are matched by the static info merger. The memoization databases are
+    merged with the same rules as Memo.merge.
+    """
+    def __init__(self):
+        self.sinfo = static_info.StaticInfoMerger()
+        self.iroot_proto = iroot.iroot_pb2().iRootDBProto()
+        self.event_ids = {}
+        self.iroot_ids = {}
+        self.max_event_id = 0
+        self.max_iroot_id = 0
+        self.iroot_info_map = {}
+        self.candidate_map = {}
+        self.id_sets = {}
+        self.generation = 0
+    def load(self, sinfo_name, iroot_name, memo_name):
+        """ Load the base databases, whose ids are kept. """
+        self.sinfo.load(sinfo_name)
+        self.iroot_proto = load_proto(iroot.iroot_pb2().iRootDBProto(), iroot_name)
+        event_map = {}
+        for event_proto in self.iroot_proto.event:
+            key = (event_proto.inst_id, event_proto.type)
+            self.event_ids.setdefault(key, event_proto.id)
+            event_map[event_proto.id] = self.event_ids[key]
+            self.max_event_id = max(self.max_event_id, event_proto.id)
+        for iroot_proto in self.iroot_proto.iroot:
+            key = (iroot_proto.idiom, tuple([event_map[e] for e in iroot_proto.event_id]))
+            self.iroot_ids.setdefault(key, iroot_proto.id)
+            self.max_iroot_id = max(self.max_iroot_id, iroot_proto.id)
+        base_memo = memo.load_proto(memo_name)
+        self.generation = base_memo.generation
+        self.merge_memo(base_memo, None)
+    def merge(self, sinfo_name, iroot_name, memo_name):
+        """ Merge the databases of another run, return the map from its
+        iroot ids to the iroot ids of the merged databases.
+        """
+        inst_map = self.sinfo.merge(sinfo_name)
+        other_iroot = load_proto(iroot.iroot_pb2().iRootDBProto(), iroot_name)
+        event_map = {}
+        for event_proto in other_iroot.event:
+            key = (inst_map[event_proto.inst_id], event_proto.type)
+            if not key in self.event_ids:
+                self.max_event_id += 1
+                new_event = self.iroot_proto.event.add()
+                new_event.id = self.max_event_id
+                new_event.inst_id = key[0]
+                new_event.type = key[1]
+                self.event_ids[key] = new_event.id
+            event_map[event_proto.id] = self.event_ids[key]
+        iroot_map = {}
+        for iroot_proto in other_iroot.iroot:
+            key = (iroot_proto.idiom, tuple([event_map[e] for e in iroot_proto.event_id]))
+            if not key in self.iroot_ids:
+                self.max_iroot_id += 1
+                new_iroot = self.iroot_proto.iroot.add()
+                new_iroot.id = self.max_iroot_id
+                new_iroot.idiom = key[0]
+                new_iroot.event_id.extend(key[1])
+                self.iroot_ids[key] = new_iroot.id
+            iroot_map[iroot_proto.id] = self.iroot_ids[key]
+        other_memo = memo.load_proto(memo_name)
+        self.merge_memo(other_memo, iroot_map)
+        return iroot_map
+    def merge_memo(self, other, iroot_map):
+        for info_proto in other.iroot_info:
+            iroot_id = info_proto.iroot_id
+            if iroot_map != None:
+                iroot_id = iroot_map[iroot_id]
+            if iroot_id in self.iroot_info_map:
+                (total_test_runs, async) = self.iroot_info_map[iroot_id]
+                total_test_runs = max(total_test_runs, info_proto.total_test_runs)
+                if info_proto.HasField('async') and info_proto.async:
+                    async = True
+                self.iroot_info_map[iroot_id] = (total_test_runs, async)
+            else:
+                async = None
+                if info_proto.HasField('async'):
+                    async = info_proto.async
+                self.iroot_info_map[iroot_id] = (info_proto.total_test_runs, async)
+        for name in ['exposed', 'failed', 'predicted', 'shadow_exposed']:
+            id_set = self.id_sets.setdefault(name, set())
+            for iroot_id in getattr(other, name):
+                if iroot_map != None:
+                    iroot_id = iroot_map[iroot_id]
+                id_set.add(iroot_id)
+        for cand_proto in other.candidate:
+            iroot_id = cand_proto.iroot_id
+            if iroot_map != None:
+                iroot_id = iroot_map[iroot_id]
+            test_runs = self.candidate_map.get(iroot_id, 0)
+            self.candidate_map[iroot_id] = max(test_runs, cand_proto.test_runs)
+    def save(self, sinfo_name, iroot_name, memo_name):
+        self.sinfo.save(sinfo_name)
+        static_info.save_proto(self.iroot_proto, iroot_name)
+        proto = memo.memo_pb2().MemoProto()
+        for iroot_id in sorted(self.iroot_info_map.keys()):
+            (total_test_runs, async) = self.iroot_info_map[iroot_id]
+            info_proto = proto.iroot_info.add()
+            info_proto.iroot_id = iroot_id
+            info_proto.total_test_runs = total_test_runs
+            if async != None:
+                info_proto.async = async
+        for name in ['exposed', 'failed', 'predicted', 'shadow_exposed']:
+            getattr(proto, name).extend(sorted(self.id_sets.get(name, set())))
+        for iroot_id in sorted(self.candidate_map.keys()):
+            cand_proto = proto.candidate.add()
+            cand_proto.iroot_id = iroot_id
+            cand_proto.test_runs = self.candidate_map[iroot_id]
+        proto.generation = self.generation + 1
+        memo.save_snapshot_proto(proto, memo_name)
+
+def merge_pair(job):
+    """ Merge the databases of two runs into new ones, return the iroot
+    id map of the second run.
+    """
+    (base, other, out) = job
+    merger = Merger()
+    merger.load(*base)
+    iroot_map = merger.merge(*other)
+    merger.save(*out)
+    return iroot_map
+
+def iroot_ids(iroot_name):
+    iroot_proto = load_proto(iroot.iroot_pb2().iRootDBProto(), iroot_name)
+    return [iroot_proto.id for iroot_proto in iroot_proto.iroot]
+
+class TreeMerger(object):
+    """ Merge the databases of many runs as a tree reduction. At each
+    level, neighbouring pairs are merged by a pool of worker processes,
+    so n runs take about log2(n) rounds. The first run keeps its ids,
+    the iroot ids of the other runs are remapped.
+    """
+    def __init__(self, num_workers=multiprocessing.cpu_count()):
+        self.num_workers = num_workers
+    def merge(self, inputs, outputs):
+        """ Merge the (sinfo, iroot, memo) database names in inputs into
+        the ones in outputs. Return, for each input, the map from its
+        iroot ids to the iroot ids of the merged databases.
+        """
+        maps = []
+        for names in inputs:
+            maps.append(dict([(iroot_id, iroot_id) for iroot_id in iroot_ids(names[1])]))
+        level = list(inputs)
+        members = [[idx] for idx in range(len(inputs))]
+        work_dir = tempfile.mkdtemp(prefix='merge.', dir=os.path.dirname(os.path.abspath(outputs[2])))
+        pool = None
+        if self.num_workers > 1 and len(inputs) > 2:
+            pool = multiprocessing.Pool(self.num_workers)
+        try:
+            depth = 0
+            while len(level) > 1:
+                level_dir = os.path.join(work_dir, str(depth))
+                os.mkdir(level_dir)
+                for names in level:
+                    # a lost partial result would be read as an empty run
+                    if names[0].startswith(work_dir + os.sep):
+                        for name in names:
+                            if not os.path.exists(name):
+                                raise IOError(errno.ENOENT, 'missing partial merge result', name)
+                jobs = []
+                for k in range(0, len(level) - 1, 2):
+                    out = tuple([os.path.join(level_dir, '%d.%s' % (k, os.path.basename(name))) for name in outputs])
+                    jobs.append((level[k], level[k + 1], out))
+                if pool != None:
+                    results = pool.map(merge_pair, jobs)
+                else:
+                    results = map(merge_pair, jobs)
+                next_level = []
+                next_members = []
+                for (j, iroot_map) in enumerate(results):
+                    k = j * 2
+                    for idx in members[k + 1]:
+                        maps[idx] = dict([(old, iroot_map[new]) for (old, new) in maps[idx].iteritems()])
+                    next_level.append(jobs[j][2])
+                    next_members.append(members[k] + members[k + 1])
+                if len(level) % 2 == 1:
+                    carried = level[-1]
+                    if depth > 0 and carried[0].startswith(work_dir + os.sep):
+                        # move it out of the level directory removed below
+                        carried = tuple([os.path.join(level_dir, os.path.basename(name)) for name in carried])
+                        for (old, new) in zip(level[-1], carried):
+                            os.rename(old, new)
+                    next_level.append(carried)
+                    next_members.append(members[-1])
+                if depth > 0:
+                    shutil.rmtree(os.path.join(work_dir, str(depth - 1)))
+                level = next_level
+                members = next_members
+                depth += 1
+            if len(level) == 1:
+                merger = Merger()
+                merger.load(*level[0])
+                merger.save(*outputs)
+            if pool != None:
+                pool.close()
+        except:
+            if pool != None:
+                pool.terminate()
+            raise
+        finally:
+            if pool != None:
+                pool.join()
+            shutil.rmtree(work_dir)
+        return maps
+
+def save_remap(inputs, maps, name):
+    """ Write the iroot id maps of a tree merge, one line per iroot:
+    <input iroot database> <old iroot id> <merged iroot id>
+    """
+    f = open(name, 'w')
+    for (names, iroot_map) in zip(inputs, maps):
+        for old_id in sorted(iroot_map.keys()):
+            f.write('%s %d %d\n' % (names[1], old_id, iroot_map[old_id]))
+    f.close()
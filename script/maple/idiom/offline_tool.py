@@ -16,8 +16,11 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import subprocess
 from maple.core import config
+from maple.core import logging
 from maple.core import offline_tool
+from maple.idiom import pintool
 
 class MemoTool(offline_tool.OfflineTool):
     def __init__(self):
@@ -36,3 +39,69 @@ class MemoTool(offline_tool.OfflineTool):
     def bin_path(self):
         return os.path.join(config.build_home(self.debug), 'idiom_memo_tool')
 
+class OfflinePredictor(offline_tool.OfflineTool):
+    """ Run the iroot predictor (NEW) on a trace log recorded by the
+    tracer profiler, instead of on a live run under Pin.
+    """
+    def __init__(self):
+        offline_tool.OfflineTool.__init__(self, 'idiom_offline_predictor')
+        self.register_knob('debug_out', 'string', 'stdout', 'the output file for the debug messages')
+        self.register_knob('trace_log_path', 'string', 'trace-log', 'the trace log path', 'PATH')
+        self.register_knob('memo_failed', 'bool', True, 'whether memoize fail-to-expose iroots')
+        self.register_knob('sinfo_in', 'string', 'sinfo.db', 'the input static info database path', 'PATH')
+        self.register_knob('sinfo_out', 'string', 'sinfo.db', 'the output static info database path', 'PATH')
+        self.register_knob('iroot_in', 'string', 'iroot.db', 'the input iroot database path', 'PATH')
+        self.register_knob('iroot_out', 'string', 'iroot.db', 'the output iroot database path', 'PATH')
+        self.register_knob('memo_in', 'string', 'memo.db', 'the input memoization database path', 'PATH')
+        self.register_knob('memo_out', 'string', 'memo.db', 'the output memoization database path', 'PATH')
+        self.register_knob('sinst_in', 'string', 'sinst.db', 'the input shared inst database path', 'PATH')
+        self.merge_knob(pintool.PredictorNew())
+    def bin_path(self):
+        return os.path.join(config.build_home(self.debug), 'idiom_offline_predictor')
+
+
+class MemoServer(object):
+    """ Keep a memo tool running in server mode, so that the databases
+    are loaded once and then queried many times over a pipe. Call
+    reload() whenever the databases are changed on disk.
+    """
+    def __init__(self, memo_tool):
+        self.memo_tool = memo_tool
+        self.memo_tool.knobs['operation'] = 'server'
+        self.memo_tool.knobs['debug_out'] = 'stderr'
+        self.proc = None
+        self.stale = False
+    def start(self):
+        self.proc = subprocess.Popen(self.memo_tool.cmd(), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.stale = False
+    def stop(self):
+        if self.proc != None:
+            self.proc.stdin.write('quit\n')
+            self.proc.stdin.close()
+            self.proc.wait()
+            self.proc = None
+    def reload(self):
+        # reloading is deferred to the next query
+        self.stale = True
+    def query(self, operation, *args):
+        if self.proc == None:
+            self.start()
+        elif self.stale:
+            self.request('reload')
+            self.stale = False
+        return self.request(operation, *args)
+    def request(self, operation, *args):
+        line = ' '.join([operation] + [str(a) for a in args])
+        self.proc.stdin.write(line + '\n')
+        self.proc.stdin.flush()
+        output = []
+        while True:
+            line = self.proc.stdout.readline()
+            if line == '':
+                self.proc.wait()
+                self.proc = None
+                logging.err('memo server exited during "%s"\n' % operation)
+            if line == '.\n':
+                break
+            output.append(line)
+        return ''.join(output)
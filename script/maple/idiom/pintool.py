@@ -103,6 +103,7 @@ class PctProfiler(Profiler):
         self.register_knob('depth', 'int', 3, 'the target bug depth', 'DEPTH')
         self.register_knob('count_mem', 'bool', True, 'whether use the number of memory accesses as thread counter')
         self.register_knob('pct_history', 'string', 'pct.histo', 'the pct history file path', 'PATH')
+        self.register_knob('seed', 'int', 0, 'the random seed (0 means seed from the time)', 'SEED')
     def so_path(self):
         return os.path.join(config.build_home(self.debug), 'idiom_pct_profiler.so')
 
@@ -116,6 +117,7 @@ class RandSchedProfiler(Profiler):
         self.register_knob('float_interval', 'int', 50000, 'average number of memory accesses between two change points', 'N')
         self.register_knob('num_chg_pts', 'int', 3, 'number of change points (when float is set to False)', 'N')
         self.register_knob('rand_history', 'string', 'rand.histo', 'the rand history file path', 'PATH')
+        self.register_knob('seed', 'int', 0, 'the random seed (0 means seed from the time)', 'SEED')
     def so_path(self):
         return os.path.join(config.build_home(self.debug), 'idiom_randsched_profiler.so')
 
@@ -0,0 +1,208 @@
+"""Copyright 2011 The University of Michigan
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Authors - Jie Yu (jieyu@umich.edu)
+"""
+
+import time
+import heapq
+import weakref
+from maple.core import logging
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+class TimeUp(Exception):
+    pass
+
+class Selector(object):
+    """ Choose a small set of candidate inputs whose candidate iroots
+    cover a target set of iroots (set cover). Iroots are interned to bit
+    positions, so that the candidate sets of the inputs are bitsets.
+
+    mode 'greedy' : lazy greedy (CELF), at most ln(n)+1 times the optimum.
+    mode 'exact'  : branch and bound seeded with the greedy cover. The
+                    best cover found within time_limit seconds is used.
+    """
+    def __init__(self, mode='greedy', time_limit=10.0):
+        self.mode = mode
+        self.time_limit = time_limit
+        self.bits = {}
+        self.masks = weakref.WeakKeyDictionary()
+    def bitset(self, keys):
+        mask = 0
+        for key in keys:
+            if not key in self.bits:
+                self.bits[key] = len(self.bits)
+            mask |= 1 << self.bits[key]
+        return mask
+    def candidate_mask(self, candidate):
+        # the candidate set of an input never changes once profiled
+        if not candidate in self.masks:
+            self.masks[candidate] = self.bitset(candidate.candidate_set)
+        return self.masks[candidate]
+    def cover(self, candidates, target):
+        """ Return a list of candidates covering the target keys. """
+        target_mask = self.bitset(target)
+        entries = []
+        for candidate in candidates:
+            mask = self.candidate_mask(candidate) & target_mask
+            if mask != 0:
+                entries.append((mask, candidate))
+        chosen = self.greedy(entries, target_mask)
+        if self.mode == 'exact' and len(chosen) > 1:
+            chosen = self.exact(entries, target_mask, chosen)
+        return [entries[idx][1] for idx in chosen]
+    def greedy(self, entries, target_mask):
+        uncovered = target_mask
+        heap = [(-popcount(mask), idx) for (idx, (mask, c)) in enumerate(entries)]
+        heapq.heapify(heap)
+        chosen = []
+        while uncovered != 0 and len(heap) != 0:
+            (neg_gain, idx) = heapq.heappop(heap)
+            gain = popcount(entries[idx][0] & uncovered)
+            if gain == 0:
+                continue
+            # gains only shrink, so a still-current gain is the maximum
+            if len(heap) == 0 or gain >= -heap[0][0]:
+                chosen.append(idx)
+                uncovered &= ~entries[idx][0]
+            else:
+                heapq.heappush(heap, (-gain, idx))
+        return chosen
+    def exact(self, entries, target_mask, best):
+        self.best = list(best)
+        self.deadline = time.time() + self.time_limit
+        # for each bit, the entries covering it, largest first
+        self.covering = {}
+        order = sorted(range(len(entries)), key=lambda idx: -popcount(entries[idx][0]))
+        for idx in order:
+            mask = entries[idx][0]
+            while mask != 0:
+                low = mask & -mask
+                self.covering.setdefault(low, []).append(idx)
+                mask ^= low
+        try:
+            self.search(entries, target_mask, [])
+        except TimeUp:
+            pass
+        return self.best
+    def search(self, entries, uncovered, chosen):
+        if uncovered == 0:
+            if len(chosen) < len(self.best):
+                self.best = list(chosen)
+            return
+        if time.time() > self.deadline:
+            raise TimeUp()
+        # lower bound: the remaining bits need at least this many inputs
+        max_gain = max([popcount(entries[idx][0] & uncovered) for idx in range(len(entries))])
+        need = (popcount(uncovered) + max_gain - 1) / max_gain
+        if len(chosen) + need >= len(self.best):
+            return
+        # branch on the uncovered bit with the fewest covering inputs
+        low = None
+        mask = uncovered
+        while mask != 0:
+            bit = mask & -mask
+            if low == None or len(self.covering[bit]) < len(self.covering[low]):
+                low = bit
+            mask ^= bit
+        for idx in self.covering[low]:
+            chosen.append(idx)
+            self.search(entries, uncovered & ~entries[idx][0], chosen)
+            chosen.pop()
+
+class ResolvedSet(set):
+    """ A set of resolved iroots which also keeps the order in which they
+    were added, so that CoverageMatrix.sync only folds in the new ones.
+    It only grows through add().
+    """
+    def __init__(self):
+        set.__init__(self)
+        self.added = []
+    def add(self, key):
+        if not key in self:
+            set.add(self, key)
+            self.added.append(key)
+
+class CoverageMatrix(object):
+    """ The candidate iroots of each input as a bitset over interned
+    iroots, with one mask per kind of resolved iroots (exposed, failed,
+    shadow exposed). The masks are synced incrementally with the global
+    sets of a campaign, which only ever grow.
+    """
+    def __init__(self):
+        self.bits = {}
+        self.rows = weakref.WeakKeyDictionary()
+        self.resolved = [0, 0, 0]
+        self.synced = [0, 0, 0]
+    def bit(self, key):
+        if not key in self.bits:
+            self.bits[key] = len(self.bits)
+        return self.bits[key]
+    def row(self, candidate):
+        # (mask, {bit: candidate iroot id}) of an input
+        if not candidate in self.rows:
+            mask = 0
+            ids = {}
+            for (candidate_id, my_iroot) in candidate.candidate_map.iteritems():
+                bit = self.bit(my_iroot)
+                mask |= 1 << bit
+                ids[bit] = candidate_id
+            self.rows[candidate] = (mask, ids)
+        return self.rows[candidate]
+    def sync(self, exposed_set, failed_set, shadow_exposed_set):
+        """ Fold the iroots resolved since the last sync into the masks.
+        For a ResolvedSet, only the keys added since then are walked,
+        a plain set is walked whenever it has grown.
+        """
+        for (kind, resolved_set) in enumerate([exposed_set, failed_set, shadow_exposed_set]):
+            if isinstance(resolved_set, ResolvedSet):
+                new_keys = resolved_set.added[self.synced[kind]:]
+            elif len(resolved_set) != self.synced[kind]:
+                new_keys = resolved_set
+            else:
+                continue
+            mask = self.resolved[kind]
+            for key in new_keys:
+                mask |= 1 << self.bit(key)
+            self.resolved[kind] = mask
+            self.synced[kind] = len(resolved_set)
+    def unresolved(self, candidate):
+        resolved = self.resolved[0] | self.resolved[1] | self.resolved[2]
+        return self.row(candidate)[0] & ~resolved
+    def best(self, candidates):
+        """ Return (test case, count, candidate iroot ids) of the input
+        with the most unresolved candidate iroots.
+        """
+        max_count = 0
+        best_candidate = None
+        best_mask = 0
+        for candidate in candidates:
+            mask = self.unresolved(candidate)
+            count = popcount(mask)
+            logging.msg('%s : count = %d\n' % (candidate.test_case, count), 2)
+            if count > max_count:
+                max_count = count
+                best_candidate = candidate
+                best_mask = mask
+        if best_candidate == None:
+            return (None, 0, set())
+        id_set = set()
+        ids = self.row(best_candidate)[1]
+        while best_mask != 0:
+            low = best_mask & -best_mask
+            id_set.add(ids[low.bit_length() - 1])
+            best_mask ^= low
+        return (best_candidate.test_case, max_count, id_set)
@@ -0,0 +1,120 @@
+"""Copyright 2011 The University of Michigan
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Authors - Jie Yu (jieyu@umich.edu)
+"""
+
+import os
+import collections
+from maple.core import static_info
+from maple.idiom import iroot
+from maple.idiom import memo
+
+def file_key(db_name):
+    """ Return the cache key of a database file: its real path, size and
+    modification time. A missing file has no size and no mtime.
+    """
+    path = os.path.realpath(db_name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_size, st.st_mtime)
+
+def memo_key(db_name):
+    """ Return the cache key of a memoization database, which includes
+    the state of its journal.
+    """
+    return file_key(db_name) + file_key(memo.journal_name(db_name))[1:]
+
+class Session(object):
+    """ Cache the loaded static info, iroot and memoization databases
+    across the iterations of a campaign. An object is handed out again
+    as long as its file (and the files it depends on) did not change on
+    disk, otherwise the file is parsed again.
+    """
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.sinfo_cache = collections.OrderedDict()
+        self.iroot_cache = collections.OrderedDict()
+        self.memo_cache = collections.OrderedDict()
+    def lookup(self, cache, key, deps):
+        path = key[0]
+        if not path in cache:
+            return None
+        entry = cache[path]
+        if entry[0] != key or entry[1] != deps:
+            del cache[path]
+            return None
+        # refresh the LRU position
+        del cache[path]
+        cache[path] = entry
+        return entry[2]
+    def insert(self, cache, key, deps, obj):
+        cache[key[0]] = (key, deps, obj)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+    def load_sinfo(self, sinfo_name):
+        key = file_key(sinfo_name)
+        sinfo = self.lookup(self.sinfo_cache, key, None)
+        if sinfo == None:
+            sinfo = static_info.StaticInfo()
+            sinfo.load(sinfo_name)
+            self.insert(self.sinfo_cache, key, None, sinfo)
+        return sinfo
+    def load_iroot_db(self, sinfo_name, iroot_name):
+        sinfo = self.load_sinfo(sinfo_name)
+        key = file_key(iroot_name)
+        deps = id(sinfo)
+        iroot_db = self.lookup(self.iroot_cache, key, deps)
+        if iroot_db == None:
+            iroot_db = iroot.iRootDB(sinfo)
+            iroot_db.load(iroot_name)
+            self.insert(self.iroot_cache, key, deps, iroot_db)
+        return iroot_db
+    def load_memo(self, sinfo_name, iroot_name, memo_name):
+        iroot_db = self.load_iroot_db(sinfo_name, iroot_name)
+        key = memo_key(memo_name)
+        deps = id(iroot_db)
+        memo_db = self.lookup(self.memo_cache, key, deps)
+        if memo_db == None:
+            memo_db = memo.Memo(iroot_db.sinfo, iroot_db)
+            memo_db.load(memo_name)
+            self.insert(self.memo_cache, key, deps, memo_db)
+        return memo_db
+    def load(self, sinfo_name='sinfo.db', iroot_name='iroot.db', memo_name='memo.db'):
+        memo_db = self.load_memo(sinfo_name, iroot_name, memo_name)
+        return (memo_db.sinfo, memo_db.iroot_db, memo_db)
+    def sync(self, db_name):
+        """ Record that the cached object of the given file has just been
+        written back to it, so that it stays valid for the new file.
+        """
+        for (cache, key) in [(self.sinfo_cache, file_key(db_name)),
+                             (self.iroot_cache, file_key(db_name)),
+                             (self.memo_cache, memo_key(db_name))]:
+            if key[0] in cache:
+                entry = cache[key[0]]
+                cache[key[0]] = (key, entry[1], entry[2])
+    def invalidate(self, db_name):
+        """ Forget the object loaded from the given file. Call this after
+        writing a file whose cached object is no longer in sync with it.
+        """
+        path = os.path.realpath(db_name)
+        for cache in [self.sinfo_cache, self.iroot_cache, self.memo_cache]:
+            if path in cache:
+                del cache[path]
+    def clear(self):
+        self.sinfo_cache.clear()
+        self.iroot_cache.clear()
+        self.memo_cache.clear()
@@ -0,0 +1,117 @@
+"""Copyright 2011 The University of Michigan
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Authors - Jie Yu (jieyu@umich.edu)
+"""
+
+import os
+import random
+from maple.core import static_info
+from maple.idiom import iroot
+
+def ref_name(memo_db):
+    """ Return the reference table path of the input directory of a
+    memoization database, None if the database has no file yet.
+    """
+    if memo_db.db_name == None:
+        return None
+    return os.path.join(os.path.dirname(memo_db.db_name), 'iroot_ref.db')
+
+def signature(my_iroot):
+    events = []
+    for idx in range(len(my_iroot.proto.event_id)):
+        event = my_iroot.event(idx)
+        inst = event.inst()
+        events.append((inst.image().name(), inst.offset(), event.type()))
+    return (my_iroot.idiom(), tuple(events))
+
+class iRootStore(object):
+    """ Intern the iroots of all the inputs of a campaign by content, so
+    that each iroot gets one stable global id. Each input directory keeps
+    a reference table from its own iroot ids to the global ids, so that
+    its iroot database is only walked for the iroots it has not seen.
+    """
+    def __init__(self):
+        self.proto = iroot.iroot_pb2().iRootStoreProto()
+        self.proto.tag = random.getrandbits(63)
+        self.ids = {}
+        self.db_name = None
+        self.num_saved = 0
+    def load(self, db_name):
+        self.db_name = os.path.realpath(db_name)
+        if not os.path.exists(db_name):
+            return
+        f = open(db_name, 'rb')
+        self.proto.ParseFromString(f.read())
+        f.close()
+        for entry_proto in self.proto.iroot:
+            events = [(e.image, e.offset, e.type) for e in entry_proto.event]
+            self.ids[(entry_proto.idiom, tuple(events))] = entry_proto.id
+        self.num_saved = len(self.proto.iroot)
+    def save(self):
+        if self.db_name == None or self.num_saved == len(self.proto.iroot):
+            return
+        static_info.save_proto(self.proto, self.db_name)
+        self.num_saved = len(self.proto.iroot)
+    def size(self):
+        return len(self.proto.iroot)
+    def intern(self, my_iroot):
+        """ Return the global id of an iroot, adding it if it is new. """
+        sig = signature(my_iroot)
+        if not sig in self.ids:
+            entry_proto = self.proto.iroot.add()
+            entry_proto.id = len(self.proto.iroot)
+            entry_proto.idiom = sig[0]
+            for (image, offset, event_type) in sig[1]:
+                event_proto = entry_proto.event.add()
+                event_proto.image = image
+                event_proto.offset = offset
+                event_proto.type = event_type
+            self.ids[sig] = entry_proto.id
+        return self.ids[sig]
+    def global_ids(self, memo_db):
+        """ Return the map from the iroot ids of a memoization database to
+        the global ids, updating the reference table of its directory.
+        """
+        name = ref_name(memo_db)
+        ref_proto = iroot.iroot_pb2().iRootRefProto()
+        if name != None and os.path.exists(name):
+            f = open(name, 'rb')
+            ref_proto.ParseFromString(f.read())
+            f.close()
+        iroot_db = memo_db.iroot_db
+        if (ref_proto.tag != self.proto.tag or
+            ref_proto.iroot_size != iroot_db.db_size or
+            ref_proto.iroot_crc != iroot_db.db_crc):
+            # the table was built for another store or iroot database
+            ref_proto = iroot.iroot_pb2().iRootRefProto()
+            ref_proto.tag = self.proto.tag
+            ref_proto.iroot_size = iroot_db.db_size
+            ref_proto.iroot_crc = iroot_db.db_crc
+            rebuilt = True
+        else:
+            rebuilt = False
+        results = dict(zip(ref_proto.local_id, ref_proto.global_id))
+        num_refs = len(results)
+        for iroot_id in memo_db.iroot_info_map:
+            if not iroot_id in results:
+                results[iroot_id] = self.intern(iroot_db.find_iroot(iroot_id))
+                ref_proto.local_id.append(iroot_id)
+                ref_proto.global_id.append(results[iroot_id])
+        if rebuilt or len(results) != num_refs:
+            # the store is saved first, so a table never names unsaved ids
+            self.save()
+            if name != None:
+                static_info.save_proto(ref_proto, name)
+        return results
@@ -16,44 +16,69 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import atexit
 from maple.core import config
 from maple.core import logging
 from maple.core import static_info
 from maple.core import pintool
+from maple.core import saturation
 from maple.core import testing
 from maple.idiom import offline_tool
+from maple.idiom import merge
+from maple.pct import history as pct_history
 from maple.race import testing as race_testing
 from maple.systematic import testing as systematic_testing
 
+_memo_servers = {}
+
+def memo_server(tool):
+    """ Return the memo server on the databases written by the tool. """
+    key = (os.path.realpath(tool.knobs['sinfo_out']),
+           os.path.realpath(tool.knobs['iroot_out']),
+           os.path.realpath(tool.knobs['memo_out']))
+    if not key in _memo_servers:
+        memo_tool = offline_tool.MemoTool()
+        memo_tool.knobs['sinfo_in'] = key[0]
+        memo_tool.knobs['iroot_in'] = key[1]
+        memo_tool.knobs['memo_in'] = key[2]
+        _memo_servers[key] = offline_tool.MemoServer(memo_tool)
+    return _memo_servers[key]
+
+def reload_memo(tool):
+    memo_server(tool).reload()
+
+def stop_memo_servers():
+    for server in _memo_servers.values():
+        server.stop()
+    _memo_servers.clear()
+
+atexit.register(stop_memo_servers)
+
 def has_candidate(tool):
-    memo_tool = offline_tool.MemoTool()
-    memo_tool.knobs['operation'] = 'has_candidate'
-    memo_tool.knobs['arg'] = str(tool.knobs['target_idiom'])
-    memo_tool.knobs['sinfo_in'] = tool.knobs['sinfo_out']
-    memo_tool.knobs['iroot_in'] = tool.knobs['iroot_out']
-    memo_tool.knobs['memo_in'] = tool.knobs['memo_out']
-    stdout, stderr = memo_tool.run()
+    stdout = memo_server(tool).query('has_candidate', tool.knobs['target_idiom'])
     if int(stdout) != 0:
         return True
     else:
         return False
 
 def predicted_size(tool):
-    memo_tool = offline_tool.MemoTool()
-    memo_tool.knobs['operation'] = 'total_predicted'
-    memo_tool.knobs['sinfo_in'] = tool.knobs['sinfo_out']
-    memo_tool.knobs['iroot_in'] = tool.knobs['iroot_out']
-    memo_tool.knobs['memo_in'] = tool.knobs['memo_out']
-    stdout, stderr = memo_tool.run()
+    stdout = memo_server(tool).query('total_predicted')
     return int(stdout)
 
+def merge_worker(tool, test):
+    """ Merge the databases written by a parallel worker into the ones
+    named by the tool.
+    """
+    merger = merge.Merger()
+    merger.load(tool.knobs['sinfo_out'], tool.knobs['iroot_out'], tool.knobs['memo_out'])
+    merger.merge(testing.worker_path(test, tool.knobs['sinfo_out']),
+                 testing.worker_path(test, tool.knobs['iroot_out']),
+                 testing.worker_path(test, tool.knobs['memo_out']))
+    merger.save(tool.knobs['sinfo_out'], tool.knobs['iroot_out'], tool.knobs['memo_out'])
+    testing.cleanup_worker_dir(test)
+
 def log_coverage(tool, used_time):
-    memo_tool = offline_tool.MemoTool()
-    memo_tool.knobs['operation'] = 'total_exposed'
-    memo_tool.knobs['sinfo_in'] = tool.knobs['sinfo_out']
-    memo_tool.knobs['iroot_in'] = tool.knobs['iroot_out']
-    memo_tool.knobs['memo_in'] = tool.knobs['memo_out']
-    stdout, stderr = memo_tool.run()
+    stdout = memo_server(tool).query('total_exposed')
     exposed = stdout.split()
     f = open('coverage', 'a')
     f.write('%-25s ' % tool.name)
@@ -64,6 +89,7 @@ def log_coverage(tool, used_time):
     f.write('%-6d ' % int(exposed[3]))
     f.write('%-6d\n' % int(exposed[4]))
     f.close()
+    return sum([int(e) for e in exposed])
 
 class NativeTestCase(testing.DeathTestCase):
     def __init__(self, test, mode, threshold):
@@ -94,17 +120,45 @@ class RandomTestCase(testing.DeathTestCase):
         iteration = len(self.test_history)
         used_time = self.test_history[-1].used_time()
         logging.msg('=== random iteration %d done === (%f) (%s)\n' % (iteration, used_time, os.getcwd()))
+        reload_memo(self.profiler)
         log_coverage(self.profiler, used_time)
+        test = self.test_history[-1]
+        if test.is_fatal():
+            pct_history.mark_fatal(self.profiler, test.seed)
     def after_all_tests(self):
+        stop_memo_servers()
         if self.is_fatal():
             logging.msg('random fatal error detected\n')
         else:
             logging.msg('random threshold reached\n')
+        history = pct_history.load_history(self.profiler, self.profiler.knobs[pct_history.history_name(self.profiler)])
+        for (depth, runs, hits) in history.hit_rates():
+            logging.msg('%-15s %f (depth %d, %d/%d)\n' % ('hit_rate', float(hits) / runs, depth, hits, runs))
+    def before_each_test(self):
+        if self.workers <= 1 and not self.fork_server:
+            # the sequential loop has already added the test
+            trial = len(self.test_history) - 1
+            pct_history.set_seed(self.test_history[-1], pct_history.next_seed(self.profiler, trial))
+    def prepare_worker(self, test, idx):
+        testing.setup_worker_dir(test, self.profiler, idx)
+        trial = len(self.test_history) + idx
+        pct_history.set_seed(test, pct_history.next_seed(self.profiler, trial))
+    def merge_worker(self, test, idx):
+        pct_history.merge_history(self.profiler, test)
+        merge_worker(self.profiler, test)
+    def discard_worker(self, test, idx):
+        testing.cleanup_worker_dir(test)
     def log_stat(self):
         runs = len(self.test_history)
         used_time = self.used_time()
         logging.msg('%-15s %d\n' % ('random_runs', runs))
         logging.msg('%-15s %f\n' % ('random_time', used_time))
+        if runs > 0 and pct_history.history_name(self.profiler) == 'pct_history':
+            history = pct_history.load_history(self.profiler, self.profiler.knobs['pct_history'])
+            if history.num_runs() > 0:
+                remaining = history.remaining_runs(self.profiler.knobs['depth'], 0.95)
+                logging.msg('%-15s %d\n' % ('pct_remaining', remaining))
+                logging.msg('%-15s %f\n' % ('pct_eta', remaining * used_time / runs))
 
 class ProfileTestCase(testing.DeathTestCase):
     def __init__(self, test, mode, threshold, profiler):
@@ -112,9 +166,16 @@ class ProfileTestCase(testing.DeathTestCase):
         self.profiler = profiler
         self.predicted_size = 0
         self.stable_cnt = 0
+        self.epsilon = None
+        self.curve = saturation.DiscoveryCurve()
     def threshold_check(self):
         if testing.DeathTestCase.threshold_check(self):
             return True
+        if self.mode == 'stable' and self.epsilon != None:
+            # stop once the next run is expected to expose few new iroots
+            expected = self.curve.expected_new()
+            logging.msg('expected new iroots per run = %f\n' % expected)
+            return self.curve.saturated(self.epsilon, max(int(self.threshold), 2))
         if self.mode == 'stable':
             size = predicted_size(self.profiler)
             if size != self.predicted_size:
@@ -129,12 +190,26 @@ class ProfileTestCase(testing.DeathTestCase):
         iteration = len(self.test_history)
         used_time = self.test_history[-1].used_time()
         logging.msg('=== profile iteration %d done === (%f) (%s)\n' % (iteration, used_time, os.getcwd()))
-        log_coverage(self.profiler, used_time)
+        reload_memo(self.profiler)
+        self.curve.add(log_coverage(self.profiler, used_time))
     def after_all_tests(self):
+        stop_memo_servers()
         if self.is_fatal():
             logging.msg('profile fatal error detected\n')
         else:
             logging.msg('profile threshold reached\n')
+    def prepare_worker(self, test, idx):
+        testing.setup_worker_dir(test, self.profiler, idx)
+        if pct_history.history_name(self.profiler) != None:
+            # workers started in the same second must not share a seed
+            trial = len(self.test_history) + idx
+            pct_history.set_seed(test, pct_history.next_seed(self.profiler, trial))
+    def merge_worker(self, test, idx):
+        if pct_history.history_name(self.profiler) != None:
+            pct_history.merge_history(self.profiler, test)
+        merge_worker(self.profiler, test)
+    def discard_worker(self, test, idx):
+        testing.cleanup_worker_dir(test)
     def log_stat(self):
         runs = len(self.test_history)
         used_time = self.used_time()
@@ -155,8 +230,10 @@ class ActiveTestCase(testing.DeathTestCase):
         iteration = len(self.test_history)
         used_time = self.test_history[-1].used_time()
         logging.msg('=== active iteration %d done === (%f) (%s)\n' % (iteration, used_time, os.getcwd()))
+        reload_memo(self.scheduler)
         log_coverage(self.scheduler, used_time)
     def after_all_tests(self):
+        stop_memo_servers()
         if self.is_fatal():
             logging.msg('active fatal error detected\n')
         else:
@@ -208,6 +285,7 @@ class ChessTestCase(systematic_testing.ChessTestCase):
     def after_each_test(self):
         systematic_testing.ChessTestCase.after_each_test(self)
         used_time = self.test_history[-1].used_time()
+        reload_memo(self.controller)
         log_coverage(self.controller, used_time)
 
 class ChessRaceTestCase(systematic_testing.ChessRaceTestCase):
@@ -16,11 +16,19 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import math
+import random
+from maple.core import logging
 from maple.core import proto
+from maple.core import static_info
+from maple.core import testing
 
 def history_pb2():
     return proto.module('pct.history_pb2')
 
+def rand_history_pb2():
+    return proto.module('randsched.history_pb2')
+
 class HistoryEntry(object):
     def __init__(self, proto, db):
         self.proto = proto
@@ -29,6 +37,13 @@ class HistoryEntry(object):
         return self.proto.inst_count
     def num_threads(self):
         return self.proto.num_threads
+    def seed(self):
+        return self.proto.seed
+    def depth(self):
+        # the random scheduler has no depth
+        return getattr(self.proto, 'depth', 0)
+    def fatal(self):
+        return self.proto.fatal
     def __str__(self):
         content = []
         content.append('%-4d' % self.num_threads())
@@ -36,8 +51,11 @@ class HistoryEntry(object):
         return ' '.join(content)
 
 class History(object):
-    def __init__(self):
-        self.proto = history_pb2().HistoryTableProto()
+    """ The history of the PCT scheduler (or of the random scheduler,
+    whose history has the same layout, if pb2 is rand_history_pb2).
+    """
+    def __init__(self, pb2=history_pb2):
+        self.proto = pb2().HistoryTableProto()
         self.history = []
     def load(self, db_name):
         if not os.path.exists(db_name):
@@ -48,6 +66,35 @@ class History(object):
         for history_proto in self.proto.history:
             entry = HistoryEntry(history_proto, self)
             self.history.append(entry)
+    def save(self, db_name):
+        static_info.save_proto(self.proto, db_name)
+    def add(self, entry):
+        history_proto = self.proto.history.add()
+        history_proto.CopyFrom(entry.proto)
+        self.history.append(HistoryEntry(history_proto, self))
+        return self.history[-1]
+    def find(self, seed):
+        """ Return the last entry of the run with the given seed, None
+        if there is no such run.
+        """
+        for entry in reversed(self.history):
+            if entry.seed() == seed:
+                return entry
+        return None
+    def hit_rates(self):
+        """ Return a (depth, runs, hits) tuple for each depth, hits
+        being the runs that were fatal. Only the runs that recorded their
+        seed are counted, the older ones did not record their outcome.
+        """
+        results = {}
+        for entry in self.history:
+            if not entry.proto.HasField('seed'):
+                continue
+            (runs, hits) = results.get(entry.depth(), (0, 0))
+            if entry.fatal():
+                hits += 1
+            results[entry.depth()] = (runs + 1, hits)
+        return [(depth, runs, hits) for (depth, (runs, hits)) in sorted(results.iteritems())]
     def avg_inst_count(self):
         total = 0.0
         for entry in self.history:
@@ -58,6 +105,27 @@ class History(object):
         for entry in self.history:
             total += entry.num_threads()
         return total / len(self.history)
+    def num_runs(self):
+        return len(self.history)
+    def bug_probability(self, depth):
+        """ Return the PCT lower bound on the probability that one run
+        exposes a given bug of the given depth: 1 / (n * k^(d-1)), for n
+        threads and k steps (the average ones of the history).
+        """
+        n = max(self.avg_num_threads(), 1.0)
+        k = max(self.avg_inst_count(), 1.0)
+        return 1.0 / (n * k ** (depth - 1))
+    def runs_for_confidence(self, depth, confidence):
+        """ Return the number of runs after which a bug of the given
+        depth is exposed with the given confidence, by the PCT bound.
+        """
+        p = self.bug_probability(depth)
+        if p >= 1.0:
+            return 1
+        # log1p keeps the precision for tiny probabilities
+        return int(math.ceil(math.log(1.0 - confidence) / math.log1p(-p)))
+    def remaining_runs(self, depth, confidence):
+        return max(self.runs_for_confidence(depth, confidence) - self.num_runs(), 0)
     def display(self, f):
         for entry in self.history:
             f.write('%s\n' % str(entry))
@@ -66,4 +134,74 @@ class History(object):
         f.write('---------------------------\n')
         f.write('Avg inst count   = %f\n' % self.avg_inst_count())
         f.write('Avg num threads  = %f\n' % self.avg_num_threads())
+    def display_estimate(self, f, depth, confidence, run_time=None):
+        remaining = self.remaining_runs(depth, confidence)
+        f.write('PCT Estimate (depth %d, confidence %f)\n' % (depth, confidence))
+        f.write('---------------------------\n')
+        f.write('Bug probability  = %g\n' % self.bug_probability(depth))
+        f.write('Runs needed      = %d\n' % self.runs_for_confidence(depth, confidence))
+        f.write('Runs done        = %d\n' % self.num_runs())
+        f.write('Runs remaining   = %d\n' % remaining)
+        if run_time != None:
+            f.write('Time remaining   = %f\n' % (remaining * run_time))
+    def display_hit_rate(self, f):
+        f.write('Bug Hit Rate\n')
+        f.write('---------------------------\n')
+        f.write('%-6s %-8s %-8s %s\n' % ('depth', 'runs', 'hits', 'rate'))
+        for (depth, runs, hits) in self.hit_rates():
+            f.write('%-6d %-8d %-8d %f\n' % (depth, runs, hits, float(hits) / runs))
+
+def history_name(tool):
+    """ Return the history knob of a random scheduler tool. """
+    for name in ['pct_history', 'rand_history']:
+        if name in tool.knobs:
+            return name
+    return None
+
+def load_history(tool, db_name):
+    if history_name(tool) == 'rand_history':
+        history = History(rand_history_pb2)
+    else:
+        history = History()
+    history.load(db_name)
+    return history
+
+def next_seed(tool, trial):
+    """ Return the seed of the given trial (counted from 0): the seed
+    knob plus the trial if the knob is set, so that a run can be
+    replayed, a random one otherwise.
+    """
+    seed = tool.knobs['seed']
+    if seed == 0:
+        return random.randint(1, 0x7fffffff)
+    return seed + trial
+
+def set_seed(test, seed):
+    prefix = list(test.prefix)
+    prefix[prefix.index('-seed') + 1] = str(seed)
+    test.set_prefix(prefix)
+    test.seed = seed
+
+def merge_history(tool, test):
+    """ Append the history entry written by a parallel worker to the
+    history named by the tool.
+    """
+    db_name = tool.knobs[history_name(tool)]
+    entry = load_history(tool, testing.worker_path(test, db_name)).find(test.seed)
+    if entry == None:
+        logging.msg('no history entry for seed %d\n' % test.seed)
+        return
+    history = load_history(tool, db_name)
+    history.add(entry)
+    history.save(db_name)
 
+def mark_fatal(tool, seed):
+    """ Record that the run with the given seed in the history named by
+    the tool was fatal.
+    """
+    db_name = tool.knobs[history_name(tool)]
+    history = load_history(tool, db_name)
+    entry = history.find(seed)
+    if entry != None:
+        entry.proto.fatal = True
+        history.save(db_name)
@@ -18,6 +18,7 @@ Authors - Jie Yu (jieyu@umich.edu)
 import os
 import sys
 import optparse
+import multiprocessing
 from maple.core import config
 from maple.core import logging
 from maple.core import static_info
@@ -25,6 +26,7 @@ from maple.core import pintool
 from maple.core import testing
 from maple.race import race
 from maple.race import pintool as race_pintool
+from maple.race import offline_tool as race_offline_tool
 from maple.race import testing as race_testing
 
 # global variables
@@ -176,6 +178,28 @@ def register_race_cmdline_options(parser, prefix=''):
             default=1,
             metavar='N',
             help='the threshold (depends on mode)')
+    parser.add_option(
+            '--%sepsilon' % prefix,
+            action='store',
+            type='float',
+            dest='%sepsilon' % prefix,
+            default=None,
+            metavar='E',
+            help='in stable mode, stop once the expected number of new races from another run is below E (threshold is then the least number of runs)')
+    parser.add_option(
+            '--%sworkers' % prefix,
+            action='store',
+            type='int',
+            dest='%sworkers' % prefix,
+            default=1,
+            metavar='N',
+            help='the number of iterations to run in parallel')
+    parser.add_option(
+            '--%sfork_server' % prefix,
+            action='store_true',
+            dest='%sfork_server' % prefix,
+            default=False,
+            help='whether fork the iterations from one instrumented process, needs pintools built with -D_USING_FORK_SERVER [default: False]')
 
 def __command_djit(argv):
     pin = pintool.Pin(config.pin_home())
@@ -199,9 +223,33 @@ def __command_djit(argv):
                                      options.mode,
                                      options.threshold,
                                      profiler)
+    testcase.epsilon = options.epsilon
+    testcase.workers = options.workers
+    testcase.fork_server = options.fork_server
     testcase.run()
     testcase.log_stat()
 
+def __command_offline(argv):
+    detector = race_offline_tool.OfflineDetector()
+    detector.knob_defaults['enable_fasttrack'] = True
+    # parse cmdline options
+    usage = 'usage: <script> offline [options]'
+    parser = optparse.OptionParser(usage)
+    detector.register_cmdline_options(parser)
+    parser.add_option(
+            '--shards',
+            action='store',
+            type='int',
+            dest='shards',
+            default=multiprocessing.cpu_count(),
+            metavar='N',
+            help='the number of processes the memory locations are split across [default: %default]')
+    (options, args) = parser.parse_args(argv)
+    detector.set_cmdline_options(options, args)
+    # run the race detector on the recorded trace log
+    race_offline_tool.detect_sharded(detector, options.shards)
+    logging.msg('offline race detection done! (%d shards)\n' % max(1, options.shards))
+
 def valid_command_set():
     result = set()
     for name in dir(sys.modules[__name__]):
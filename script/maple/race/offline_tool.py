@@ -0,0 +1,87 @@
+"""Copyright 2011 The University of Michigan
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Authors - Jie Yu (jieyu@umich.edu)
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+import multiprocessing
+from maple.core import config
+from maple.core import logging
+from maple.core import offline_tool
+from maple.race import pintool
+from maple.race import race
+
+class OfflineDetector(offline_tool.OfflineTool):
+    """ Run a data race detector on a trace log recorded by the tracer
+    profiler, instead of on a live run under Pin.
+    """
+    def __init__(self):
+        offline_tool.OfflineTool.__init__(self, 'race_offline_detector')
+        self.register_knob('debug_out', 'string', 'stdout', 'the output file for the debug messages')
+        self.register_knob('trace_log_path', 'string', 'trace-log', 'the trace log path', 'PATH')
+        self.register_knob('sinfo_in', 'string', 'sinfo.db', 'the input static info database path', 'PATH')
+        self.register_knob('sinfo_out', 'string', 'sinfo.db', 'the output static info database path', 'PATH')
+        self.register_knob('race_in', 'string', 'race.db', 'the input race database path', 'PATH')
+        self.register_knob('race_out', 'string', 'race.db', 'the output race database path', 'PATH')
+        self.register_knob('shard_id', 'int', 0, 'the memory shard checked by this run', 'N')
+        self.register_knob('num_shards', 'int', 1, 'the number of memory shards', 'N')
+        self.merge_knob(pintool.Djit())
+        self.merge_knob(pintool.FastTrack())
+    def bin_path(self):
+        return os.path.join(config.build_home(self.debug), 'race_offline_detector')
+
+def detect_sharded(detector, num_shards):
+    """ Run the offline detector with the memory locations split into
+    num_shards shards, each checked by its own process, then merge the
+    races of the shards into the output race database as one execution.
+    """
+    if num_shards <= 1:
+        detector.call()
+        return
+    knobs = dict(detector.knobs)
+    work_dir = tempfile.mkdtemp(prefix='race.', dir=os.path.dirname(os.path.abspath(knobs['race_out'])))
+    try:
+        cmds = []
+        outputs = []
+        for shard_id in range(num_shards):
+            sinfo_name = os.path.join(work_dir, 'sinfo.%d.db' % shard_id)
+            race_name = os.path.join(work_dir, 'race.%d.db' % shard_id)
+            detector.knobs['shard_id'] = shard_id
+            detector.knobs['num_shards'] = num_shards
+            # the shards start empty, the input races are merged below
+            detector.knobs['race_in'] = os.path.join(work_dir, 'none.db')
+            detector.knobs['sinfo_out'] = sinfo_name
+            detector.knobs['race_out'] = race_name
+            cmds.append(detector.cmd())
+            outputs.append((sinfo_name, race_name))
+        detector.knobs.update(knobs)
+        pool = multiprocessing.Pool(min(num_shards, multiprocessing.cpu_count()))
+        results = pool.map(subprocess.call, cmds)
+        pool.close()
+        pool.join()
+        for (shard_id, retcode) in enumerate(results):
+            if retcode != 0:
+                logging.err('race detector shard %d failed (%d)\n' % (shard_id, retcode))
+        merger = race.RaceDBMerger()
+        merger.load(knobs['sinfo_in'], knobs['race_in'])
+        exec_map = {}
+        for (sinfo_name, race_name) in outputs:
+            merger.merge(sinfo_name, race_name, exec_map=exec_map)
+        merger.save(knobs['sinfo_out'], knobs['race_out'])
+    finally:
+        shutil.rmtree(work_dir)
@@ -31,6 +31,12 @@ class Djit(Detector):
         self.register_knob('enable_djit', 'bool', False, 'whether enable the djit data race detector')
         self.register_knob('track_racy_inst', 'bool', False, 'whether track potential racy instructions')
 
+class FastTrack(Detector):
+    def __init__(self):
+        Detector.__init__(self, 'race_fasttrack')
+        self.register_knob('enable_fasttrack', 'bool', False, 'whether enable the fasttrack data race detector')
+        self.register_knob('track_racy_inst', 'bool', False, 'whether track potential racy instructions')
+
 class Profiler(pintool.Pintool):
     def __init__(self, name='race_profiler'):
         pintool.Pintool.__init__(self, name)
@@ -42,6 +48,7 @@ class Profiler(pintool.Pintool):
         self.register_knob('race_in', 'string', 'race.db', 'the input race database path', 'PATH')
         self.register_knob('race_out', 'string', 'race.db', 'the output race database path', 'PATH')
         self.add_analyzer(Djit())
+        self.add_analyzer(FastTrack())
     def so_path(self):
         return os.path.join(config.build_home(self.debug), 'race_profiler.so')
 
@@ -53,6 +60,7 @@ class PctProfiler(Profiler):
         self.register_knob('depth', 'int', 3, 'the target bug depth', 'DEPTH')
         self.register_knob('count_mem', 'bool', True, 'whether use the number of memory accesses as thread counter')
         self.register_knob('pct_history', 'string', 'pct.histo', 'the pct history file path', 'PATH')
+        self.register_knob('seed', 'int', 0, 'the random seed (0 means seed from the time)', 'SEED')
     def so_path(self):
         return os.path.join(config.build_home(self.debug), 'race_pct_profiler.so')
 
@@ -17,6 +17,7 @@ Authors - Jie Yu (jieyu@umich.edu)
 
 import os
 from maple.core import proto
+from maple.core import static_info
 
 def race_pb2():
     return proto.module('race.race_pb2')
@@ -148,3 +149,100 @@ class RaceDB(object):
         for inst in self.racy_inst_set:
             f.write('%s\n' % str(inst))
 
+
+class RaceDBMerger(object):
+    """ Merge the race databases (and their static info databases)
+    written by independent runs. Static race events are matched by
+    (inst, type) and static races by their events. Only the races found
+    in executions after since_exec_id are taken from the other database;
+    each of its executions gets a new execution id.
+    """
+    def __init__(self):
+        self.sinfo = static_info.StaticInfoMerger()
+        self.proto = race_pb2().RaceDBProto()
+        self.event_ids = {}
+        self.race_ids = {}
+        self.racy_inst_ids = set()
+        self.max_event_id = 0
+        self.max_race_id = 0
+        self.max_exec_id = 0
+    def load(self, sinfo_name, race_name):
+        self.sinfo.load(sinfo_name)
+        self.proto = load_race_db_proto(race_name)
+        event_map = {}
+        for e_proto in self.proto.static_event:
+            key = (e_proto.inst_id, e_proto.type)
+            self.event_ids.setdefault(key, e_proto.id)
+            event_map[e_proto.id] = self.event_ids[key]
+            self.max_event_id = max(self.max_event_id, e_proto.id)
+        for r_proto in self.proto.static_race:
+            key = tuple([event_map[e] for e in r_proto.event_id])
+            self.race_ids.setdefault(key, r_proto.id)
+            self.max_race_id = max(self.max_race_id, r_proto.id)
+        for r_proto in self.proto.race:
+            self.max_exec_id = max(self.max_exec_id, r_proto.exec_id)
+        self.racy_inst_ids = set(self.proto.racy_inst_id)
+    def merge(self, sinfo_name, race_name, since_exec_id=-1, exec_map=None):
+        """ Merge a race database. Pass the same exec_map to the merges
+        of databases that hold parts of the same executions (e.g. the
+        shards of an offline detection), so that they share exec ids.
+        """
+        inst_map = self.sinfo.merge(sinfo_name)
+        other = load_race_db_proto(race_name)
+        event_map = {}
+        for e_proto in other.static_event:
+            key = (inst_map[e_proto.inst_id], e_proto.type)
+            if not key in self.event_ids:
+                self.max_event_id += 1
+                new_event = self.proto.static_event.add()
+                new_event.id = self.max_event_id
+                new_event.inst_id = key[0]
+                new_event.type = key[1]
+                self.event_ids[key] = new_event.id
+            event_map[e_proto.id] = self.event_ids[key]
+        race_map = {}
+        for r_proto in other.static_race:
+            key = tuple([event_map[e] for e in r_proto.event_id])
+            if not key in self.race_ids:
+                self.max_race_id += 1
+                new_race = self.proto.static_race.add()
+                new_race.id = self.max_race_id
+                new_race.event_id.extend(key)
+                self.race_ids[key] = new_race.id
+            race_map[r_proto.id] = self.race_ids[key]
+        if exec_map == None:
+            exec_map = {}
+        for r_proto in other.race:
+            if r_proto.exec_id <= since_exec_id:
+                continue
+            if not r_proto.exec_id in exec_map:
+                self.max_exec_id += 1
+                exec_map[r_proto.exec_id] = self.max_exec_id
+            new_race = self.proto.race.add()
+            new_race.CopyFrom(r_proto)
+            new_race.exec_id = exec_map[r_proto.exec_id]
+            new_race.static_id = race_map[r_proto.static_id]
+            for e in new_race.event:
+                e.static_id = event_map[e.static_id]
+        for inst_id in other.racy_inst_id:
+            inst_id = inst_map[inst_id]
+            if not inst_id in self.racy_inst_ids:
+                self.racy_inst_ids.add(inst_id)
+                self.proto.racy_inst_id.append(inst_id)
+    def save(self, sinfo_name, race_name):
+        self.sinfo.save(sinfo_name)
+        static_info.save_proto(self.proto, race_name)
+
+def load_race_db_proto(db_name):
+    proto = race_pb2().RaceDBProto()
+    if os.path.exists(db_name):
+        f = open(db_name, 'rb')
+        proto.ParseFromString(f.read())
+        f.close()
+    return proto
+
+def max_exec_id(db_name):
+    result = -1
+    for r_proto in load_race_db_proto(db_name).race:
+        result = max(result, r_proto.exec_id)
+    return result
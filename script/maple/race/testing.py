@@ -16,8 +16,10 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 from maple.core import logging
+from maple.core import saturation
 from maple.core import static_info
 from maple.core import testing
+from maple.pct import history as pct_history
 from maple.race import race
 
 class TestCase(testing.DeathTestCase):
@@ -27,6 +29,8 @@ class TestCase(testing.DeathTestCase):
         self.num_static_races = 0
         self.num_racy_insts = 0
         self.stable_cnt = 0
+        self.epsilon = None
+        self.curve = saturation.DiscoveryCurve()
     def threshold_check(self):
         if testing.DeathTestCase.threshold_check(self):
             return True
@@ -35,6 +39,12 @@ class TestCase(testing.DeathTestCase):
             sinfo.load(self.profiler.knobs['sinfo_out'])
             race_db = race.RaceDB(sinfo)
             race_db.load(self.profiler.knobs['race_out'])
+            if self.epsilon != None:
+                # stop once the next run is expected to find few new races
+                self.curve.add(race_db.num_static_races())
+                expected = self.curve.expected_new()
+                logging.msg('expected new races per run = %f\n' % expected)
+                return self.curve.saturated(self.epsilon, max(int(self.threshold), 2))
             if (race_db.num_static_races() != self.num_static_races or
                 race_db.num_racy_insts() != self.num_racy_insts):
                 self.stable_cnt = 0
@@ -54,6 +64,32 @@ class TestCase(testing.DeathTestCase):
             logging.msg('race fatal error detected\n')
         else:
             logging.msg('race threshold reached\n')
+    def prepare_fork_server(self):
+        # every forked process starts from the database the server loaded
+        self.fork_exec_id = race.max_exec_id(self.profiler.knobs['race_out'])
+    def prepare_worker(self, test, idx):
+        # races of later executions in the worker copy are the new ones
+        if test.fork_server != None:
+            test.since_exec_id = self.fork_exec_id
+        else:
+            test.since_exec_id = race.max_exec_id(self.profiler.knobs['race_out'])
+        testing.setup_worker_dir(test, self.profiler, idx)
+        if pct_history.history_name(self.profiler) != None:
+            # workers started in the same second must not share a seed
+            trial = len(self.test_history) + idx
+            pct_history.set_seed(test, pct_history.next_seed(self.profiler, trial))
+    def merge_worker(self, test, idx):
+        if pct_history.history_name(self.profiler) != None:
+            pct_history.merge_history(self.profiler, test)
+        merger = race.RaceDBMerger()
+        merger.load(self.profiler.knobs['sinfo_out'], self.profiler.knobs['race_out'])
+        merger.merge(testing.worker_path(test, self.profiler.knobs['sinfo_out']),
+                     testing.worker_path(test, self.profiler.knobs['race_out']),
+                     test.since_exec_id)
+        merger.save(self.profiler.knobs['sinfo_out'], self.profiler.knobs['race_out'])
+        testing.cleanup_worker_dir(test)
+    def discard_worker(self, test, idx):
+        testing.cleanup_worker_dir(test)
     def log_stat(self):
         runs = len(self.test_history)
         used_time = self.used_time()
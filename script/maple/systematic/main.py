@@ -26,6 +26,7 @@ from maple.core import testing
 from maple.race import pintool as race_pintool
 from maple.systematic import program
 from maple.systematic import search
+from maple.systematic import state_cache
 from maple.systematic import pintool as systematic_pintool
 from maple.systematic import testing as systematic_testing
 
@@ -71,6 +72,30 @@ def __display_search_info(output, options):
     search_info.load(options.search_in)
     search_info.display(output)
 
+def __display_search_progress(output, options):
+    output.write(str(search.load_progress(options.search_in)))
+
+def __display_state_cache(output, options):
+    cache = state_cache.StateCache()
+    cache.load(options.state_cache_path)
+    cache.display(output)
+
+def __display_state_cache_summary(output, options):
+    cache = state_cache.StateCache()
+    cache.load(options.state_cache_path)
+    cache.display_summary(output)
+
+def __display_search_estimate(output, options):
+    info_proto = search.load_proto(options.search_in)
+    pb_limit = options.pb_limit
+    if pb_limit < 0:
+        pb_limit = None
+    remaining = search.estimate_remaining(info_proto, pb_limit, options.num_probes)
+    output.write('num_runs       = %d\n' % info_proto.num_runs)
+    output.write('runs remaining = %f\n' % remaining)
+    if options.run_time != None:
+        output.write('time remaining = %f\n' % (remaining * options.run_time))
+
 def valid_display_set():
     result = set()
     for name in dir(sys.modules[__name__]):
@@ -154,6 +179,38 @@ def register_display_options(parser):
             default='search.db',
             metavar='PATH',
             help='the output file that contains the search information')
+    parser.add_option(
+            '--state_cache_path',
+            action='store',
+            type='string',
+            dest='state_cache_path',
+            default='state-cache.db',
+            metavar='PATH',
+            help='the file that stores the explored states of past searches')
+    parser.add_option(
+            '--pb_limit',
+            action='store',
+            type='int',
+            dest='pb_limit',
+            default=2,
+            metavar='LIMIT',
+            help='the preemption bound of the search (-1 for none)')
+    parser.add_option(
+            '--num_probes',
+            action='store',
+            type='int',
+            dest='num_probes',
+            default=32,
+            metavar='N',
+            help='the number of random probes per pending backtrack entry')
+    parser.add_option(
+            '--run_time',
+            action='store',
+            type='float',
+            dest='run_time',
+            default=None,
+            metavar='SECONDS',
+            help='the average time of a run, to estimate the remaining time')
 
 def __command_display(argv):
     parser = optparse.OptionParser(display_usage())
@@ -196,6 +253,14 @@ def register_chess_cmdline_options(parser, prefix=''):
             default=1,
             metavar='N',
             help='the threshold (depends on mode)')
+    parser.add_option(
+            '--%sworkers' % prefix,
+            action='store',
+            type='int',
+            dest='%sworkers' % prefix,
+            default=1,
+            metavar='N',
+            help='the number of workers exploring disjoint subtrees of the search in parallel')
 
 def __command_chess(argv):
     pin = pintool.Pin(config.pin_home())
@@ -219,6 +284,7 @@ def __command_chess(argv):
                                                 options.mode,
                                                 options.threshold,
                                                 controller)
+    testcase.workers = options.workers
     testcase.run()
     testcase.log_stat()
 
@@ -239,6 +305,14 @@ def register_race_cmdline_options(parser, prefix=''):
             default=1,
             metavar='N',
             help='the threshold (depends on mode)')
+    parser.add_option(
+            '--%sepsilon' % prefix,
+            action='store',
+            type='float',
+            dest='%sepsilon' % prefix,
+            default=None,
+            metavar='E',
+            help='in stable mode, stop once the expected number of new races from another run is below E (threshold is then the least number of runs)')
 
 def __command_chess_race(argv):
     pin = pintool.Pin(config.pin_home())
@@ -274,6 +348,7 @@ def __command_chess_race(argv):
                                                     options.race_mode,
                                                     options.race_threshold,
                                                     profiler)
+    race_testcase.epsilon = options.race_epsilon
     # create chess testcase
     chess_test = testing.InteractiveTest(prog_argv)
     chess_test.set_prefix(get_prefix(pin, controller))
@@ -281,6 +356,7 @@ def __command_chess_race(argv):
                                                       options.chess_mode,
                                                       options.chess_threshold,
                                                       controller)
+    chess_testcase.workers = options.chess_workers
     # run
     testcase = systematic_testing.ChessRaceTestCase(race_testcase,
                                                     chess_testcase)
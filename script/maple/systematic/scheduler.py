@@ -39,4 +39,6 @@ class ChessScheduler(Scheduler):
         self.register_knob('search_in', 'string', 'search.db', 'the input file that contains the search information', 'PATH')
         self.register_knob('search_out', 'string', 'search.db', 'the output file that contains the search information', 'PATH')
         self.register_knob('por_info_path', 'string', 'por-info', 'the dir path that stores the partial order reduction information', 'PATH')
+        self.register_knob('state_cache', 'bool', False, 'whether prune states explored by past searches of the same program')
+        self.register_knob('state_cache_path', 'string', 'state-cache.db', 'the file that stores the explored states of past searches', 'PATH')
 
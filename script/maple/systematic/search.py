@@ -16,6 +16,8 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import random
+import struct
 from maple.core import proto
 from maple.systematic import program
 
@@ -131,3 +133,205 @@ class SearchInfo(object):
         f.write('done     = %d\n' % self.done())
         f.write('num_runs = %d\n' % self.num_runs())
 
+
+def load_proto(db_name):
+    info_proto = search_pb2().SearchInfoProto()
+    info_proto.done = False
+    info_proto.num_runs = 0
+    if os.path.exists(db_name):
+        f = open(db_name, 'rb')
+        info_proto.ParseFromString(f.read())
+        f.close()
+    return info_proto
+
+def save_proto(info_proto, db_name):
+    f = open(db_name, 'wb')
+    f.write(info_proto.SerializeToString())
+    f.close()
+    save_progress(SearchProgress.from_proto(info_proto), db_name)
+
+def progress_name(db_name):
+    return db_name + '.progress'
+
+_progress_format = '=4I'   # done, num_runs, depth, pending backtracks
+
+class SearchProgress(object):
+    """ The progress record of a search database, a fixed size record
+    written next to it by the controller, so that the progress can be
+    checked without parsing the search stack.
+    """
+    def __init__(self, done=False, num_runs=0, depth=0, num_pending=0):
+        self.done = done
+        self.num_runs = num_runs
+        self.depth = depth
+        self.num_pending = num_pending
+    @staticmethod
+    def from_proto(info_proto):
+        num_pending = 0
+        for node_proto in info_proto.node:
+            done = set(node_proto.done)
+            for thd_uid in node_proto.backtrack:
+                if not thd_uid in done:
+                    num_pending += 1
+        return SearchProgress(info_proto.done, info_proto.num_runs,
+                              len(info_proto.node), num_pending)
+    def __str__(self):
+        content = []
+        content.append('done        = %d\n' % self.done)
+        content.append('num_runs    = %d\n' % self.num_runs)
+        content.append('depth       = %d\n' % self.depth)
+        content.append('num_pending = %d\n' % self.num_pending)
+        return ''.join(content)
+
+def load_progress(db_name):
+    """ Return the progress of a search database. The search stack is
+    parsed only if the progress record is missing or older than the
+    database (e.g. written by an older controller).
+    """
+    name = progress_name(db_name)
+    if not os.path.exists(db_name):
+        return SearchProgress()
+    if (os.path.exists(name) and
+        os.path.getsize(name) == struct.calcsize(_progress_format) and
+        os.path.getmtime(name) >= os.path.getmtime(db_name)):
+        f = open(name, 'rb')
+        record = struct.unpack(_progress_format, f.read())
+        f.close()
+        return SearchProgress(record[0] != 0, record[1], record[2], record[3])
+    return SearchProgress.from_proto(load_proto(db_name))
+
+def save_progress(progress, db_name):
+    # write to a temporary file first, so readers never see half a record
+    name = progress_name(db_name)
+    tmp_name = '%s.tmp.%d' % (name, os.getpid())
+    f = open(tmp_name, 'wb')
+    f.write(struct.pack(_progress_format, int(progress.done), progress.num_runs,
+                        progress.depth, progress.num_pending))
+    f.close()
+    os.rename(tmp_name, name)
+
+def finished(node_proto):
+    return set(node_proto.backtrack).issubset(set(node_proto.done))
+
+def pop_finished(info_proto):
+    """ Pop the finished nodes off the search stack, as the scheduler
+    does after each run. The search is done once the stack is empty.
+    """
+    while len(info_proto.node) > 0 and finished(info_proto.node[-1]):
+        del info_proto.node[-1]
+    if len(info_proto.node) == 0:
+        info_proto.done = True
+
+def preemptive(info_proto, idx, thd_uid):
+    """ Return whether scheduling the given thread at the node idx is a
+    preemptive choice, i.e. the thread selected at the previous node is
+    still enabled and another one is picked.
+    """
+    if idx == 0:
+        return False
+    prev_uid = info_proto.node[idx - 1].sel
+    if thd_uid == prev_uid:
+        return False
+    for enabled_proto in info_proto.node[idx].enabled:
+        if enabled_proto.thd_uid == prev_uid:
+            return True
+    return False
+
+def pending_entries(info_proto, pb_limit=None):
+    """ Return the (node idx, thread uid) pairs of the backtrack entries
+    not explored yet, shallowest first. If pb_limit is given, entries
+    that would exceed the preemption bound are marked done instead, as
+    the scheduler would prune them on its own.
+    """
+    results = []
+    preemptions = 0
+    for idx in range(len(info_proto.node)):
+        node_proto = info_proto.node[idx]
+        done = set(node_proto.done)
+        for thd_uid in node_proto.backtrack:
+            if thd_uid in done:
+                continue
+            if (pb_limit != None and preemptive(info_proto, idx, thd_uid) and
+                preemptions + 1 > pb_limit):
+                node_proto.done.append(thd_uid)
+                continue
+            results.append((idx, thd_uid))
+        if preemptive(info_proto, idx, node_proto.sel):
+            preemptions += 1
+    return results
+
+def subtree(info_proto, idx, thd_uid):
+    """ Return a search covering only the subtree in which the given
+    thread is scheduled at the node idx: the prefix up to that node is
+    kept, and all the other entries of the prefix are marked done. The
+    prefix nodes are marked partial, as their other entries are not
+    explored by this search.
+    """
+    sub_proto = search_pb2().SearchInfoProto()
+    sub_proto.done = False
+    sub_proto.num_runs = 0
+    for k in range(idx + 1):
+        node_proto = sub_proto.node.add()
+        node_proto.CopyFrom(info_proto.node[k])
+        node_proto.partial = True
+        del node_proto.done[:]
+        for uid in node_proto.backtrack:
+            if k < idx or uid != thd_uid:
+                node_proto.done.append(uid)
+    return sub_proto
+
+def split_search(info_proto, max_parts, pb_limit=None):
+    """ Hand out up to max_parts of the pending backtrack entries of a
+    search as independent subtrees, shallowest (largest) first. Return
+    the list of (node idx, thread uid, subtree search). The entries are
+    marked done in the given search, which keeps exploring the rest.
+    """
+    results = []
+    for (idx, thd_uid) in pending_entries(info_proto, pb_limit)[:max_parts]:
+        results.append((idx, thd_uid, subtree(info_proto, idx, thd_uid)))
+        info_proto.node[idx].done.append(thd_uid)
+        info_proto.node[idx].partial = True
+    return results
+
+def probe(info_proto, idx, thd_uid, preemptions, pb_limit, rng):
+    """ One random probe of Knuth's estimator down the subtree in which
+    the given thread is scheduled at the node idx. Return the product of
+    the number of choices met on the way, an unbiased estimate of the
+    number of executions in the subtree. The nodes below are assumed to
+    have the enabled sets recorded at the same depth of the stack.
+    """
+    size = 1.0
+    prev_uid = thd_uid
+    for k in range(idx + 1, len(info_proto.node)):
+        enabled = [enabled_proto.thd_uid for enabled_proto in info_proto.node[k].enabled]
+        if pb_limit != None and preemptions >= pb_limit and prev_uid in enabled:
+            # no more preemption allowed
+            choices = [prev_uid]
+        else:
+            choices = enabled
+        size *= len(choices)
+        sel = rng.choice(choices)
+        if prev_uid in enabled and sel != prev_uid:
+            preemptions += 1
+        prev_uid = sel
+    return size
+
+def estimate_remaining(info_proto, pb_limit=None, num_probes=32, rng=random):
+    """ Estimate the number of executions left in a search, by random
+    probes (Knuth's tree size estimator) down the subtree of each of its
+    pending backtrack entries. Fair control and partial order reduction
+    are not modeled, so this tends to over-estimate.
+    """
+    if info_proto.done:
+        return 0.0
+    # the number of preemptions of the recorded path before each node
+    prefix = [0]
+    for idx in range(len(info_proto.node)):
+        node_proto = info_proto.node[idx]
+        prefix.append(prefix[-1] + int(preemptive(info_proto, idx, node_proto.sel)))
+    total = 0.0
+    for (idx, thd_uid) in pending_entries(info_proto, pb_limit):
+        preemptions = prefix[idx] + int(preemptive(info_proto, idx, thd_uid))
+        for k in range(num_probes):
+            total += probe(info_proto, idx, thd_uid, preemptions, pb_limit, rng) / num_probes
+    return total
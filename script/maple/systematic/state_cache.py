@@ -0,0 +1,81 @@
+"""Copyright 2011 The University of Michigan
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+     http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Authors - Jie Yu (jieyu@umich.edu)
+"""
+
+import os
+from maple.core import proto
+
+def chess_pb2():
+    return proto.module('systematic.chess_pb2')
+
+class CacheImage(object):
+    """ The explored states of one program in the state cache. """
+    def __init__(self, proto):
+        self.proto = proto
+    def name(self):
+        return self.proto.name
+    def num_entries(self):
+        return len(self.proto.entry)
+    def num_lookups(self):
+        return self.proto.num_lookups
+    def num_hits(self):
+        return self.proto.num_hits
+    def hit_rate(self):
+        if self.num_lookups() == 0:
+            return 0.0
+        return float(self.num_hits()) / self.num_lookups()
+    def __str__(self):
+        content = []
+        content.append('%-8d' % self.num_entries())
+        content.append('%-10d' % self.num_lookups())
+        content.append('%-10d' % self.num_hits())
+        content.append('%-8.4f' % self.hit_rate())
+        content.append('%s' % self.name())
+        return ' '.join(content)
+
+class StateCache(object):
+    """ The persistent state cache of the CHESS scheduler: for each
+    program image, the hashes of the states whose subtrees have been
+    explored, and how often the cache pruned a choice.
+    """
+    def __init__(self):
+        self.proto = chess_pb2().ChessStateCacheProto()
+        self.image_vec = []
+    def load(self, db_name):
+        if not os.path.exists(db_name):
+            return
+        f = open(db_name, 'rb')
+        self.proto.ParseFromString(f.read())
+        f.close()
+        for image_proto in self.proto.image:
+            self.image_vec.append(CacheImage(image_proto))
+    def num_entries(self):
+        return sum([image.num_entries() for image in self.image_vec])
+    def hit_rate(self):
+        num_lookups = sum([image.num_lookups() for image in self.image_vec])
+        if num_lookups == 0:
+            return 0.0
+        return float(sum([image.num_hits() for image in self.image_vec])) / num_lookups
+    def display(self, f):
+        f.write('%-8s %-10s %-10s %-8s %s\n' % ('entries', 'lookups', 'hits', 'rate', 'image'))
+        for image in self.image_vec:
+            f.write('%s\n' % str(image))
+    def display_summary(self, f):
+        f.write('State Cache Summary\n')
+        f.write('---------------------------\n')
+        f.write('Num images       = %d\n' % len(self.image_vec))
+        f.write('Num entries      = %d\n' % self.num_entries())
+        f.write('Hit rate         = %f\n' % self.hit_rate())
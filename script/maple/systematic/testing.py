@@ -16,11 +16,13 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import copy
+import shutil
+import threading
+import multiprocessing
 from maple.core import logging
-from maple.core import static_info
 from maple.core import testing
 from maple.race import testing as race_testing
-from maple.systematic import program
 from maple.systematic import search
 
 class ChessTestCase(testing.DeathTestCase):
@@ -36,17 +38,183 @@ class ChessTestCase(testing.DeathTestCase):
             return True
         return False
     def search_done(self):
-        sinfo = static_info.StaticInfo()
-        sinfo.load(self.controller.knobs['sinfo_out'])
-        prog = program.Program(sinfo)
-        prog.load(self.controller.knobs['program_out'])
-        search_info = search.SearchInfo(sinfo, program)
-        search_info.load(self.controller.knobs['search_out'])
-        return search_info.done()
+        return search.load_progress(self.controller.knobs['search_out']).done
     def after_each_test(self):
         iteration = len(self.test_history)
         used_time = self.test_history[-1].used_time()
         logging.msg('=== chess iteration %d done === (%f) (%s)\n' % (iteration, used_time, os.getcwd()))
+    def parallel_body(self):
+        """ Explore the search with self.workers workers at once. The
+        pending backtrack entries of the search are split into independent
+        subtrees (jobs), each explored by one worker in its own directory
+        and on its own cpu. A worker that finds the job queue empty takes
+        the shallowest pending entries of a busy worker. The subtree of an
+        entry is marked done in the search only when it is explored, so a
+        search stopped early resumes from the unfinished subtrees.
+        """
+        self.before_all_tests()
+        search_name = self.controller.knobs['search_out']
+        if not os.path.exists(search_name):
+            # the first run builds the search stack
+            test = copy.deepcopy(self.test)
+            self.test_history.append(test)
+            test.run()
+            self.after_each_test()
+            if test.is_fatal():
+                self.result = 'FATAL'
+        self.search_proto = search.load_proto(search_name)
+        self.search_runs = self.search_proto.num_runs
+        self.job_queue = []
+        self.num_jobs = 0
+        self.num_idle = 0
+        self.num_active = 0
+        self.cond = threading.Condition()
+        self.fatal_job = None
+        if self.result == None:
+            for (idx, thd_uid) in search.pending_entries(self.search_proto, self.pb_limit()):
+                sub_proto = search.subtree(self.search_proto, idx, thd_uid)
+                self.add_job(None, idx, thd_uid, sub_proto, self.path_map())
+            threads = []
+            for slot in range(self.workers):
+                thread = threading.Thread(target=self.worker_loop, args=(slot,))
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+            for job in self.job_queue:
+                shutil.rmtree(job['dir'], True)
+            if self.result == None:
+                self.result = 'NORMAL'
+        search.pop_finished(self.search_proto)
+        self.search_proto.num_runs = self.search_runs
+        search.save_proto(self.search_proto, search_name)
+        self.after_all_tests()
+    def pb_limit(self):
+        if self.controller.knobs['pb']:
+            return self.controller.knobs['pb_limit']
+        return None
+    def path_map(self):
+        # the files and directories named by the PATH knobs of the tool,
+        # except the state cache which all the workers share
+        results = {}
+        for path in testing.tool_paths(self.controller):
+            if path != os.path.realpath(self.controller.knobs['state_cache_path']):
+                results[path] = path
+        return results
+    def add_job(self, parent, idx, thd_uid, sub_proto, paths):
+        """ Queue a job exploring the given subtree, in a new directory
+        with copies of the files of the job (or search) it is split from.
+        """
+        self.num_jobs += 1
+        directory = os.path.realpath('chess.%d' % self.num_jobs)
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.mkdir(directory)
+        job_paths = {}
+        for (path, src) in paths.iteritems():
+            dst = os.path.join(directory, os.path.basename(path))
+            if os.path.isfile(src):
+                shutil.copy(src, dst)
+            elif os.path.isdir(src):
+                shutil.copytree(src, dst)
+            job_paths[path] = dst
+        search_name = os.path.join(directory, 'search.db')
+        for knob_name in ['search_in', 'search_out']:
+            job_paths[os.path.realpath(self.controller.knobs[knob_name])] = search_name
+        search.save_proto(sub_proto, search_name)
+        job = {'dir': directory,
+               'paths': job_paths,
+               'search': search_name,
+               'parent': parent,
+               'entry': (idx, thd_uid),
+               'children': 0,
+               'explored': False}
+        if parent != None:
+            parent['children'] += 1
+        self.job_queue.append(job)
+    def job_done(self, job):
+        # called with the lock held, once the job explored its subtree
+        while job != None and job['explored'] and job['children'] == 0:
+            parent = job['parent']
+            if parent == None:
+                (idx, thd_uid) = job['entry']
+                self.search_proto.node[idx].done.append(thd_uid)
+            else:
+                parent['children'] -= 1
+            job = parent
+    def worker_loop(self, slot):
+        while True:
+            self.cond.acquire()
+            self.num_idle += 1
+            self.cond.notify_all()
+            while (len(self.job_queue) == 0 and self.num_active > 0 and
+                   self.result == None):
+                self.cond.wait()
+            self.num_idle -= 1
+            if self.result != None or len(self.job_queue) == 0:
+                self.cond.notify_all()
+                self.cond.release()
+                return
+            job = self.job_queue.pop(0)
+            self.num_active += 1
+            self.cond.release()
+            explored = self.run_job(job, slot)
+            self.cond.acquire()
+            self.num_active -= 1
+            self.search_runs += search.load_progress(job['search']).num_runs
+            if explored:
+                job['explored'] = True
+                self.job_done(job)
+            if self.result == 'FATAL' and self.fatal_job == job:
+                logging.msg('chess fatal error in %s\n' % job['dir'])
+            else:
+                shutil.rmtree(job['dir'], True)
+            self.cond.notify_all()
+            self.cond.release()
+    def run_job(self, job, slot):
+        """ Run the test on the subtree of a job until it is explored
+        (return True) or the whole search stops (return False).
+        """
+        prefix = []
+        for arg in self.test.prefix:
+            prefix.append(job['paths'].get(arg, arg))
+        if '-cpu' in prefix:
+            pos = prefix.index('-cpu') + 1
+            prefix[pos] = str((int(prefix[pos]) + slot) % multiprocessing.cpu_count())
+        while True:
+            if search.load_progress(job['search']).done:
+                return True
+            test = copy.deepcopy(self.test)
+            test.set_prefix(prefix)
+            test.run()
+            self.cond.acquire()
+            try:
+                if self.result != None:
+                    return False
+                self.test_history.append(test)
+                self.after_each_test()
+                if test.is_fatal():
+                    self.result = 'FATAL'
+                    self.fatal_job = job
+                    return False
+                if testing.DeathTestCase.threshold_check(self):
+                    self.result = 'NORMAL'
+                    return False
+                if self.num_idle > 0 and len(self.job_queue) == 0:
+                    self.share_job(job)
+            finally:
+                self.cond.notify_all()
+                self.cond.release()
+    def share_job(self, job):
+        # called with the lock held, between two runs of the job
+        info_proto = search.load_proto(job['search'])
+        entries = search.pending_entries(info_proto, self.pb_limit())
+        num_parts = min(self.num_idle, len(entries) - 1)
+        if num_parts <= 0:
+            return
+        for (idx, thd_uid, sub_proto) in search.split_search(info_proto, num_parts, self.pb_limit()):
+            self.add_job(job, idx, thd_uid, sub_proto, job['paths'])
+        search.save_proto(info_proto, job['search'])
     def after_all_tests(self):
         if self.is_fatal():
             logging.msg('chess fatal error detected\n')
@@ -57,6 +225,11 @@ class ChessTestCase(testing.DeathTestCase):
         used_time = self.used_time()
         logging.msg('%-15s %d\n' % ('chess_runs', runs))
         logging.msg('%-15s %f\n' % ('chess_time', used_time))
+        if runs > 0 and not self.search_done():
+            info_proto = search.load_proto(self.controller.knobs['search_out'])
+            remaining = search.estimate_remaining(info_proto, self.pb_limit())
+            logging.msg('%-15s %f\n' % ('chess_remaining', remaining))
+            logging.msg('%-15s %f\n' % ('chess_eta', remaining * used_time / runs))
 
 class RaceTestCase(race_testing.TestCase):
     """ Run race detector to find all racy instructions.
@@ -16,8 +16,20 @@ Authors - Jie Yu (jieyu@umich.edu)
 """
 
 import os
+import zlib
+import array
+import struct
+import bisect
+import itertools
+import Queue
+import threading
 from maple.core import proto
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 def log_pb2():
     return proto.module('tracer.log_pb2')
 
@@ -25,7 +37,12 @@ def log_entry_type_name(t):
     d = log_pb2().LogEntryProto.DESCRIPTOR.fields_by_name['type'].enum_type
     return d.values_by_number[t].name[10:]
 
+def log_entry_type(name):
+    d = log_pb2().LogEntryProto.DESCRIPTOR.fields_by_name['type'].enum_type
+    return d.values_by_name['LOG_ENTRY_' + name].number
+
 class LogEntry(object):
+    __slots__ = ('proto', 'log')
     def __init__(self, proto, log):
         self.proto = proto
         self.log = log
@@ -72,6 +89,222 @@ class LogEntry(object):
             content.append('%s' % p)
         return ' '.join(content)
 
+def column(typecode, values):
+    """ Return a column of a batch, a numpy array if numpy is installed,
+    an array.array otherwise.
+    """
+    if numpy != None:
+        return numpy.array(values, dtype={'i': numpy.int32, 'l': numpy.int64, 'L': numpy.uint64}[typecode])
+    return array.array(typecode, values)
+
+class LogBatch(object):
+    """ The entries of a log slice as columns. A missing thd_id, thd_clk
+    or inst_id is -1. The args of entry i are arg[arg_start[i]:arg_start[i+1]].
+    """
+    def __init__(self, entries):
+        self.size = len(entries)
+        self.type = column('i', [e.type for e in entries])
+        self.thd_id = column('l', [e.thd_id if e.HasField('thd_id') else -1 for e in entries])
+        self.thd_clk = column('l', [e.thd_clk if e.HasField('thd_clk') else -1 for e in entries])
+        self.inst_id = column('l', [e.inst_id if e.HasField('inst_id') else -1 for e in entries])
+        arg = []
+        arg_start = [0]
+        for e in entries:
+            arg.extend(e.arg)
+            arg_start.append(len(arg))
+        self.arg = column('L', arg)
+        self.arg_start = column('l', arg_start)
+
+def load_meta(path):
+    meta = log_pb2().LogMetaProto()
+    meta_path = path + '/meta'
+    if os.path.exists(meta_path):
+        f = open(meta_path, 'rb')
+        meta.ParseFromString(f.read())
+        f.close()
+    return meta
+
+def decode_slice(slice_proto):
+    """ Undo the clock delta and inst dictionary coding of a slice. """
+    last_clk_map = {}
+    inst_dict = list(slice_proto.inst_dict)
+    for entry_proto in slice_proto.entry:
+        if entry_proto.HasField('thd_id') and entry_proto.HasField('thd_clk'):
+            clk = (last_clk_map.get(entry_proto.thd_id, 0) + entry_proto.thd_clk) & 0xffffffffffffffff
+            entry_proto.thd_clk = clk
+            last_clk_map[entry_proto.thd_id] = clk
+        if entry_proto.HasField('inst_id'):
+            entry_proto.inst_id = inst_dict[entry_proto.inst_id]
+    del slice_proto.inst_dict[:]
+
+def load_slice(path, slice_no, codec=0):
+    """ Return a slice of a trace log, None if it does not exist. The
+    codec is the one in the meta data of the log.
+    """
+    slice_path = path + '/%d' % slice_no
+    if not os.path.exists(slice_path):
+        return None
+    f = open(slice_path, 'rb')
+    data = f.read()
+    f.close()
+    slice_proto = log_pb2().LogSliceProto()
+    if codec == log_pb2().LOG_CODEC_ZLIB:
+        size = struct.unpack('<Q', data[:8])[0]
+        data = zlib.decompress(data[8:])
+        assert len(data) == size
+        slice_proto.ParseFromString(data)
+        decode_slice(slice_proto)
+    else:
+        slice_proto.ParseFromString(data)
+    return slice_proto
+
+class SliceReader(object):
+    """ Read and parse the given slices of a trace log (all of them by
+    default) on a background thread, up to depth slices ahead of the
+    consumer.
+    """
+    def __init__(self, path, slice_nos=None, depth=1):
+        if slice_nos == None:
+            slice_nos = itertools.count(1)
+        self.codec = load_meta(path).codec
+        self.queue = Queue.Queue(depth)
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, args=(path, slice_nos))
+        self.thread.daemon = True
+        self.thread.start()
+    def run(self, path, slice_nos):
+        try:
+            for slice_no in slice_nos:
+                if self.stopped:
+                    break
+                slice_proto = load_slice(path, slice_no, self.codec)
+                if slice_proto == None:
+                    break
+                self.queue.put(slice_proto)
+            self.queue.put(None)
+        except Exception as e:
+            self.queue.put(e)
+    def next_slice(self):
+        """ Return the next slice, None after the last one. """
+        result = self.queue.get()
+        if isinstance(result, Exception):
+            raise result
+        if result == None:
+            # let later calls see the end as well
+            self.queue.put(None)
+        return result
+    def stop(self):
+        self.stopped = True
+        while self.thread.is_alive():
+            try:
+                self.queue.get(timeout=0.1)
+            except Queue.Empty:
+                pass
+        self.thread.join()
+
+def index_slice(slice_proto):
+    """ Return the index of a slice, see LogSliceIndexProto. """
+    clk_map = {}
+    inst_set = set()
+    type_set = set()
+    for entry_proto in slice_proto.entry:
+        type_set.add(entry_proto.type)
+        if entry_proto.HasField('inst_id'):
+            inst_set.add(entry_proto.inst_id)
+        if entry_proto.HasField('thd_id') and entry_proto.HasField('thd_clk'):
+            clk = entry_proto.thd_clk
+            (min_clk, max_clk) = clk_map.get(entry_proto.thd_id, (clk, clk))
+            clk_map[entry_proto.thd_id] = (min(min_clk, clk), max(max_clk, clk))
+    slice_index = log_pb2().LogSliceIndexProto()
+    slice_index.slice_no = slice_proto.slice_no
+    for thd_id in sorted(clk_map.keys()):
+        thread_index = slice_index.thread.add()
+        thread_index.thd_id = thd_id
+        (thread_index.min_clk, thread_index.max_clk) = clk_map[thd_id]
+    slice_index.inst_id.extend(sorted(inst_set))
+    slice_index.type.extend(sorted(type_set))
+    return slice_index
+
+def load_index(path):
+    """ Return the index of a trace log. Traces recorded without one are
+    indexed by a pass over the slices, and the index is saved if the log
+    directory is writable.
+    """
+    index = log_pb2().LogIndexProto()
+    index_path = path + '/index'
+    if os.path.exists(index_path):
+        f = open(index_path, 'rb')
+        index.ParseFromString(f.read())
+        f.close()
+        return index
+    reader = SliceReader(path)
+    while True:
+        slice_proto = reader.next_slice()
+        if slice_proto == None:
+            break
+        index.uid = slice_proto.uid
+        index.slice.add().CopyFrom(index_slice(slice_proto))
+    reader.stop()
+    try:
+        f = open(index_path, 'wb')
+        f.write(index.SerializeToString())
+        f.close()
+    except IOError:
+        pass
+    return index
+
+class LogFilter(object):
+    """ A filter on the entries of a trace log. Each field that is not
+    None must match: the thread, the clock window [min_clk, max_clk]
+    (inclusive), the inst and the set of entry types.
+    """
+    def __init__(self, thd_id=None, min_clk=None, max_clk=None, inst_id=None, types=None):
+        self.thd_id = thd_id
+        self.min_clk = min_clk
+        self.max_clk = max_clk
+        self.inst_id = inst_id
+        self.types = types
+    def has_clk(self):
+        return self.min_clk != None or self.max_clk != None
+    def in_window(self, min_clk, max_clk):
+        if self.min_clk != None and max_clk < self.min_clk:
+            return False
+        if self.max_clk != None and min_clk > self.max_clk:
+            return False
+        return True
+    def match_slice(self, slice_index):
+        """ Return whether some entry of the indexed slice may match. """
+        if self.types != None and len(self.types & set(slice_index.type)) == 0:
+            return False
+        if self.inst_id != None:
+            inst_ids = slice_index.inst_id
+            pos = bisect.bisect_left(inst_ids, self.inst_id)
+            if pos == len(inst_ids) or inst_ids[pos] != self.inst_id:
+                return False
+        if self.thd_id != None or self.has_clk():
+            for thread_index in slice_index.thread:
+                if self.thd_id != None and thread_index.thd_id != self.thd_id:
+                    continue
+                if self.in_window(thread_index.min_clk, thread_index.max_clk):
+                    return True
+            return False
+        return True
+    def match(self, entry_proto):
+        if self.types != None and not entry_proto.type in self.types:
+            return False
+        if self.inst_id != None:
+            if not entry_proto.HasField('inst_id') or entry_proto.inst_id != self.inst_id:
+                return False
+        if self.thd_id != None:
+            if not entry_proto.HasField('thd_id') or entry_proto.thd_id != self.thd_id:
+                return False
+        if self.has_clk():
+            if not entry_proto.HasField('thd_clk'):
+                return False
+            if not self.in_window(entry_proto.thd_clk, entry_proto.thd_clk):
+                return False
+        return True
+
 class TraceLog(object):
     def __init__(self, sinfo):
         self.sinfo = sinfo
@@ -81,6 +314,7 @@ class TraceLog(object):
         self.path = None
         self.entry_cursor = 0
         self.has_next = False
+        self.reader = None
     def open_for_read(self, path):
         if not os.path.isdir(path):
             return False
@@ -94,10 +328,14 @@ class TraceLog(object):
         f = open(meta_path, 'rb')
         self.meta.ParseFromString(f.read())
         f.close()
-        # read log slice
-        f = open(slice_path, 'rb')
-        self.slice.ParseFromString(f.read())
-        f.close()
+        # read log slices, the next one is parsed while this one is used
+        self.reader = SliceReader(path)
+        self.slice = self.reader.next_slice()
+        if self.slice == None:
+            self.reader.stop()
+            self.reader = None
+            self.slice = log_pb2().LogSliceProto()
+            return False
         # setup
         self.mode = 'READ'
         self.path = path
@@ -109,6 +347,8 @@ class TraceLog(object):
         return True
     def close_for_read(self):
         assert self.mode == 'READ'
+        self.reader.stop()
+        self.reader = None
         self.slice.Clear()
         self.meta.Clear()
         self.mode = None
@@ -131,19 +371,43 @@ class TraceLog(object):
         return entry
     def switch_slice_for_read(self):
         assert self.mode == 'READ'
-        curr_slice_no = self.slice.slice_no
-        next_slice_no = curr_slice_no + 1
-        self.slice.Clear()
-        slice_path = self.path + '/%d' % next_slice_no
-        if not os.path.exists(slice_path):
+        next_slice = self.reader.next_slice()
+        if next_slice == None:
+            self.slice.Clear()
             self.has_next = False
         else:
-            f = open(slice_path, 'rb')
-            self.slice.ParseFromString(f.read())
-            f.close()
+            self.slice = next_slice
             assert len(self.slice.entry) > 0
             self.entry_cursor = 0
             self.has_next = True
+    def iter_batches(self):
+        """ Yield the remaining entries as one LogBatch per slice. """
+        assert self.mode == 'READ'
+        while self.has_next_entry():
+            entries = self.slice.entry[self.entry_cursor:]
+            self.entry_cursor = len(self.slice.entry)
+            self.has_next = False
+            yield LogBatch(entries)
+    def query(self, path, log_filter):
+        """ Yield the entries of the trace log matching the filter. Only
+        the slices whose index may match are read.
+        """
+        index = load_index(path)
+        slice_nos = []
+        for slice_index in index.slice:
+            if log_filter.match_slice(slice_index):
+                slice_nos.append(slice_index.slice_no)
+        reader = SliceReader(path, slice_nos)
+        try:
+            while True:
+                slice_proto = reader.next_slice()
+                if slice_proto == None:
+                    break
+                for entry_proto in slice_proto.entry:
+                    if log_filter.match(entry_proto):
+                        yield LogEntry(entry_proto, self)
+        finally:
+            reader.stop()
     def display(self, f, path):
         self.open_for_read(path)
         while self.has_next_entry():
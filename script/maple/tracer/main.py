@@ -51,6 +51,21 @@ def __display_log(output, options):
     trace = trace_log.TraceLog(sinfo)
     trace.display(output, options.trace_log_path)
 
+def __display_log_query(output, options):
+    sinfo = static_info.StaticInfo()
+    sinfo.load(options.sinfo_in)
+    types = None
+    if len(options.entry_type) > 0:
+        types = set([trace_log.log_entry_type(name) for name in options.entry_type])
+    log_filter = trace_log.LogFilter(options.thd_id,
+                                     options.min_clk,
+                                     options.max_clk,
+                                     options.inst_id,
+                                     types)
+    trace = trace_log.TraceLog(sinfo)
+    for entry in trace.query(options.trace_log_path, log_filter):
+        output.write('%s\n' % str(entry))
+
 def valid_display_set():
     result = set()
     for name in dir(sys.modules[__name__]):
@@ -110,6 +125,46 @@ def register_display_options(parser):
             default='trace-log',
             metavar='PATH',
             help='the dir of log files.')
+    parser.add_option(
+            '--thd_id',
+            action='store',
+            type='long',
+            dest='thd_id',
+            default=None,
+            metavar='N',
+            help='only show the entries of this thread (log_query)')
+    parser.add_option(
+            '--min_clk',
+            action='store',
+            type='long',
+            dest='min_clk',
+            default=None,
+            metavar='N',
+            help='only show the entries from this thread clock on (log_query)')
+    parser.add_option(
+            '--max_clk',
+            action='store',
+            type='long',
+            dest='max_clk',
+            default=None,
+            metavar='N',
+            help='only show the entries up to this thread clock (log_query)')
+    parser.add_option(
+            '--inst_id',
+            action='store',
+            type='int',
+            dest='inst_id',
+            default=None,
+            metavar='N',
+            help='only show the entries of this inst (log_query)')
+    parser.add_option(
+            '--entry_type',
+            action='append',
+            type='string',
+            dest='entry_type',
+            default=[],
+            metavar='TYPE',
+            help='only show the entries of this type, e.g. BEFORE_MEM_READ (log_query)')
 
 def __command_display(argv):
     parser = optparse.OptionParser(display_usage())
@@ -31,6 +31,7 @@ class RecorderAnalyzer(analyzer.Analyzer):
         self.register_knob('trace_malloc', 'bool', True, 'whether record memory allocation functions')
         self.register_knob('trace_syscall', 'bool', True, 'whether record system calls')
         self.register_knob('trace_track_clk', 'bool', True, 'whether track per thread clock')
+        self.register_knob('trace_log_codec', 'string', 'raw', 'the trace slice encoding (raw or zlib)')
 
 class Profiler(pintool.Pintool):
     def __init__(self):
@@ -132,3 +132,16 @@ std::string CmdlineKnob::ValueStr(const std::string &name) {
   return *((std::string *)it->second.second);
 }
 
+void CmdlineKnob::Override(const std::string &name, const std::string &val) {
+  KnobNameMap::iterator it = knob_table_.find(name);
+  if (it == knob_table_.end())
+    return;
+
+  if (it->second.first == KNOB_TYPE_BOOL) {
+    *((bool *)it->second.second) = atoi(val.c_str()) ? true : false;
+  } else if (it->second.first == KNOB_TYPE_INT) {
+    *((int *)it->second.second) = atoi(val.c_str());
+  } else if (it->second.first == KNOB_TYPE_STR) {
+    *((std::string *)it->second.second) = val;
+  }
+}
@@ -40,6 +40,7 @@ class CmdlineKnob : public Knob {
   bool ValueBool(const std::string &name);
   int ValueInt(const std::string &name);
   std::string ValueStr(const std::string &name);
+  void Override(const std::string &name, const std::string &val);
 
  private:
   typedef enum {
@@ -19,6 +19,12 @@
 #include "core/execution_control.hpp"
 
 #include <cassert>
+#include <cerrno>
+#include <cstdio>
+#include <cstdlib>
+#include <sstream>
+#include <sys/wait.h>
+#include <unistd.h>
 
 #include "core/logging.h"
 #include "core/stat.h"
@@ -34,7 +40,8 @@ ExecutionControl::ExecutionControl()
       callstack_info_(NULL),
       debug_analyzer_(NULL),
       main_thread_started_(false),
-      main_thd_id_(INVALID_THD_ID) {
+      main_thd_id_(INVALID_THD_ID),
+      fork_funptr_(NULL) {
   // Empty.
 }
 
@@ -52,6 +59,10 @@ void ExecutionControl::PreSetup() {
   knob_->RegisterStr("stat_out", "the statistics output file", "stat.out");
   knob_->RegisterStr("sinfo_in", "the input static info database path", "sinfo.db");
   knob_->RegisterStr("sinfo_out", "the output static info database path", "sinfo.db");
+#ifdef _USING_FORK_SERVER
+  knob_->RegisterBool("fork_server", "whether to stop before main and fork a new process for each run request", "0");
+  knob_->RegisterInt("fork_server_fd", "the fd to read run requests from (status is written to the next fd)", "198");
+#endif
 
   debug_analyzer_ = new DebugAnalyzer;
   debug_analyzer_->Register();
@@ -350,9 +361,18 @@ void ExecutionControl::ImageLoad(IMG img, VOID *v) {
     ReplaceMallocWrappers(img);
 
   // instrument the start functions (using heuristics)
-  if (desc_.HookMainFunc())
+  if (desc_.HookMainFunc() || ForkServerEnabled())
     InstrumentStartupFunc(img);
 
+#ifdef _USING_FORK_SERVER
+  // find the fork function of the application for the fork server
+  if (ForkServerEnabled() && !fork_funptr_) {
+    RTN rtn = RTN_FindByName(img, "fork");
+    if (RTN_Valid(rtn))
+      fork_funptr_ = (AFUNPTR)RTN_Address(rtn);
+  }
+#endif
+
   Image *image = sinfo_->FindImage(IMG_Name(img));
   if (!image)
     image = sinfo_->CreateImage(IMG_Name(img));
@@ -581,6 +601,10 @@ void ExecutionControl::HandleMain(THREADID tid, CONTEXT *ctxt) {
   CALL_ANALYSIS_FUNC2(MainFunc, Main, self, curr_thd_clk);
 }
 
+void ExecutionControl::HandleForkChild() {
+  // empty
+}
+
 void ExecutionControl::HandleThreadMain(THREADID tid, CONTEXT *ctxt) {
   thread_id_t self = Self();
   timestamp_t curr_thd_clk = GetThdClk(tid);
@@ -797,6 +821,115 @@ void ExecutionControl::ReplacePthreadWrappers(IMG img) {
   ACTIVATE_WRAPPER_HANDLER(PthreadBarrierWait);
 }
 
+bool ExecutionControl::ForkServerEnabled() {
+#ifdef _USING_FORK_SERVER
+  return knob_->ValueBool("fork_server");
+#else
+  return false;
+#endif
+}
+
+#ifdef _USING_FORK_SERVER
+static bool ReadRequest(int fd, std::string *line) {
+  line->clear();
+  while (true) {
+    char c;
+    ssize_t res = read(fd, &c, 1);
+    if (res < 0 && errno == EINTR)
+      continue;
+    if (res <= 0)
+      return false;
+    if (c == '\n')
+      return true;
+    line->push_back(c);
+  }
+}
+
+static void WriteStatus(int fd, const char *name, int value) {
+  char buf[64];
+  int len = snprintf(buf, sizeof(buf), "%s %d\n", name, value);
+  const char *ptr = buf;
+  while (len > 0) {
+    ssize_t res = write(fd, ptr, len);
+    if (res < 0 && errno == EINTR)
+      continue;
+    if (res <= 0)
+      return;
+    ptr += res;
+    len -= res;
+  }
+}
+
+// Decode the %XX escapes of a knob value in a run request, so that
+// values may contain spaces.
+static std::string DecodeValue(const std::string &val) {
+  std::string result;
+  for (size_t i = 0; i < val.size(); i++) {
+    if (val[i] == '%' && i + 2 < val.size()) {
+      result.push_back((char)strtol(val.substr(i + 1, 2).c_str(), NULL, 16));
+      i += 2;
+    } else {
+      result.push_back(val[i]);
+    }
+  }
+  return result;
+}
+
+// The fork server protocol, only built with _USING_FORK_SERVER. The
+// requests are lines of the form "run [knob=value ...]" or "quit", the
+// values being %XX escaped. For each run, a new process is forked which
+// overrides the given knobs and continues to main. The server writes
+// "pid N" once the process is forked and "status S" (the raw wait
+// status) once it exits.
+void ExecutionControl::RunForkServer(THREADID tid, CONTEXT *ctxt) {
+  int ctl_fd = knob_->ValueInt("fork_server_fd");
+  int status_fd = ctl_fd + 1;
+  if (!fork_funptr_)
+    Abort("RunForkServer: fork is not found\n");
+
+  WriteStatus(status_fd, "ready", PIN_GetPid());
+  std::string line;
+  while (ReadRequest(ctl_fd, &line)) {
+    std::istringstream iss(line);
+    std::string cmd;
+    iss >> cmd;
+    if (cmd.compare("quit") == 0)
+      break;
+    if (cmd.compare("run") != 0)
+      continue;
+
+    int pid = -1;
+    PIN_CallApplicationFunction(ctxt, tid, CALLINGSTD_DEFAULT, fork_funptr_,
+                                PIN_PARG(int), &pid,
+                                PIN_PARG_END());
+    if (pid == 0) {
+      // in the child, apply the overrides and return to main
+      close(ctl_fd);
+      close(status_fd);
+      std::string token;
+      while (iss >> token) {
+        size_t pos = token.find('=');
+        if (pos != std::string::npos)
+          knob_->Override(token.substr(0, pos),
+                          DecodeValue(token.substr(pos + 1)));
+      }
+      HandleForkChild();
+      return;
+    }
+
+    WriteStatus(status_fd, "pid", pid);
+    if (pid < 0)
+      continue;
+    int status = 0;
+    while (waitpid(pid, &status, 0) < 0 && errno == EINTR) {}
+    WriteStatus(status_fd, "status", status);
+  }
+
+  // the server itself never runs main, so it has nothing to save
+  PIN_ExitProcess(0);
+}
+#endif
+
 void ExecutionControl::ReplaceMallocWrappers(IMG img) {
   ACTIVATE_WRAPPER_HANDLER(Malloc);
   ACTIVATE_WRAPPER_HANDLER(Calloc);
@@ -855,7 +988,12 @@ void PIN_FAST_ANALYSIS_CALL ExecutionControl::__InstCount2(THREADID tid,
 }
 
 void ExecutionControl::__Main(THREADID tid, CONTEXT *ctxt) {
-  ctrl_->HandleMain(tid, ctxt);
+#ifdef _USING_FORK_SERVER
+  if (ctrl_->ForkServerEnabled())
+    ctrl_->RunForkServer(tid, ctxt);
+#endif
+  if (ctrl_->desc_.HookMainFunc())
+    ctrl_->HandleMain(tid, ctxt);
 }
 
 void ExecutionControl::__ThreadMain(THREADID tid, CONTEXT *ctxt) {
@@ -206,6 +206,7 @@ class ExecutionControl {
   virtual void HandleThreadStart();
   virtual void HandleThreadExit();
   virtual void HandleMain(THREADID tid, CONTEXT *ctxt);
+  virtual void HandleForkChild();
   virtual void HandleThreadMain(THREADID tid, CONTEXT *ctxt);
   virtual void HandleBeforeMemRead(THREADID tid, Inst *inst, address_t addr,
                                    size_t size);
@@ -268,11 +269,16 @@ class ExecutionControl {
   std::map<OS_THREAD_ID, thread_id_t> os_tid_map_;
   std::map<pthread_t, thread_id_t> pthread_handle_map_;
   thread_id_t main_thd_id_;
+  AFUNPTR fork_funptr_;
 
   static ExecutionControl *ctrl_;
 
  private:
   void InstrumentStartupFunc(IMG img);
+  bool ForkServerEnabled();
+#ifdef _USING_FORK_SERVER
+  void RunForkServer(THREADID tid, CONTEXT *ctxt);
+#endif
 
   static void PIN_FAST_ANALYSIS_CALL __InstCount(THREADID tid);
   static void PIN_FAST_ANALYSIS_CALL __InstCount2(THREADID tid, UINT32 c);
@@ -36,6 +36,8 @@ class Knob {
   virtual bool ValueBool(const std::string &name) = 0;
   virtual int ValueInt(const std::string &name) = 0;
   virtual std::string ValueStr(const std::string &name) = 0;
+  // Replace the value of a registered knob (used by fork servers).
+  virtual void Override(const std::string &name, const std::string &val) = 0;
 
   static void Initialize(Knob *knob) { knob_ = knob; }
   static Knob *Get() { return knob_; }
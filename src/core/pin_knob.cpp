@@ -18,6 +18,8 @@
 
 #include "core/pin_knob.hpp"
 
+#include <cstdlib>
+
 #include "core/logging.h"
 
 bool PinKnob::Exist(const std::string &name) {
@@ -61,18 +63,34 @@ void PinKnob::RegisterStr(const std::string &name, const std::string &desc,
 bool PinKnob::ValueBool(const std::string &name) {
   KnobNameMap::iterator it = knob_table_.find(name);
   DEBUG_ASSERT(it != knob_table_.end() && it->second.first == KNOB_TYPE_BOOL);
+  std::map<std::string, std::string>::iterator oit = override_table_.find(name);
+  if (oit != override_table_.end())
+    return oit->second.compare("1") == 0 || oit->second.compare("true") == 0;
   return ((KNOB<bool> *)it->second.second)->Value();
 }
 
 int PinKnob::ValueInt(const std::string &name) {
   KnobNameMap::iterator it = knob_table_.find(name);
   DEBUG_ASSERT(it != knob_table_.end() && it->second.first == KNOB_TYPE_INT);
+  std::map<std::string, std::string>::iterator oit = override_table_.find(name);
+  if (oit != override_table_.end())
+    return atoi(oit->second.c_str());
   return ((KNOB<int> *)it->second.second)->Value();
 }
 
 std::string PinKnob::ValueStr(const std::string &name) {
   KnobNameMap::iterator it = knob_table_.find(name);
   DEBUG_ASSERT(it != knob_table_.end() && it->second.first == KNOB_TYPE_STR);
+  std::map<std::string, std::string>::iterator oit = override_table_.find(name);
+  if (oit != override_table_.end())
+    return oit->second;
   return ((KNOB<std::string> *)it->second.second)->Value();
 }
 
+void PinKnob::Override(const std::string &name, const std::string &val) {
+  if (!Exist(name))
+    return;
+
+  override_table_[name] = val;
+}
+
@@ -40,6 +40,7 @@ class PinKnob : public Knob {
   bool ValueBool(const std::string &name);
   int ValueInt(const std::string &name);
   std::string ValueStr(const std::string &name);
+  void Override(const std::string &name, const std::string &val);
 
  private:
   typedef enum {
@@ -54,6 +55,7 @@ class PinKnob : public Knob {
   bool Exist(const std::string &name);
 
   KnobNameMap knob_table_;
+  std::map<std::string, std::string> override_table_;
 
   DISALLOW_COPY_CONSTRUCTORS(PinKnob);
 };
@@ -19,19 +19,56 @@
 #include "idiom/memo.h"
 
 #include <cassert>
+#include <cstdio>
 #include <algorithm>
+#include <fstream>
+#include <sstream>
+#include <unistd.h>
+#include <sys/stat.h>
 #include "core/logging.h"
 
 namespace idiom {
 
 #define DEFAULT_FAILED_LIMIT         2
 #define DEFAULT_TOTAL_FAILED_LIMIT   6
+#define DEFAULT_JOURNAL_LIMIT        1024
+
+static std::string JournalName(const std::string &db_name) {
+  return db_name + ".journal";
+}
+
+static bool ReadFile(const std::string &name, std::string *data) {
+  std::ifstream in(name.c_str(), std::ios::in | std::ios::binary);
+  if (!in.is_open())
+    return false;
+  std::stringstream buffer;
+  buffer << in.rdbuf();
+  in.close();
+  *data = buffer.str();
+  return true;
+}
+
+// Return the generation of the snapshot of a database on disk.
+static uint32 LoadGeneration(const std::string &db_name) {
+  std::string data;
+  MemoProto proto;
+  if (!ReadFile(db_name, &data) || !proto.ParseFromString(data))
+    return 0;
+  return proto.generation();
+}
 
 Memo::Memo(Mutex *lock, iRootDB *iroot_db)
     : internal_lock_(lock),
       iroot_db_(iroot_db),
       failed_limit_(DEFAULT_FAILED_LIMIT),
-      total_failed_limit_(DEFAULT_TOTAL_FAILED_LIMIT) {
+      total_failed_limit_(DEFAULT_TOTAL_FAILED_LIMIT),
+      generation_(0),
+      journal_entries_(0),
+      journal_bytes_(0),
+      journal_size_(0),
+      journal_limit_(DEFAULT_JOURNAL_LIMIT),
+      dirty_(false),
+      replaying_(false) {
   // empty
 }
 
@@ -126,6 +163,7 @@ void Memo::TestSuccess(iRoot *iroot, bool locking) {
   iroot_info->set_total_test_runs(iroot_info->total_test_runs() + 1);
   // added to exposed set
   exposed_set_.insert(iroot_info);
+  Record(MEMO_DELTA_TEST_SUCCESS, iroot_info, false);
 }
 
 void Memo::TestFail(iRoot *iroot, bool locking) {
@@ -142,6 +180,7 @@ void Memo::TestFail(iRoot *iroot, bool locking) {
   if (iroot_info->total_test_runs() >= total_failed_limit_) {
     failed_set_.insert(iroot_info);
   }
+  Record(MEMO_DELTA_TEST_FAIL, iroot_info, false);
 }
 
 void Memo::Predicted(iRoot *iroot, bool locking) {
@@ -154,6 +193,7 @@ void Memo::Predicted(iRoot *iroot, bool locking) {
     predicted_set_.insert(iroot_info);
     DEBUG_ASSERT(candidate_map_.find(iroot_info) == candidate_map_.end());
     candidate_map_[iroot_info] = 0;
+    Record(MEMO_DELTA_PREDICTED, iroot_info, false);
   }
 }
 
@@ -162,10 +202,13 @@ void Memo::Observed(iRoot *iroot, bool shadow, bool locking) {
 
   iRootInfo *iroot_info = GetiRootInfo(iroot, false);
   DEBUG_ASSERT(iroot_info);
+  bool inserted;
   if (shadow)
-    shadow_exposed_set_.insert(iroot_info);
+    inserted = shadow_exposed_set_.insert(iroot_info).second;
   else
-    exposed_set_.insert(iroot_info);
+    inserted = exposed_set_.insert(iroot_info).second;
+  if (inserted)
+    Record(MEMO_DELTA_OBSERVED, iroot_info, shadow);
 }
 
 int Memo::TotalTestRuns(iRoot *iroot, bool locking) {
@@ -188,7 +231,10 @@ void Memo::SetAsync(iRoot *iroot, bool locking) {
 
   iRootInfo *iroot_info = GetiRootInfo(iroot, false);
   DEBUG_ASSERT(iroot_info);
-  iroot_info->set_async(true);
+  if (!iroot_info->async()) {
+    iroot_info->set_async(true);
+    Record(MEMO_DELTA_SET_ASYNC, iroot_info, false);
+  }
 }
 
 size_t Memo::TotalCandidate(bool locking) {
@@ -227,6 +273,9 @@ size_t Memo::TotalPredicted(bool locking) {
 }
 
 void Memo::Merge(Memo *other) {
+  // Not journaled.
+  dirty_ = true;
+
   // Merge iroot_info_map_.
   for (iRootInfoMap::iterator it = other->iroot_info_map_.begin();
        it != other->iroot_info_map_.end(); ++it) {
@@ -312,6 +361,7 @@ void Memo::Merge(Memo *other) {
 }
 
 void Memo::RefineCandidate(bool memo_failed) {
+  Record(MEMO_DELTA_REFINE_CANDIDATE, NULL, memo_failed);
   iRootInfoSet to_remove;
 
   // remove those candidates that reach failed limit
@@ -341,7 +391,19 @@ void Memo::RefineCandidate(bool memo_failed) {
   }
 }
 
+void Memo::MarkUnexposedFailed() {
+  Record(MEMO_DELTA_MARK_UNEXPOSED_FAILED, NULL, false);
+  for (iRootInfoMap::iterator it = iroot_info_map_.begin();
+       it != iroot_info_map_.end(); ++it) {
+    if (exposed_set_.find(it->second) == exposed_set_.end())
+      failed_set_.insert(it->second);
+  }
+}
+
 void Memo::SampleCandidate(IdiomType idiom, size_t num) {
+  // Not journaled.
+  dirty_ = true;
+
   // Find all the iroot info that match the given idiom.
   std::vector<iRootInfo *> iroot_info_vec;
   for (CandidateMap::iterator it = candidate_map_.begin();
@@ -367,6 +429,7 @@ void Memo::SampleCandidate(IdiomType idiom, size_t num) {
 void Memo::Load(const std::string &db_name, StaticInfo *sinfo) {
   std::fstream in;
   in.open(db_name.c_str(), std::ios::in | std::ios::binary);
+  bool exist = in.is_open();
   proto_.ParseFromIstream(&in);
   in.close();
   // setup iroot info map
@@ -425,9 +488,23 @@ void Memo::Load(const std::string &db_name, StaticInfo *sinfo) {
     DEBUG_ASSERT(iroot_info);
     candidate_map_[iroot_info] = test_runs;
   }
+  // replay the journal
+  if (exist) {
+    db_name_ = db_name;
+    generation_ = proto_.generation();
+    Replay(JournalName(db_name));
+  }
 }
 
 void Memo::Save(const std::string &db_name, StaticInfo *sinfo) {
+  // append the changes to the journal of the loaded database if possible
+  if (!dirty_ && db_name == db_name_ &&
+      journal_entries_ + journal_.size() <= journal_limit_ &&
+      AppendJournal(db_name)) {
+    journal_.clear();
+    return;
+  }
+
   // sync exposed set
   proto_.clear_exposed();
   for (iRootInfoSet::iterator it = exposed_set_.begin();
@@ -461,10 +538,9 @@ void Memo::Save(const std::string &db_name, StaticInfo *sinfo) {
     candidate_proto->set_test_runs(it->second);
   }
 
-  std::fstream out;
-  out.open(db_name.c_str(), std::ios::out | std::ios::trunc | std::ios::binary);
-  proto_.SerializeToOstream(&out);
-  out.close();
+  SaveSnapshot(db_name);
+  journal_.clear();
+  dirty_ = false;
 }
 
 iRootInfo *Memo::GetiRootInfo(iRoot *iroot, bool locking) {
@@ -494,8 +570,197 @@ iRootInfo *Memo::CreateiRootInfo(iRoot *iroot, bool locking) {
   iroot_info_proto->set_total_test_runs(0);
   iRootInfo *iroot_info = new iRootInfo(iroot, iroot_info_proto);
   iroot_info_map_[iroot] = iroot_info;
+  Record(MEMO_DELTA_IROOT_INFO, iroot_info, false);
   return iroot_info;
 }
 
+void Memo::ResolveCandidate(iRoot *iroot, MemoDeltaType type) {
+  iRootInfo *iroot_info = GetiRootInfo(iroot, false);
+  DEBUG_ASSERT(iroot_info);
+  candidate_map_.erase(iroot_info);
+  if (type == MEMO_DELTA_RESOLVE_EXPOSED)
+    exposed_set_.insert(iroot_info);
+  else if (type == MEMO_DELTA_RESOLVE_FAILED)
+    failed_set_.insert(iroot_info);
+  else
+    shadow_exposed_set_.insert(iroot_info);
+  Record(type, iroot_info, false);
+}
+
+void Memo::Record(MemoDeltaType type, iRootInfo *iroot_info, bool flag) {
+  if (replaying_)
+    return;
+
+  MemoDeltaProto delta;
+  delta.set_type(type);
+  if (iroot_info)
+    delta.set_iroot_id(iroot_info->iroot()->id());
+  if (type == MEMO_DELTA_OBSERVED || type == MEMO_DELTA_REFINE_CANDIDATE)
+    delta.set_flag(flag);
+  journal_.push_back(delta);
+}
+
+void Memo::Replay(const std::string &journal_name) {
+  journal_entries_ = 0;
+  journal_bytes_ = 0;
+  journal_size_ = 0;
+  std::string data;
+  if (!ReadFile(journal_name, &data))
+    return;
+  journal_size_ = data.size();
+  ReplayData(data);
+}
+
+bool Memo::ReplayData(const std::string &data) {
+  // apply the records past journal_bytes_, return whether all of them
+  // could be applied
+  size_t pos = journal_bytes_;
+  replaying_ = true;
+  while (pos + 4 <= data.size()) {
+    const unsigned char *header = (const unsigned char *)data.data() + pos;
+    size_t size = header[0] | (header[1] << 8) | (header[2] << 16) |
+                  ((size_t)header[3] << 24);
+    // torn write at the end of the journal
+    if (pos + 4 + size > data.size())
+      break;
+    MemoDeltaProto delta;
+    if (!delta.ParseFromArray(data.data() + pos + 4, size))
+      break;
+    if (journal_entries_ == 0) {
+      // a journal left from an older snapshot is ignored
+      if (delta.type() != MEMO_DELTA_JOURNAL_START ||
+          delta.generation() != generation_)
+        break;
+    } else {
+      ApplyDelta(delta);
+    }
+    pos += 4 + size;
+    journal_entries_++;
+    journal_bytes_ = pos;
+  }
+  replaying_ = false;
+  return journal_bytes_ == data.size();
+}
+
+void Memo::ApplyDelta(const MemoDeltaProto &delta) {
+  if (delta.type() == MEMO_DELTA_MARK_UNEXPOSED_FAILED) {
+    MarkUnexposedFailed();
+    return;
+  }
+  if (delta.type() == MEMO_DELTA_REFINE_CANDIDATE) {
+    RefineCandidate(delta.flag());
+    return;
+  }
+
+  iRoot *iroot = iroot_db_->FindiRoot(delta.iroot_id(), false);
+  DEBUG_ASSERT(iroot);
+  switch (delta.type()) {
+    case MEMO_DELTA_IROOT_INFO:
+      GetiRootInfo(iroot, false);
+      break;
+    case MEMO_DELTA_TEST_SUCCESS:
+      TestSuccess(iroot, false);
+      break;
+    case MEMO_DELTA_TEST_FAIL:
+      TestFail(iroot, false);
+      break;
+    case MEMO_DELTA_PREDICTED:
+      Predicted(iroot, false);
+      break;
+    case MEMO_DELTA_OBSERVED:
+      Observed(iroot, delta.flag(), false);
+      break;
+    case MEMO_DELTA_SET_ASYNC:
+      SetAsync(iroot, false);
+      break;
+    case MEMO_DELTA_RESOLVE_EXPOSED:
+    case MEMO_DELTA_RESOLVE_FAILED:
+    case MEMO_DELTA_RESOLVE_SHADOW_EXPOSED:
+      ResolveCandidate(iroot, delta.type());
+      break;
+    default:
+      break;
+  }
+}
+
+bool Memo::AppendJournal(const std::string &db_name) {
+  // return false if the database changed on disk in a way that needs a
+  // new snapshot
+  if (journal_.empty())
+    return true;
+
+  // another writer may have written a snapshot since the load
+  if (LoadGeneration(db_name) != generation_)
+    return false;
+  std::string journal_name = JournalName(db_name);
+  struct stat st;
+  size_t size = 0;
+  if (stat(journal_name.c_str(), &st) == 0)
+    size = st.st_size;
+  if (size < journal_bytes_)
+    return false;
+  if (size != journal_size_) {
+    // another writer appended to the journal, pick up its records
+    std::string data;
+    if (!ReadFile(journal_name, &data))
+      return false;
+    journal_size_ = data.size();
+    if (!ReplayData(data))
+      return false;
+  }
+
+  if (journal_bytes_ == 0) {
+    MemoDeltaProto start;
+    start.set_type(MEMO_DELTA_JOURNAL_START);
+    start.set_generation(generation_);
+    journal_.insert(journal_.begin(), start);
+  }
+  std::string data;
+  for (size_t i = 0; i < journal_.size(); i++) {
+    std::string content;
+    journal_[i].SerializeToString(&content);
+    size_t size = content.size();
+    data.push_back((char)(size & 0xff));
+    data.push_back((char)((size >> 8) & 0xff));
+    data.push_back((char)((size >> 16) & 0xff));
+    data.push_back((char)((size >> 24) & 0xff));
+    data.append(content);
+  }
+
+  // drop the torn write that was already there on the last read
+  if (size > journal_bytes_)
+    truncate(journal_name.c_str(), journal_bytes_);
+  std::fstream out;
+  out.open(journal_name.c_str(),
+           std::ios::out | std::ios::app | std::ios::binary);
+  out.write(data.data(), data.size());
+  out.close();
+  journal_entries_ += journal_.size();
+  journal_bytes_ += data.size();
+  journal_size_ = journal_bytes_;
+  return true;
+}
+
+void Memo::SaveSnapshot(const std::string &db_name) {
+  generation_++;
+  proto_.set_generation(generation_);
+
+  // write to a temporary file first, so readers never see half a file
+  std::stringstream tmp_name;
+  tmp_name << db_name << ".tmp." << getpid();
+  std::fstream out;
+  out.open(tmp_name.str().c_str(),
+           std::ios::out | std::ios::trunc | std::ios::binary);
+  proto_.SerializeToOstream(&out);
+  out.close();
+  rename(tmp_name.str().c_str(), db_name.c_str());
+  unlink(JournalName(db_name).c_str());
+
+  db_name_ = db_name;
+  journal_entries_ = 0;
+  journal_bytes_ = 0;
+  journal_size_ = 0;
+}
+
 } // namespace idiom
 
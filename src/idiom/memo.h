@@ -19,6 +19,8 @@
 #ifndef IDIOM_MEMO_H_
 #define IDIOM_MEMO_H_
 
+#include <string>
+#include <vector>
 #include <tr1/unordered_map>
 #include <tr1/unordered_set>
 
@@ -81,6 +83,7 @@ class Memo {
   size_t TotalPredicted(bool locking);
   void Merge(Memo *other);
   void RefineCandidate(bool memo_failed);
+  void MarkUnexposedFailed();
   void SampleCandidate(IdiomType idiom, size_t num);
   void Load(const std::string &db_name, StaticInfo *sinfo);
   void Save(const std::string &db_name, StaticInfo *sinfo);
@@ -93,6 +96,13 @@ class Memo {
   iRootInfo *GetiRootInfo(iRoot *iroot, bool locking);
   iRootInfo *FindiRootInfo(iRoot *iroot, bool locking);
   iRootInfo *CreateiRootInfo(iRoot *iroot, bool locking);
+  void ResolveCandidate(iRoot *iroot, MemoDeltaType type);
+  void Record(MemoDeltaType type, iRootInfo *iroot_info, bool flag);
+  void Replay(const std::string &journal_name);
+  bool ReplayData(const std::string &data);
+  void ApplyDelta(const MemoDeltaProto &delta);
+  bool AppendJournal(const std::string &db_name);
+  void SaveSnapshot(const std::string &db_name);
 
   Mutex *internal_lock_;
   iRootDB *iroot_db_;
@@ -105,6 +115,17 @@ class Memo {
   MemoProto proto_;
   int failed_limit_;
   int total_failed_limit_;
+  // The journal state. Save appends the deltas recorded since the last
+  // Load or Save to the journal of the loaded database if possible.
+  std::string db_name_;
+  uint32 generation_;
+  std::vector<MemoDeltaProto> journal_;
+  size_t journal_entries_;
+  size_t journal_bytes_;
+  size_t journal_size_;
+  size_t journal_limit_;
+  bool dirty_;
+  bool replaying_;
 
  private:
   DISALLOW_COPY_CONSTRUCTORS(Memo);
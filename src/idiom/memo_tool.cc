@@ -18,13 +18,16 @@
 
 #include "idiom/memo_tool.h"
 
+#include <cstdio>
 #include <cstdlib>
+#include <sstream>
 
 namespace idiom {
 
 MemoTool::MemoTool()
     : iroot_db_(NULL),
-      memo_(NULL) {
+      memo_(NULL),
+      num_(0) {
   // Empty.
 }
 
@@ -44,27 +47,27 @@ void MemoTool::HandlePreSetup() {
 void MemoTool::HandlePostSetup() {
   OfflineTool::HandlePostSetup();
 
-  // Load the iroot database.
-  iroot_db_ = new iRootDB(CreateMutex());
-  iroot_db_->Load(knob_->ValueStr("iroot_in"), sinfo_);
-  // load the memoization database.
-  memo_ = new Memo(CreateMutex(), iroot_db_);
-  memo_->Load(knob_->ValueStr("memo_in"), sinfo_);
+  // Load the iroot and the memoization databases.
+  Load();
 
   // Register operations.
-  Register("list", std::tr1::bind(&MemoTool::list, this));
-  Register("has_candidate", std::tr1::bind(&MemoTool::has_candidate, this));
+  Register("list", std::tr1::bind(&MemoTool::list, this), true);
+  Register("has_candidate", std::tr1::bind(&MemoTool::has_candidate, this), true);
   Register("sample_candidate", std::tr1::bind(&MemoTool::sample_candidate, this));
-  Register("total_candidate", std::tr1::bind(&MemoTool::total_candidate, this));
-  Register("total_exposed", std::tr1::bind(&MemoTool::total_exposed, this));
-  Register("total_predicted", std::tr1::bind(&MemoTool::total_predicted, this));
+  Register("total_candidate", std::tr1::bind(&MemoTool::total_candidate, this), true);
+  Register("total_exposed", std::tr1::bind(&MemoTool::total_exposed, this), true);
+  Register("total_predicted", std::tr1::bind(&MemoTool::total_predicted, this), true);
   Register("apply", std::tr1::bind(&MemoTool::apply, this));
+  Register("server", std::tr1::bind(&MemoTool::server, this));
 }
 
 void MemoTool::HandleStart() {
   OfflineTool::HandleStart();
 
   // Dispatch the operation.
+  arg_ = knob_->ValueStr("arg");
+  path_ = knob_->ValueStr("path");
+  num_ = knob_->ValueInt("num");
   Dispatch();
 }
 
@@ -80,9 +83,11 @@ void MemoTool::HandleExit() {
 }
 
 void MemoTool::Register(const std::string& name,
-                        const std::tr1::function<void(void)>& func) {
+                        const std::tr1::function<void(void)>& func,
+                        bool query) {
   operations_[name].name = name;
   operations_[name].func = func;
+  operations_[name].query = query;
 }
 
 void MemoTool::Dispatch() {
@@ -96,6 +101,20 @@ void MemoTool::Dispatch() {
   operations_[operation].func();
 }
 
+void MemoTool::Load() {
+  iroot_db_ = new iRootDB(CreateMutex());
+  iroot_db_->Load(knob_->ValueStr("iroot_in"), sinfo_);
+  memo_ = new Memo(CreateMutex(), iroot_db_);
+  memo_->Load(knob_->ValueStr("memo_in"), sinfo_);
+}
+
+void MemoTool::Unload() {
+  delete memo_;
+  delete iroot_db_;
+  memo_ = NULL;
+  iroot_db_ = NULL;
+}
+
 void MemoTool::list() {
   read_only_ = true;
 
@@ -111,7 +130,7 @@ void MemoTool::has_candidate() {
   read_only_ = true;
 
   iRoot *iroot = NULL;
-  std::string arg = knob_->ValueStr("arg");
+  std::string arg = arg_;
   if (arg == "0" || arg == "null") {
     iroot = memo_->ChooseForTest();
   } else if (arg == "1") {
@@ -134,8 +153,8 @@ void MemoTool::has_candidate() {
 }
 
 void MemoTool::sample_candidate() {
-  std::string arg = knob_->ValueStr("arg");
-  int num = knob_->ValueInt("num");
+  std::string arg = arg_;
+  int num = num_;
 
   if (arg == "1") {
     memo_->SampleCandidate(IDIOM_1, num);
@@ -181,10 +200,53 @@ void MemoTool::total_predicted() {
 
 void MemoTool::apply() {
   Memo *memo_other = new Memo(CreateMutex(), iroot_db_);
-  memo_other->Load(knob_->ValueStr("path"), sinfo_);
+  memo_other->Load(path_, sinfo_);
   memo_->Merge(memo_other);
   memo_->RefineCandidate(true);
 }
 
+// Keep the databases loaded and answer queries read from the standard
+// input, one per line: "OP [ARG [NUM [PATH]]]". The output of each query
+// is followed by a line with a single ".". The query "reload" loads the
+// databases again (e.g. after a Pin run updated them) and "quit" (or the
+// end of the input) stops the server. The databases are never saved.
+void MemoTool::server() {
+  std::string line;
+  char buf[4096];
+  while (fgets(buf, sizeof(buf), stdin)) {
+    line.append(buf);
+    if (line.empty() || line[line.size() - 1] != '\n')
+      continue;
+    std::istringstream iss(line);
+    line.clear();
+    std::string operation;
+    if (!(iss >> operation))
+      continue;
+    if (operation == "quit")
+      break;
+
+    arg_ = "null";
+    num_ = 0;
+    path_ = "null";
+    iss >> arg_ >> num_ >> path_;
+
+    if (operation == "reload") {
+      Unload();
+      delete sinfo_;
+      sinfo_ = new StaticInfo(CreateMutex());
+      sinfo_->Load(knob_->ValueStr("sinfo_in"));
+      Load();
+    } else if (operations_.find(operation) == operations_.end() ||
+               !operations_[operation].query) {
+      printf("Operation \"%s\" is not found!\n", operation.c_str());
+    } else {
+      operations_[operation].func();
+    }
+    printf(".\n");
+    fflush(stdout);
+  }
+  read_only_ = true;
+}
+
 } // namespace idiom {
 
@@ -42,6 +42,7 @@ class MemoTool : public OfflineTool {
   struct Operation {
     std::string name;
     std::tr1::function<void(void)> func;
+    bool query; // Whether the operation leaves the databases unchanged.
   };
 
   virtual void HandlePreSetup();
@@ -50,8 +51,11 @@ class MemoTool : public OfflineTool {
   virtual void HandleExit();
 
   void Register(const std::string& name,
-                const std::tr1::function<void(void)>& func);
+                const std::tr1::function<void(void)>& func,
+                bool query = false);
   void Dispatch();
+  void Load();
+  void Unload();
 
   // Belows are operation handling functions.
   void list();
@@ -61,9 +65,13 @@ class MemoTool : public OfflineTool {
   void total_exposed();
   void total_predicted();
   void apply();
+  void server();
 
   iRootDB *iroot_db_;
   Memo *memo_;
+  std::string arg_;
+  std::string path_;
+  int num_;
   std::map<std::string, Operation> operations_;
 
  private:
@@ -0,0 +1,83 @@
+// Copyright 2011 The University of Michigan
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+//
+// Authors - Jie Yu (jieyu@umich.edu)
+
+// File: idiom/offline_predictor.cc - Implementation of the offline iRoot
+// predictor.
+
+#include "idiom/offline_predictor.h"
+
+namespace idiom {
+
+OfflinePredictor::OfflinePredictor()
+    : iroot_db_(NULL),
+      memo_(NULL),
+      sinst_db_(NULL),
+      predictor_new_(NULL) {
+  // empty
+}
+
+void OfflinePredictor::HandlePreSetup() {
+  tracer::Loader::HandlePreSetup();
+
+  knob_->RegisterBool("memo_failed", "whether memoize fail-to-expose iroots", "1");
+  knob_->RegisterStr("iroot_in", "the input iroot database path", "iroot.db");
+  knob_->RegisterStr("iroot_out", "the output iroot database path", "iroot.db");
+  knob_->RegisterStr("memo_in", "the input memoization database path", "memo.db");
+  knob_->RegisterStr("memo_out", "the output memoization database path", "memo.db");
+  knob_->RegisterStr("sinst_in", "the input shared inst database path", "sinst.db");
+
+  predictor_new_ = new PredictorNew;
+  predictor_new_->Register();
+}
+
+void OfflinePredictor::HandlePostSetup() {
+  tracer::Loader::HandlePostSetup();
+
+  // load iroot db
+  iroot_db_ = new iRootDB(CreateMutex());
+  iroot_db_->Load(knob_->ValueStr("iroot_in"), sinfo_);
+  // load memoization db
+  memo_ = new Memo(CreateMutex(), iroot_db_);
+  memo_->Load(knob_->ValueStr("memo_in"), sinfo_);
+  // load shared inst db (read only)
+  sinst_db_ = new sinst::SharedInstDB(CreateMutex());
+  sinst_db_->Load(knob_->ValueStr("sinst_in"), sinfo_);
+
+  // the predictor is always enabled in this tool
+  predictor_new_->Setup(CreateMutex(), sinfo_, iroot_db_, memo_, sinst_db_);
+  AddAnalyzer(predictor_new_);
+}
+
+void OfflinePredictor::HandleStart() {
+  // replay the trace log once, the program exit entry at its end
+  // triggers the prediction
+  trace_log_->OpenForRead();
+  EventLoop();
+  trace_log_->CloseForRead();
+}
+
+void OfflinePredictor::HandleExit() {
+  tracer::Loader::HandleExit();
+
+  memo_->RefineCandidate(knob_->ValueBool("memo_failed"));
+
+  // save iroot db
+  iroot_db_->Save(knob_->ValueStr("iroot_out"), sinfo_);
+  // save memoization db
+  memo_->Save(knob_->ValueStr("memo_out"), sinfo_);
+}
+
+} // namespace idiom
@@ -0,0 +1,57 @@
+// Copyright 2011 The University of Michigan
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+//
+// Authors - Jie Yu (jieyu@umich.edu)
+
+// File: idiom/offline_predictor.h - Define the offline iRoot predictor,
+// which replays a recorded trace log into the iRoot predictor.
+
+#ifndef IDIOM_OFFLINE_PREDICTOR_H_
+#define IDIOM_OFFLINE_PREDICTOR_H_
+
+#include "core/basictypes.h"
+#include "tracer/loader.h"
+#include "sinst/sinst.h"
+#include "idiom/iroot.h"
+#include "idiom/memo.h"
+#include "idiom/predictor_new.h"
+
+namespace idiom {
+
+// The trace log is recorded once by the tracer profiler. The predictor
+// knobs (vw, complex_idioms, racy_only, ...) can then be changed freely
+// across runs of this tool without running the program under Pin again.
+class OfflinePredictor : public tracer::Loader {
+ public:
+  OfflinePredictor();
+  virtual ~OfflinePredictor() {}
+
+ protected:
+  virtual void HandlePreSetup();
+  virtual void HandlePostSetup();
+  virtual void HandleStart();
+  virtual void HandleExit();
+
+  iRootDB *iroot_db_;
+  Memo *memo_;
+  sinst::SharedInstDB *sinst_db_;
+  PredictorNew *predictor_new_;
+
+ private:
+  DISALLOW_COPY_CONSTRUCTORS(OfflinePredictor);
+};
+
+} // namespace idiom
+
+#endif
@@ -18,6 +18,8 @@ srcs += \
   idiom/memo_tool_main.cc \
   idiom/observer.cc \
   idiom/observer_new.cc \
+  idiom/offline_predictor.cc \
+  idiom/offline_predictor_main.cc \
   idiom/pct_profiler.cpp \
   idiom/pct_profiler_main.cpp \
   idiom/predictor.cc \
@@ -38,7 +40,8 @@ pintools += \
   idiom_scheduler.so
 
 cmdtools += \
-  idiom_memo_tool
+  idiom_memo_tool \
+  idiom_offline_predictor
 
 iroot_objs += \
   idiom/history.o \
@@ -129,3 +132,14 @@ idiom_memo_tool_objs := \
   idiom/memo_tool_main.o \
   $(core_cmd_objs)
 
+idiom_offline_predictor_objs := \
+  idiom/iroot.o \
+  idiom/iroot.pb.o \
+  idiom/memo.o \
+  idiom/memo.pb.o \
+  idiom/offline_predictor.o \
+  idiom/offline_predictor_main.o \
+  idiom/predictor_new.o \
+  $(tracer_cmd_objs) \
+  $(sinst_cmd_objs) \
+  $(core_cmd_objs)
@@ -40,10 +40,13 @@ unsigned long History::AvgNumThreads() {
   return (unsigned long)(total / (double)size);
 }
 
-void History::Update(unsigned long inst_count, unsigned long num_threads) {
+void History::Update(unsigned long inst_count, unsigned long num_threads,
+                     unsigned long seed, int depth) {
   HistoryProto *proto = table_proto_.add_history();
   proto->set_inst_count(inst_count);
   proto->set_num_threads(num_threads);
+  proto->set_seed(seed);
+  proto->set_depth(depth);
 }
 
 void History::Load(const std::string &file_name) {
@@ -35,7 +35,8 @@ class History {
   bool Empty() { return table_proto_.history_size() == 0; }
   unsigned long AvgInstCount();
   unsigned long AvgNumThreads();
-  void Update(unsigned long length, unsigned long num_threads);
+  void Update(unsigned long length, unsigned long num_threads,
+              unsigned long seed, int depth);
   void Load(const std::string &file_name);
   void Save(const std::string &file_name);
 
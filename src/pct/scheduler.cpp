@@ -30,6 +30,7 @@ namespace pct {
 
 Scheduler::Scheduler()
     : history_(NULL),
+      seed_(0),
       depth_(1),
       change_points_cursor_(0),
       change_priorities_cursor_(0),
@@ -57,6 +58,7 @@ void Scheduler::HandlePreSetup() {
   knob_->RegisterInt("depth", "the target bug depth", "3");
   knob_->RegisterBool("count_mem", "whether use the number of memory accesses as thread counter", "1");
   knob_->RegisterStr("pct_history", "the pct history file path", "pct.histo");
+  knob_->RegisterInt("seed", "the random seed (0 means seed from the time)", "0");
 }
 
 void Scheduler::HandlePostSetup() {
@@ -67,16 +69,7 @@ void Scheduler::HandlePostSetup() {
     desc_.SetHookSyscall();
   }
 
-  // load pct history
-  history_ = new History;
-  history_->Load(knob_->ValueStr("pct_history"));
-
-  // setup depth
-  if (history_->Empty())
-    depth_ = 1;
-  else
-    depth_ = knob_->ValueInt("depth");
-
+  LoadHistory();
   Randomize();
 }
 
@@ -121,7 +114,7 @@ void Scheduler::HandleSyscallEntry(THREADID tid, CONTEXT *ctxt,
 }
 
 void Scheduler::HandleProgramExit() {
-  history_->Update(total_inst_count_, total_num_threads_);
+  history_->Update(total_inst_count_, total_num_threads_, seed_, depth_);
   history_->Save(knob_->ValueStr("pct_history"));
 
   ExecutionControl::HandleProgramExit();
@@ -153,6 +146,26 @@ void Scheduler::HandleThreadExit() {
   ExecutionControl::HandleThreadExit();
 }
 
+void Scheduler::HandleForkChild() {
+  ExecutionControl::HandleForkChild();
+
+  // the fork server loaded the history and randomized with its own
+  // knobs, do it again with the knobs of this run
+  LoadHistory();
+  priority_change_points_.clear();
+  new_thread_priorities_.clear();
+  change_priorities_.clear();
+  change_points_cursor_ = 0;
+  change_priorities_cursor_ = 0;
+  new_thread_priorities_cursor_ = 0;
+  Randomize();
+
+  // the main thread has started in the server
+  SetAffinity();
+  int priority = NextNewThreadPriority();
+  SetPriority(priority);
+}
+
 void Scheduler::HandlePriorityChange(UINT32 c) {
   if (start_inst_count_) {
     unsigned long k = ATOMIC_ADD_AND_FETCH(&total_inst_count_, c);
@@ -185,8 +198,24 @@ int Scheduler::NextChangePriority() {
   return change_priorities_[cursor % change_priorities_.size()];
 }
 
+void Scheduler::LoadHistory() {
+  // load pct history
+  delete history_;
+  history_ = new History;
+  history_->Load(knob_->ValueStr("pct_history"));
+
+  // setup depth
+  if (history_->Empty())
+    depth_ = 1;
+  else
+    depth_ = knob_->ValueInt("depth");
+}
+
 void Scheduler::Randomize() {
-  srand(unsigned(time(NULL)));
+  seed_ = (unsigned)knob_->ValueInt("seed");
+  if (seed_ == 0)
+    seed_ = unsigned(time(NULL));
+  srand(unsigned(seed_));
 
   if (knob_->ValueBool("strict")) {
     // fill change priorities
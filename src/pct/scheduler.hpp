@@ -44,11 +44,13 @@ class Scheduler : public ExecutionControl {
   virtual void HandleProgramExit();
   virtual void HandleThreadStart();
   virtual void HandleThreadExit();
+  virtual void HandleForkChild();
   void HandlePriorityChange(UINT32 c);
 
   bool NeedPriorityChange(unsigned long k);
   int NextNewThreadPriority();
   int NextChangePriority();
+  void LoadHistory();
   void Randomize();
   void SetPriority(int priority);
   void SetStrictPriority(int priority);
@@ -56,6 +58,7 @@ class Scheduler : public ExecutionControl {
   void SetAffinity();
 
   History *history_;
+  unsigned long seed_;
   int depth_;
   bool count_mem_;
   std::vector<unsigned long> priority_change_points_;
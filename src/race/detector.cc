@@ -27,7 +27,9 @@ Detector::Detector()
     : internal_lock_(NULL),
       race_db_(NULL),
       unit_size_(4),
-      filter_(NULL) {
+      filter_(NULL),
+      shard_id_(0),
+      num_shards_(1) {
   // do nothing
 }
 
@@ -53,6 +55,14 @@ void Detector::Setup(Mutex *lock, RaceDB *race_db) {
   desc_.SetHookAtomicInst();
 }
 
+void Detector::SetShard(int shard_id, int num_shards) {
+  // synchronization is still tracked for all the addresses, so that the
+  // vector clocks of every shard are exact
+  DEBUG_ASSERT(num_shards >= 1 && shard_id >= 0 && shard_id < num_shards);
+  shard_id_ = shard_id;
+  num_shards_ = num_shards;
+}
+
 void Detector::ImageLoad(Image *image, address_t low_addr, address_t high_addr,
                          address_t data_start, size_t data_size,
                          address_t bss_start, size_t bss_size) {
@@ -107,6 +117,8 @@ void Detector::BeforeMemRead(thread_id_t curr_thd_id, timestamp_t curr_thd_clk,
   address_t start_addr = UNIT_DOWN_ALIGN(addr, unit_size_);
   address_t end_addr = UNIT_UP_ALIGN(addr + size, unit_size_);
   for (address_t iaddr = start_addr; iaddr < end_addr; iaddr += unit_size_) {
+    if (!InShard(iaddr))
+      continue;
     Meta *meta = GetMeta(iaddr);
     DEBUG_ASSERT(meta);
     ProcessRead(curr_thd_id, meta, inst);
@@ -124,6 +136,8 @@ void Detector::BeforeMemWrite(thread_id_t curr_thd_id, timestamp_t curr_thd_clk,
   address_t start_addr = UNIT_DOWN_ALIGN(addr, unit_size_);
   address_t end_addr = UNIT_UP_ALIGN(addr + size, unit_size_);
   for (address_t iaddr = start_addr; iaddr < end_addr; iaddr += unit_size_) {
+    if (!InShard(iaddr))
+      continue;
     Meta *meta = GetMeta(iaddr);
     DEBUG_ASSERT(meta);
     ProcessWrite(curr_thd_id, meta, inst);
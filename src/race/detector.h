@@ -29,6 +29,9 @@
 
 namespace race {
 
+// the granularity (in bytes) at which memory locations are sharded
+#define RACE_SHARD_UNIT 64
+
 class Detector : public Analyzer {
  public:
   Detector();
@@ -37,6 +40,7 @@ class Detector : public Analyzer {
   virtual void Register();
   virtual bool Enabled() = 0;
   virtual void Setup(Mutex *lock, RaceDB *race_db);
+  void SetShard(int shard_id, int num_shards);
   virtual void ImageLoad(Image *image,
                          address_t low_addr, address_t high_addr,
                          address_t data_start, size_t data_size,
@@ -164,6 +168,10 @@ class Detector : public Analyzer {
   void AllocAddrRegion(address_t addr, size_t size);
   void FreeAddrRegion(address_t addr);
   bool FilterAccess(address_t addr) { return filter_->Filter(addr, false); }
+  bool InShard(address_t iaddr) {
+    return num_shards_ <= 1 ||
+           (int)((iaddr / RACE_SHARD_UNIT) % num_shards_) == shard_id_;
+  }
   MutexMeta *GetMutexMeta(address_t iaddr);
   CondMeta *GetCondMeta(address_t iaddr);
   BarrierMeta *GetBarrierMeta(address_t iaddr);
@@ -195,6 +203,8 @@ class Detector : public Analyzer {
   // settings and flasg
   address_t unit_size_;
   RegionFilter *filter_;
+  int shard_id_; // only memory locations in this shard are tracked
+  int num_shards_;
 
   // meta data
   MutexMeta::Table mutex_meta_table_;
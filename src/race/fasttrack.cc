@@ -17,3 +17,171 @@
 // File: race/fasttrack.cc - Implementation of the data race detector
 // using the FastTrack algorithm.
 
+#include "race/fasttrack.h"
+
+#include "core/logging.h"
+
+namespace race {
+
+FastTrack::FastTrack() : track_racy_inst_(false) {
+  // do nothing
+}
+
+FastTrack::~FastTrack() {
+  // empty
+}
+
+void FastTrack::Register() {
+  Detector::Register();
+
+  knob_->RegisterBool("enable_fasttrack", "whether enable the fasttrack data race detector", "0");
+  knob_->RegisterBool("track_racy_inst", "whether track potential racy instructions", "0");
+}
+
+bool FastTrack::Enabled() {
+  return knob_->ValueBool("enable_fasttrack");
+}
+
+void FastTrack::Setup(Mutex *lock, RaceDB *race_db) {
+  Detector::Setup(lock, race_db);
+
+  track_racy_inst_ = knob_->ValueBool("track_racy_inst");
+}
+
+FastTrack::Meta *FastTrack::GetMeta(address_t iaddr) {
+  Meta::Table::iterator it = meta_table_.find(iaddr);
+  if (it == meta_table_.end()) {
+    Meta *meta = new FastTrackMeta(iaddr);
+    meta_table_[iaddr] = meta;
+    return meta;
+  } else {
+    return it->second;
+  }
+}
+
+void FastTrack::ProcessRead(thread_id_t curr_thd_id, Meta *meta, Inst *inst) {
+  // cast the meta
+  FastTrackMeta *ft_meta = dynamic_cast<FastTrackMeta *>(meta);
+  DEBUG_ASSERT(ft_meta);
+  // get the current vector clock
+  VectorClock *curr_vc = curr_vc_map_[curr_thd_id];
+  timestamp_t curr_clk = curr_vc->GetClock(curr_thd_id);
+  // check the writer
+  if (ft_meta->writer_inst &&
+      ft_meta->writer_thd_id != curr_thd_id &&
+      ft_meta->writer_clk > curr_vc->GetClock(ft_meta->writer_thd_id)) {
+    DEBUG_FMT_PRINT_SAFE("RAW race detcted [T%lx]\n", curr_thd_id);
+    DEBUG_FMT_PRINT_SAFE("  addr = 0x%lx\n", ft_meta->addr);
+    DEBUG_FMT_PRINT_SAFE("  inst = [%s]\n", inst->ToString().c_str());
+    // mark the meta as racy
+    ft_meta->racy = true;
+    // RAW race detected, report it
+    ReportRace(ft_meta, ft_meta->writer_thd_id, ft_meta->writer_inst,
+               RACE_EVENT_WRITE, curr_thd_id, inst, RACE_EVENT_READ);
+  }
+  // update meta data
+  if (ft_meta->shared) {
+    ft_meta->reader_vc.SetClock(curr_thd_id, curr_clk);
+    ft_meta->reader_inst_table[curr_thd_id] = inst;
+  } else if (!ft_meta->reader_inst ||
+             ft_meta->reader_thd_id == curr_thd_id ||
+             ft_meta->reader_clk <= curr_vc->GetClock(ft_meta->reader_thd_id)) {
+    // the last read happens before this one, keep the epoch only
+    ft_meta->reader_thd_id = curr_thd_id;
+    ft_meta->reader_clk = curr_clk;
+    ft_meta->reader_inst = inst;
+  } else {
+    // concurrent reads, switch to the vector clock
+    ft_meta->shared = true;
+    ft_meta->reader_vc.SetClock(ft_meta->reader_thd_id, ft_meta->reader_clk);
+    ft_meta->reader_inst_table[ft_meta->reader_thd_id] = ft_meta->reader_inst;
+    ft_meta->reader_vc.SetClock(curr_thd_id, curr_clk);
+    ft_meta->reader_inst_table[curr_thd_id] = inst;
+    ft_meta->reader_inst = NULL;
+  }
+  // update race inst set if needed
+  if (track_racy_inst_) {
+    ft_meta->race_inst_set.insert(inst);
+  }
+}
+
+void FastTrack::ProcessWrite(thread_id_t curr_thd_id, Meta *meta, Inst *inst) {
+  // cast the meta
+  FastTrackMeta *ft_meta = dynamic_cast<FastTrackMeta *>(meta);
+  DEBUG_ASSERT(ft_meta);
+  // get the current vector clock
+  VectorClock *curr_vc = curr_vc_map_[curr_thd_id];
+  // check the writer
+  if (ft_meta->writer_inst &&
+      ft_meta->writer_thd_id != curr_thd_id &&
+      ft_meta->writer_clk > curr_vc->GetClock(ft_meta->writer_thd_id)) {
+    DEBUG_FMT_PRINT_SAFE("WAW race detcted [T%lx]\n", curr_thd_id);
+    DEBUG_FMT_PRINT_SAFE("  addr = 0x%lx\n", ft_meta->addr);
+    DEBUG_FMT_PRINT_SAFE("  inst = [%s]\n", inst->ToString().c_str());
+    // mark the meta as racy
+    ft_meta->racy = true;
+    // WAW race detected, report it
+    ReportRace(ft_meta, ft_meta->writer_thd_id, ft_meta->writer_inst,
+               RACE_EVENT_WRITE, curr_thd_id, inst, RACE_EVENT_WRITE);
+  }
+  // check readers
+  if (ft_meta->shared) {
+    VectorClock &reader_vc = ft_meta->reader_vc;
+    for (reader_vc.IterBegin(); !reader_vc.IterEnd(); reader_vc.IterNext()) {
+      thread_id_t thd_id = reader_vc.IterCurrThd();
+      timestamp_t clk = reader_vc.IterCurrClk();
+      if (curr_thd_id != thd_id && clk > curr_vc->GetClock(thd_id)) {
+        DEBUG_FMT_PRINT_SAFE("WAR race detcted [T%lx]\n", curr_thd_id);
+        DEBUG_FMT_PRINT_SAFE("  addr = 0x%lx\n", ft_meta->addr);
+        DEBUG_FMT_PRINT_SAFE("  inst = [%s]\n", inst->ToString().c_str());
+        // mark the meta as racy
+        ft_meta->racy = true;
+        // WAR race detected, report it
+        DEBUG_ASSERT(ft_meta->reader_inst_table.find(thd_id) !=
+                     ft_meta->reader_inst_table.end());
+        Inst *reader_inst = ft_meta->reader_inst_table[thd_id];
+        ReportRace(ft_meta, thd_id, reader_inst, RACE_EVENT_READ,
+                   curr_thd_id, inst, RACE_EVENT_WRITE);
+      }
+    }
+    // the reads are ordered by this write from now on
+    ft_meta->shared = false;
+    ft_meta->reader_vc = VectorClock();
+    ft_meta->reader_inst_table.clear();
+  } else if (ft_meta->reader_inst &&
+             ft_meta->reader_thd_id != curr_thd_id &&
+             ft_meta->reader_clk > curr_vc->GetClock(ft_meta->reader_thd_id)) {
+    DEBUG_FMT_PRINT_SAFE("WAR race detcted [T%lx]\n", curr_thd_id);
+    DEBUG_FMT_PRINT_SAFE("  addr = 0x%lx\n", ft_meta->addr);
+    DEBUG_FMT_PRINT_SAFE("  inst = [%s]\n", inst->ToString().c_str());
+    // mark the meta as racy
+    ft_meta->racy = true;
+    // WAR race detected, report it
+    ReportRace(ft_meta, ft_meta->reader_thd_id, ft_meta->reader_inst,
+               RACE_EVENT_READ, curr_thd_id, inst, RACE_EVENT_WRITE);
+  }
+  // update meta data
+  ft_meta->writer_thd_id = curr_thd_id;
+  ft_meta->writer_clk = curr_vc->GetClock(curr_thd_id);
+  ft_meta->writer_inst = inst;
+  // update race inst set if needed
+  if (track_racy_inst_) {
+    ft_meta->race_inst_set.insert(inst);
+  }
+}
+
+void FastTrack::ProcessFree(Meta *meta) {
+  // cast the meta
+  FastTrackMeta *ft_meta = dynamic_cast<FastTrackMeta *>(meta);
+  DEBUG_ASSERT(ft_meta);
+  // update racy inst set if needed
+  if (track_racy_inst_ && ft_meta->racy) {
+    for (FastTrackMeta::InstSet::iterator it = ft_meta->race_inst_set.begin();
+         it != ft_meta->race_inst_set.end(); ++it) {
+      race_db_->SetRacyInst(*it, true);
+    }
+  }
+  delete ft_meta;
+}
+
+} // namespace race
@@ -20,4 +20,75 @@
 #ifndef RACE_FASTTRACK_H_
 #define RACE_FASTTRACK_H_
 
+#include <tr1/unordered_map>
+
+#include "core/basictypes.h"
+#include "core/vector_clock.h"
+#include "core/filter.h"
+#include "race/detector.h"
+#include "race/race.h"
+
+namespace race {
+
+// FastTrack keeps the last write of each location as an epoch (thread,
+// clock) instead of a vector clock, and switches the reads to a vector
+// clock only while they are concurrent. Most accesses are thus checked
+// in constant time.
+class FastTrack : public Detector {
+ public:
+  FastTrack();
+  ~FastTrack();
+
+  void Register();
+  bool Enabled();
+  void Setup(Mutex *lock, RaceDB *race_db);
+
+ protected:
+  // the meta data for the memory access
+  class FastTrackMeta : public Meta {
+   public:
+    typedef std::map<thread_id_t, Inst *> InstMap;
+    typedef std::set<Inst *> InstSet;
+
+    explicit FastTrackMeta(address_t a)
+        : Meta(a),
+          racy(false),
+          shared(false),
+          writer_thd_id(INVALID_THD_ID),
+          writer_clk(0),
+          writer_inst(NULL),
+          reader_thd_id(INVALID_THD_ID),
+          reader_clk(0),
+          reader_inst(NULL) {}
+
+    ~FastTrackMeta() {}
+
+    bool racy; // whether this meta is involved in any race
+    bool shared; // whether the reads are tracked by the vector clock
+    thread_id_t writer_thd_id; // the epoch of the last write
+    timestamp_t writer_clk;
+    Inst *writer_inst;
+    thread_id_t reader_thd_id; // the epoch of the last read (if !shared)
+    timestamp_t reader_clk;
+    Inst *reader_inst;
+    VectorClock reader_vc; // the concurrent reads (if shared)
+    InstMap reader_inst_table;
+    InstSet race_inst_set;
+  };
+
+  // overrided virtual functions
+  Meta *GetMeta(address_t iaddr);
+  void ProcessRead(thread_id_t curr_thd_id, Meta *meta, Inst *inst);
+  void ProcessWrite(thread_id_t curr_thd_id, Meta *meta, Inst *inst);
+  void ProcessFree(Meta *meta);
+
+  // settings and flasg
+  bool track_racy_inst_;
+
+ private:
+  DISALLOW_COPY_CONSTRUCTORS(FastTrack);
+};
+
+} // namespace race
+
 #endif
@@ -0,0 +1,83 @@
+// Copyright 2011 The University of Michigan
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+//
+// Authors - Jie Yu (jieyu@umich.edu)
+
+// File: race/offline_detector.cc - Implementation of the offline data
+// race detector.
+
+#include "race/offline_detector.h"
+
+#include <cstdio>
+#include <cstdlib>
+
+namespace race {
+
+OfflineDetector::OfflineDetector()
+    : race_db_(NULL),
+      djit_analyzer_(NULL),
+      fasttrack_analyzer_(NULL) {
+  // empty
+}
+
+void OfflineDetector::HandlePreSetup() {
+  tracer::Loader::HandlePreSetup();
+
+  knob_->RegisterStr("race_in", "the input race database path", "race.db");
+  knob_->RegisterStr("race_out", "the output race database path", "race.db");
+  knob_->RegisterInt("shard_id", "the memory shard checked by this run", "0");
+  knob_->RegisterInt("num_shards", "the number of memory shards", "1");
+
+  djit_analyzer_ = new Djit;
+  djit_analyzer_->Register();
+  fasttrack_analyzer_ = new FastTrack;
+  fasttrack_analyzer_->Register();
+}
+
+void OfflineDetector::HandlePostSetup() {
+  tracer::Loader::HandlePostSetup();
+
+  // load race db
+  race_db_ = new RaceDB(CreateMutex());
+  race_db_->Load(knob_->ValueStr("race_in"), sinfo_);
+
+  // make sure that we use one data race detector
+  if (djit_analyzer_->Enabled() == fasttrack_analyzer_->Enabled()) {
+    printf("Please choose a data race detector.\n");
+    exit(1);
+  }
+
+  Detector *detector = djit_analyzer_;
+  if (fasttrack_analyzer_->Enabled())
+    detector = fasttrack_analyzer_;
+  detector->Setup(CreateMutex(), race_db_);
+  detector->SetShard(knob_->ValueInt("shard_id"), knob_->ValueInt("num_shards"));
+  AddAnalyzer(detector);
+}
+
+void OfflineDetector::HandleStart() {
+  // replay the trace log once
+  trace_log_->OpenForRead();
+  EventLoop();
+  trace_log_->CloseForRead();
+}
+
+void OfflineDetector::HandleExit() {
+  tracer::Loader::HandleExit();
+
+  // save race db
+  race_db_->Save(knob_->ValueStr("race_out"), sinfo_);
+}
+
+} // namespace race
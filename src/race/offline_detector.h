@@ -0,0 +1,57 @@
+// Copyright 2011 The University of Michigan
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+//
+// Authors - Jie Yu (jieyu@umich.edu)
+
+// File: race/offline_detector.h - Define the offline data race detector,
+// which replays a recorded trace log into a data race detector.
+
+#ifndef RACE_OFFLINE_DETECTOR_H_
+#define RACE_OFFLINE_DETECTOR_H_
+
+#include "core/basictypes.h"
+#include "tracer/loader.h"
+#include "race/race.h"
+#include "race/detector.h"
+#include "race/djit.h"
+#include "race/fasttrack.h"
+
+namespace race {
+
+// The memory locations can be split into shards (see --num_shards) that
+// are checked by separate processes replaying the same trace log. Every
+// process tracks all the synchronization, so the race databases of the
+// shards together hold the races of a single (unsharded) run.
+class OfflineDetector : public tracer::Loader {
+ public:
+  OfflineDetector();
+  virtual ~OfflineDetector() {}
+
+ protected:
+  virtual void HandlePreSetup();
+  virtual void HandlePostSetup();
+  virtual void HandleStart();
+  virtual void HandleExit();
+
+  RaceDB *race_db_;
+  Djit *djit_analyzer_;
+  FastTrack *fasttrack_analyzer_;
+
+ private:
+  DISALLOW_COPY_CONSTRUCTORS(OfflineDetector);
+};
+
+} // namespace race
+
+#endif
@@ -0,0 +1,32 @@
+// Copyright 2011 The University of Michigan
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//     http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+//
+// Authors - Jie Yu (jieyu@umich.edu)
+
+// File: race/offline_detector_main.cc - The main entrance of the offline
+// data race detector.
+
+#include "race/offline_detector.h"
+
+static race::OfflineDetector *tool = new race::OfflineDetector;
+
+int main(int argc, char *argv[]) {
+  tool->Initialize();
+  tool->PreSetup();
+  tool->Parse(argc, argv);
+  tool->PostSetup();
+  tool->Start();
+  tool->Exit();
+  return 0;
+}
@@ -7,6 +7,8 @@ srcs += \
   race/detector.cc \
   race/djit.cc \
   race/fasttrack.cc \
+  race/offline_detector.cc \
+  race/offline_detector_main.cc \
   race/pct_profiler.cpp \
   race/pct_profiler_main.cpp \
   race/profiler.cpp \
@@ -18,6 +20,9 @@ pintools += \
   race_pct_profiler.so \
   race_profiler.so
 
+cmdtools += \
+  race_offline_detector
+
 race_profiler_objs := \
   race/detector.o \
   race/djit.o \
@@ -39,6 +44,17 @@ race_pct_profiler_objs := \
   $(pct_objs) \
   $(core_objs)
 
+race_offline_detector_objs := \
+  race/detector.o \
+  race/djit.o \
+  race/fasttrack.o \
+  race/offline_detector.o \
+  race/offline_detector_main.o \
+  race/race.o \
+  race/race.pb.o \
+  $(tracer_cmd_objs) \
+  $(core_cmd_objs)
+
 race_objs := \
   race/detector.o \
   race/djit.o \
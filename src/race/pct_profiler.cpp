@@ -30,6 +30,8 @@ void PctProfiler::HandlePreSetup() {
 
   djit_analyzer_ = new Djit;
   djit_analyzer_->Register();
+  fasttrack_analyzer_ = new FastTrack;
+  fasttrack_analyzer_->Register();
 }
 
 void PctProfiler::HandlePostSetup() {
@@ -45,8 +47,13 @@ void PctProfiler::HandlePostSetup() {
     AddAnalyzer(djit_analyzer_);
   }
 
+  if (fasttrack_analyzer_->Enabled()) {
+    fasttrack_analyzer_->Setup(CreateMutex(), race_db_);
+    AddAnalyzer(fasttrack_analyzer_);
+  }
+
   // make sure that we use one data race detector
-  if (!djit_analyzer_)
+  if (djit_analyzer_->Enabled() && fasttrack_analyzer_->Enabled())
     Abort("please choose a data race detector\n");
 }
 
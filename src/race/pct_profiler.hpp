@@ -24,12 +24,16 @@
 #include "pct/scheduler.hpp"
 #include "race/race.h"
 #include "race/djit.h"
+#include "race/fasttrack.h"
 
 namespace race {
 
 class PctProfiler : public pct::Scheduler {
  public:
-  PctProfiler() : race_db_(NULL), djit_analyzer_(NULL) {}
+  PctProfiler()
+      : race_db_(NULL),
+        djit_analyzer_(NULL),
+        fasttrack_analyzer_(NULL) {}
   ~PctProfiler() {}
 
  protected:
@@ -40,6 +44,7 @@ class PctProfiler : public pct::Scheduler {
 
   RaceDB *race_db_;
   Djit *djit_analyzer_;
+  FastTrack *fasttrack_analyzer_;
 
  private:
   DISALLOW_COPY_CONSTRUCTORS(PctProfiler);
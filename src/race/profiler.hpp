@@ -23,12 +23,16 @@
 #include "core/execution_control.hpp"
 #include "race/race.h"
 #include "race/djit.h"
+#include "race/fasttrack.h"
 
 namespace race {
 
 class Profiler : public ExecutionControl {
  public:
-  Profiler() : race_db_(NULL), djit_analyzer_(NULL) {}
+  Profiler()
+      : race_db_(NULL),
+        djit_analyzer_(NULL),
+        fasttrack_analyzer_(NULL) {}
   ~Profiler() {}
 
  protected:
@@ -39,6 +43,7 @@ class Profiler : public ExecutionControl {
 
   RaceDB *race_db_;
   Djit *djit_analyzer_;
+  FastTrack *fasttrack_analyzer_;
 
  private:
   DISALLOW_COPY_CONSTRUCTORS(Profiler);
@@ -42,6 +42,7 @@ static void seed_random_number(unsigned long seed) {
 
 Scheduler::Scheduler()
     : history_(NULL),
+      seed_(0),
       delay_(false),
       float_(false),
       chg_pts_cursor_(0),
@@ -71,6 +72,7 @@ void Scheduler::HandlePreSetup() {
   knob_->RegisterInt("float_interval", "average number of memory accesses between two change points", "50000");
   knob_->RegisterInt("num_chg_pts", "number of change points (when float is set to False))", "3");
   knob_->RegisterStr("rand_history", "the rand history file path", "rand.histo");
+  knob_->RegisterInt("seed", "the random seed (0 means seed from the time)", "0");
 }
 
 void Scheduler::HandlePostSetup() {
@@ -105,7 +107,7 @@ void Scheduler::HandlePostInstrumentTrace(TRACE trace) {
 }
 
 void Scheduler::HandleProgramExit() {
-  history_->Update(total_inst_count_, total_num_threads_);
+  history_->Update(total_inst_count_, total_num_threads_, seed_);
   history_->Save(knob_->ValueStr("rand_history"));
 
   ExecutionControl::HandleProgramExit();
@@ -141,6 +143,29 @@ void Scheduler::HandleThreadExit() {
   ExecutionControl::HandleThreadExit();
 }
 
+void Scheduler::HandleForkChild() {
+  ExecutionControl::HandleForkChild();
+
+  // the fork server loaded the history and randomized with its own
+  // knobs, do it again with the knobs of this run
+  delete history_;
+  history_ = new History;
+  history_->Load(knob_->ValueStr("rand_history"));
+  delay_ = knob_->ValueBool("delay");
+  float_ = knob_->ValueBool("float");
+  prio_vec_.clear();
+  chg_pts_vec_.clear();
+  chg_pts_cursor_ = 0;
+  Randomize();
+
+  // the main thread has started in the server
+  if (!delay_) {
+    SetAffinity();
+    int priority = RandomPriority();
+    SetPriority(priority);
+  }
+}
+
 void Scheduler::HandleChange(UINT32 c) {
   if (start_sched_) {
     unsigned long k = ATOMIC_ADD_AND_FETCH(&total_inst_count_, c);
@@ -183,8 +208,11 @@ void Scheduler::RandomDelay() {
 }
 
 void Scheduler::Randomize() {
-  srand(unsigned(time(NULL)));
-  seed_random_number(unsigned(time(NULL)));
+  seed_ = (unsigned)knob_->ValueInt("seed");
+  if (seed_ == 0)
+    seed_ = unsigned(time(NULL));
+  srand(unsigned(seed_));
+  seed_random_number(seed_);
 
   if (!delay_) {
     if (knob_->ValueBool("strict")) {
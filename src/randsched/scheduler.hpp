@@ -42,6 +42,7 @@ class Scheduler : public ExecutionControl {
   virtual void HandleProgramExit();
   virtual void HandleThreadStart();
   virtual void HandleThreadExit();
+  virtual void HandleForkChild();
   void HandleChange(UINT32 c);
 
   bool NeedChange(unsigned long k);
@@ -54,6 +55,7 @@ class Scheduler : public ExecutionControl {
   void SetAffinity();
 
   History *history_;
+  unsigned long seed_;
   bool delay_; // delay mode or not
   bool float_; // whether # of change points depends on execution length
   std::vector<int> prio_vec_;
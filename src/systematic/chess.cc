@@ -21,6 +21,9 @@
 #include "systematic/chess.h"
 
 #include <sys/stat.h>
+#include <unistd.h>
+#include <climits>
+#include <cstdio>
 #include <sstream>
 #include "core/logging.h"
 
@@ -31,6 +34,7 @@ ChessScheduler::ChessScheduler(ControllerInterface *controller)
       pb_enable_(false),
       por_enable_(false),
       pb_limit_(0),
+      cache_enable_(false),
       useless_(false),
       divergence_(false),
       curr_state_(NULL),
@@ -39,7 +43,11 @@ ChessScheduler::ChessScheduler(ControllerInterface *controller)
       prefix_size_(0),
       curr_preemptions_(0),
       curr_hash_val_(0),
-      curr_exec_id_(0) {
+      curr_exec_id_(0),
+      curr_cache_hash_(0),
+      cache_image_version_(0),
+      cache_lookups_(0),
+      cache_hits_(0) {
   // empty
 }
 
@@ -57,6 +65,8 @@ void ChessScheduler::Register() {
   knob()->RegisterStr("search_in", "the input file that contains the search information", "search.db");
   knob()->RegisterStr("search_out", "the output file that contains the search information", "search.db");
   knob()->RegisterStr("por_info_path", "the dir path that stores the partial order reduction information", "por-info");
+  knob()->RegisterBool("state_cache", "whether prune states explored by past searches of the same program", "0");
+  knob()->RegisterStr("state_cache_path", "the file that stores the explored states of past searches", "state-cache.db");
 }
 
 bool ChessScheduler::Enabled() {
@@ -70,6 +80,8 @@ void ChessScheduler::Setup() {
   por_enable_ = knob()->ValueBool("por");
   pb_limit_ = knob()->ValueInt("pb_limit");
   por_info_path_ = knob()->ValueStr("por_info_path");
+  cache_enable_ = knob()->ValueBool("state_cache");
+  cache_path_ = knob()->ValueStr("state_cache_path");
 
   // load search info
   search_info_.Load(knob()->ValueStr("search_in"), sinfo(), program());
@@ -93,6 +105,8 @@ void ChessScheduler::ProgramStart() {
     PbInit();
   if (por_enable_)
     PorInit();
+  if (cache_enable_)
+    CacheInit();
 }
 
 void ChessScheduler::ProgramExit() {
@@ -107,6 +121,8 @@ void ChessScheduler::ProgramExit() {
     search_info_.UpdateForNext();
     search_info_.Save(knob()->ValueStr("search_out"), sinfo(), program());
   }
+  if (cache_enable_)
+    CacheFini();
 }
 
 void ChessScheduler::Explore(State *init_state) {
@@ -121,6 +137,11 @@ void ChessScheduler::Explore(State *init_state) {
       DivergenceRun();
       return;
     }
+    // remember the state at this node for the state cache
+    if (cache_enable_ && curr_node_->idx() == node_cache_hash_.size()) {
+      node_cache_hash_.push_back(curr_cache_hash_);
+      node_preemptions_.push_back(curr_preemptions_);
+    }
     // update backtrack: add all enabled thread to backtrack
     // this is necessary because we want to explore all possible
     // interleavings. we only need to do it once.
@@ -147,6 +168,8 @@ void ChessScheduler::Explore(State *init_state) {
       PbUpdate(next_action);
     if (por_enable_)
       PorUpdate(next_action);
+    if (cache_enable_)
+      CacheUpdate(next_action);
     curr_action_ = next_action;
     curr_state_ = Execute(curr_state_, next_action);
   }
@@ -224,6 +247,13 @@ Action *ChessScheduler::PickNext() {
           curr_node_->AddDone(action->thd());
         }
       }
+      // 4) check explored by past searches (if state cache is enabled)
+      if (cache_enable_) {
+        if (CacheVisited(action)) {
+          DEBUG_FMT_PRINT_SAFE("Cache pruned\n");
+          curr_node_->AddDone(action->thd());
+        }
+      }
     }
   }
   // second pass, find an undone enabled action
@@ -570,5 +600,192 @@ void ChessScheduler::PorPrepareDir() {
   }
 }
 
+// state cache related functions
+static inline uint64 CacheMix(uint64 val) {
+  // the finalizer of MurmurHash3
+  val ^= val >> 33;
+  val *= 0xff51afd7ed558ccdULL;
+  val ^= val >> 33;
+  val *= 0xc4ceb9fe1a85ec53ULL;
+  val ^= val >> 33;
+  return val;
+}
+
+void ChessScheduler::CacheInit() {
+  DEBUG_ASSERT(cache_enable_);
+  curr_cache_hash_ = 0;
+  cache_lookups_ = 0;
+  cache_hits_ = 0;
+
+  // load the explored states of the program from file
+  ChessStateCacheProto cache_proto;
+  std::fstream in(cache_path_.c_str(), std::ios::in | std::ios::binary);
+  if (in.is_open())
+    cache_proto.ParseFromIstream(&in);
+  in.close();
+  std::string image_name = CacheImageName();
+  cache_image_version_ = CacheImageVersion();
+  for (int i = 0; i < cache_proto.image_size(); i++) {
+    ChessStateCacheProto::ImageProto *image_proto
+        = cache_proto.mutable_image(i);
+    // the entries of a rebuilt image may name states never explored
+    if (image_proto->name() != image_name ||
+        image_proto->version() != cache_image_version_)
+      continue;
+    for (int j = 0; j < image_proto->entry_size(); j++) {
+      ChessStateCacheProto::EntryProto *entry_proto
+          = image_proto->mutable_entry(j);
+      state_cache_[entry_proto->hash_val()] = entry_proto->budget();
+    }
+  }
+}
+
+void ChessScheduler::CacheFini() {
+  DEBUG_ASSERT(cache_enable_);
+
+  // the nodes popped from the search stack have their subtrees fully
+  // explored, unless part of them is explored by another search
+  StateCache explored;
+  SearchNode::Vec *popped = search_info_.Popped();
+  for (SearchNode::Vec::iterator it = popped->begin();
+       it != popped->end(); ++it) {
+    SearchNode *node = *it;
+    if (node->partial() || node->idx() >= node_cache_hash_.size())
+      continue;
+    cache_hash_t hash_val = node_cache_hash_[node->idx()];
+    int budget = CacheBudget(node_preemptions_[node->idx()]);
+    StateCache::iterator eit = explored.find(hash_val);
+    if (eit == explored.end() || eit->second < budget)
+      explored[hash_val] = budget;
+  }
+
+  // merge with the file, which may have been updated by other runs
+  ChessStateCacheProto cache_proto;
+  std::fstream in(cache_path_.c_str(), std::ios::in | std::ios::binary);
+  if (in.is_open())
+    cache_proto.ParseFromIstream(&in);
+  in.close();
+  std::string image_name = CacheImageName();
+  ChessStateCacheProto::ImageProto *image_proto = NULL;
+  for (int i = 0; i < cache_proto.image_size(); i++) {
+    if (cache_proto.image(i).name() == image_name)
+      image_proto = cache_proto.mutable_image(i);
+  }
+  if (!image_proto) {
+    image_proto = cache_proto.add_image();
+    image_proto->set_name(image_name);
+  }
+  if (image_proto->version() != cache_image_version_) {
+    // drop the entries of an older build of the image
+    image_proto->clear_entry();
+    image_proto->clear_num_lookups();
+    image_proto->clear_num_hits();
+    image_proto->set_version(cache_image_version_);
+  }
+  image_proto->set_num_lookups(image_proto->num_lookups() + cache_lookups_);
+  image_proto->set_num_hits(image_proto->num_hits() + cache_hits_);
+  for (int j = 0; j < image_proto->entry_size(); j++) {
+    ChessStateCacheProto::EntryProto *entry_proto
+        = image_proto->mutable_entry(j);
+    StateCache::iterator eit = explored.find(entry_proto->hash_val());
+    if (eit != explored.end()) {
+      if (eit->second > entry_proto->budget())
+        entry_proto->set_budget(eit->second);
+      explored.erase(eit);
+    }
+  }
+  for (StateCache::iterator eit = explored.begin();
+       eit != explored.end(); ++eit) {
+    ChessStateCacheProto::EntryProto *entry_proto = image_proto->add_entry();
+    entry_proto->set_hash_val(eit->first);
+    entry_proto->set_budget(eit->second);
+  }
+
+  // write to a temporary file first, so readers never see half a file
+  std::stringstream tmp_path_ss;
+  tmp_path_ss << cache_path_ << ".tmp." << std::dec << getpid();
+  std::fstream out(tmp_path_ss.str().c_str(),
+                   std::ios::out | std::ios::trunc | std::ios::binary);
+  cache_proto.SerializeToOstream(&out);
+  out.close();
+  rename(tmp_path_ss.str().c_str(), cache_path_.c_str());
+}
+
+void ChessScheduler::CacheUpdate(Action *next_action) {
+  DEBUG_ASSERT(cache_enable_);
+  // skip transparent actions
+  if (!next_action->obj())
+    return;
+  // the state is the multiset of the actions taken
+  curr_cache_hash_ += CacheHash(next_action);
+}
+
+bool ChessScheduler::CacheVisited(Action *next_action) {
+  DEBUG_ASSERT(cache_enable_);
+  // skip transparent actions
+  if (!next_action->obj())
+    return false;
+  cache_hash_t new_hash_val = curr_cache_hash_ + CacheHash(next_action);
+  int new_preemptions = curr_preemptions_;
+  if (IsPreemptiveChoice(next_action))
+    new_preemptions += 1;
+  cache_lookups_ += 1;
+  // the state is pruned if it has been explored with at least the
+  // same number of preemptions left
+  StateCache::iterator it = state_cache_.find(new_hash_val);
+  if (it != state_cache_.end() &&
+      it->second >= CacheBudget(new_preemptions)) {
+    cache_hits_ += 1;
+    return true;
+  }
+  return false;
+}
+
+int ChessScheduler::CacheBudget(int preemptions) {
+  if (pb_enable_)
+    return pb_limit_ - preemptions;
+  else
+    return INT_MAX;
+}
+
+ChessScheduler::cache_hash_t ChessScheduler::CacheHash(Action *action) {
+  DEBUG_ASSERT(action->obj() && action->inst());
+  // the uids and inst ids are local to the databases of a search, use
+  // the signatures, which are the same in any search of the image
+  cache_hash_t hash_val = CacheMix(action->thd()->Signature());
+  hash_val = CacheMix(hash_val ^ action->obj()->Signature());
+  hash_val = CacheMix(hash_val ^ action->op());
+  hash_val = CacheMix(hash_val ^ InstSignature(action->inst()));
+  hash_val = CacheMix(hash_val ^ action->tc());
+  hash_val = CacheMix(hash_val ^ action->oc());
+  return hash_val;
+}
+
+std::string ChessScheduler::CacheImageName() {
+  Image *image = main_image();
+  if (image)
+    return image->name();
+  else
+    return PSEUDO_IMAGE_NAME;
+}
+
+uint64 ChessScheduler::CacheImageVersion() {
+  // FNV-1a of the content of the main image, 0 if it cannot be read
+  std::fstream in(CacheImageName().c_str(), std::ios::in | std::ios::binary);
+  if (!in.is_open())
+    return 0;
+  uint64 hash_val = 0xcbf29ce484222325ULL;
+  char buf[65536];
+  while (in.read(buf, sizeof(buf)) || in.gcount() > 0) {
+    std::streamsize size = in.gcount();
+    for (std::streamsize i = 0; i < size; i++) {
+      hash_val ^= (unsigned char)buf[i];
+      hash_val *= 0x100000001b3ULL;
+    }
+  }
+  in.close();
+  return hash_val;
+}
+
 } // namespace systematic
 
@@ -57,6 +57,14 @@ class ChessScheduler : public Scheduler {
   // can be lazy (demand driven)
   typedef std::tr1::unordered_map<int, Execution *> ExecutionTable;
 
+  // define the state cache, which persists across searches. it maps
+  // the hash of an explored state to the preemption budget with which
+  // its subtree has been explored. the hash here is a stronger one than
+  // the one used for partial order reduction since the states are not
+  // checked against past executions
+  typedef uint64 cache_hash_t;
+  typedef std::tr1::unordered_map<cache_hash_t, int> StateCache;
+
   // define a visited state (used for partial order reduction)
   class VisitedState {
    public:
@@ -111,12 +119,24 @@ class ChessScheduler : public Scheduler {
   void PorSave();
   void PorPrepareDir();
 
+  // state cache related
+  void CacheInit();
+  void CacheFini();
+  void CacheUpdate(Action *next_action);
+  bool CacheVisited(Action *next_action);
+  int CacheBudget(int preemptions);
+  cache_hash_t CacheHash(Action *action);
+  std::string CacheImageName();
+  uint64 CacheImageVersion();
+
   // settings and flags
   bool fair_enable_; // whether use the fair control module
   bool pb_enable_; // whether bound the number of preemptions
   bool por_enable_; // whether perform sleep-set based por
   int pb_limit_; // the bound of the number of preemptions
   std::string por_info_path_; // the dir storing por information
+  bool cache_enable_; // whether prune with the persistent state cache
+  std::string cache_path_; // the file storing the state cache
 
   // global analysis states
   bool useless_;
@@ -140,6 +160,15 @@ class ChessScheduler : public Scheduler {
   ExecutionTable loaded_execs_; // in-memory past executions
   int curr_exec_id_;
 
+  // state cache related
+  cache_hash_t curr_cache_hash_;
+  StateCache state_cache_;
+  std::vector<cache_hash_t> node_cache_hash_; // the state at each node
+  std::vector<int> node_preemptions_;
+  uint64 cache_image_version_; // the content hash of the main image
+  uint64 cache_lookups_;
+  uint64 cache_hits_;
+
  private:
   DISALLOW_COPY_CONSTRUCTORS(ChessScheduler);
 };
@@ -41,6 +41,7 @@ Controller::Controller()
     : scheduler_(NULL),
       program_(NULL),
       execution_(NULL),
+      main_image_(NULL),
       race_db_(NULL),
       unit_size_(4),
       scheduler_thd_uid_(INVALID_PIN_THREAD_UID),
@@ -251,6 +252,9 @@ void Controller::HandleProgramExit() {
 }
 
 void Controller::HandleImageLoad(IMG img, Image *image) {
+  if (IMG_IsMainExecutable(img))
+    main_image_ = image;
+
   address_t low_addr = IMG_LowAddress(img);
   address_t high_addr = IMG_HighAddress(img);
   address_t data_start = 0;
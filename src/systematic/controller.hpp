@@ -204,6 +204,7 @@ class Controller : public ExecutionControl, public ControllerInterface {
   StaticInfo *GetStaticInfo() { return sinfo_; }
   Program *GetProgram() { return program_; }
   Execution *GetExecution() { return execution_; }
+  Image *GetMainImage() { return main_image_; }
   void SemWait(Semaphore *sem);
   void SemPost(Semaphore *sem);
   void SetAffinity();
@@ -230,6 +231,7 @@ class Controller : public ExecutionControl, public ControllerInterface {
   ChessScheduler *chess_scheduler_;
   Program *program_; // the modeled program
   Execution *execution_; // the current execution of the modeled program
+  Image *main_image_; // the image of the main executable
   race::RaceDB *race_db_;
   bool sched_app_; // whether only care about ops in the application
   bool sched_race_; // whether schedule racy memory operations
@@ -24,6 +24,63 @@
 
 namespace systematic {
 
+static inline uint64 SignatureMix(uint64 val) {
+  // the finalizer of MurmurHash3
+  val ^= val >> 33;
+  val *= 0xff51afd7ed558ccdULL;
+  val ^= val >> 33;
+  val *= 0xc4ceb9fe1a85ec53ULL;
+  val ^= val >> 33;
+  return val;
+}
+
+static uint64 ImageSignature(Image *image) {
+  // FNV-1a of the image name
+  uint64 val = 0xcbf29ce484222325ULL;
+  const std::string &name = image->name();
+  for (size_t i = 0; i < name.size(); i++) {
+    val ^= (unsigned char)name[i];
+    val *= 0x100000001b3ULL;
+  }
+  return val;
+}
+
+uint64 InstSignature(Inst *inst) {
+  return SignatureMix(ImageSignature(inst->image()) ^
+                      SignatureMix((uint64)inst->offset()));
+}
+
+uint64 Thread::Signature() {
+  // by the chain of creators, threads are created in the same order
+  if (!signature_) {
+    uint64 val = 1;
+    if (creator_)
+      val = SignatureMix(creator_->Signature() ^ SignatureMix(creator_idx_ + 2));
+    signature_ = val ? val : 1;
+  }
+  return signature_;
+}
+
+uint64 Object::Signature() {
+  if (!signature_) {
+    uint64 val = ComputeSignature();
+    signature_ = val ? val : 1;
+  }
+  return signature_;
+}
+
+uint64 SObject::ComputeSignature() {
+  uint64 val = SignatureMix(ImageSignature(image_) ^ 0x5);
+  return SignatureMix(val ^ (uint64)offset_);
+}
+
+uint64 DObject::ComputeSignature() {
+  uint64 val = SignatureMix(creator_->Signature() ^ 0xd);
+  val = SignatureMix(val ^ InstSignature(creator_inst_));
+  val = SignatureMix(val ^ (uint64)creator_idx_);
+  return SignatureMix(val ^ (uint64)offset_);
+}
+
 Thread::hash_val_t Thread::Hash() {
   hash_val_t hash_val = 0;
   if (creator_)
@@ -35,6 +35,10 @@ namespace systematic {
 class Program;
 class Execution;
 
+// return an identifier of an inst that does not depend on the static
+// info database it is stored in (by image name and offset)
+uint64 InstSignature(Inst *inst);
+
 // a thread identifier
 class Thread {
  public:
@@ -47,12 +51,14 @@ class Thread {
   typedef std::tr1::unordered_map<hash_val_t, Vec> HashMap;
 
   uid_t uid() { return uid_; }
+  uint64 Signature();
 
  protected:
   Thread()
       : uid_(0),
         creator_(NULL),
-        creator_idx_(0) {}
+        creator_idx_(0),
+        signature_(0) {}
 
   ~Thread() {}
 
@@ -63,6 +69,7 @@ class Thread {
   uid_t uid_;         // the unique identifier across runs
   Thread *creator_;   // the thread that creates it
   idx_t creator_idx_; // the idx-th thread that is created by creator
+  uint64 signature_;  // cached, 0 if not computed yet
 
  private:
   friend class Program;
@@ -81,15 +88,18 @@ class Object {
   typedef std::tr1::unordered_map<hash_val_t, Vec> HashMap;
 
   uid_t uid() { return uid_; }
+  uint64 Signature();
 
  protected:
-  Object() : uid_(0) {}
+  Object() : uid_(0), signature_(0) {}
   virtual ~Object() {}
 
   virtual hash_val_t Hash() = 0;
   virtual bool Match(Object *obj) = 0;
+  virtual uint64 ComputeSignature() = 0;
 
   uid_t uid_;         // the unique identifier across runs
+  uint64 signature_;  // cached, 0 if not computed yet
 
  private:
   friend class Program;
@@ -105,6 +115,7 @@ class SObject : public Object {
 
   hash_val_t Hash();
   bool Match(Object *obj);
+  uint64 ComputeSignature();
 
   Image *image_;      // the image that contains the object
   address_t offset_;  // the offset in the image
@@ -128,6 +139,7 @@ class DObject : public Object {
 
   hash_val_t Hash();
   bool Match(Object *obj);
+  uint64 ComputeSignature();
 
   Thread *creator_;     // the thread that creates it
   Inst *creator_inst_;  // the inst. that creates the object
@@ -34,6 +34,7 @@ class ControllerInterface {
   virtual StaticInfo *GetStaticInfo() = 0;
   virtual Program *GetProgram() = 0;
   virtual Execution *GetExecution() = 0;
+  virtual Image *GetMainImage() = 0;
   virtual State *Execute(State *state, Action *action) = 0;
 
  protected:
@@ -64,6 +65,7 @@ class Scheduler {
   StaticInfo *sinfo() { return controller_->GetStaticInfo(); }
   Program *program() { return controller_->GetProgram(); }
   Execution *execution() { return controller_->GetExecution(); }
+  Image *main_image() { return controller_->GetMainImage(); }
 
  protected:
   State *Execute(State *state, Action *action); // should not be override
@@ -19,6 +19,7 @@
 
 #include "systematic/search.h"
 
+#include <cstdio>
 #include <sstream>
 #include "core/logging.h"
 
@@ -115,6 +116,10 @@ void SearchInfo::UpdateForNext() {
     SearchNode *node = stack_.back();
     if (!node->Finished())
       break;
+    // the subtree of the parent is not entirely explored here either
+    if (node->partial_ && node->idx_ > 0)
+      stack_[node->idx_ - 1]->partial_ = true;
+    popped_.push_back(node);
     stack_.pop_back();
   }
   if (stack_.empty())
@@ -160,6 +165,7 @@ void SearchInfo::Load(const std::string &db_name,
     // load sel
     node->sel_ = program->FindThread(node_proto->sel());
     DEBUG_ASSERT(node->sel_);
+    node->partial_ = node_proto->partial();
     // load backtrack set
     for (int j = 0; j < node_proto->backtrack_size(); j++) {
       Thread *thd = program->FindThread(node_proto->backtrack(j));
@@ -201,6 +207,8 @@ void SearchInfo::Save(const std::string &db_name,
     SearchNodeProto *node_proto = info_proto.add_node();
     // save sel
     node_proto->set_sel(node->sel_->uid());
+    if (node->partial_)
+      node_proto->set_partial(true);
     // save backtrack
     for (Thread::Set::iterator bit = node->backtrack_.begin();
          bit != node->backtrack_.end(); ++bit) {
@@ -231,6 +239,36 @@ void SearchInfo::Save(const std::string &db_name,
                    std::ios::out | std::ios::trunc | std::ios::binary);
   info_proto.SerializeToOstream(&out);
   out.close();
+  // save the progress record
+  SaveProgress(db_name);
+}
+
+void SearchInfo::SaveProgress(const std::string &db_name) {
+  // a fixed size record next to the search database, so that the
+  // progress can be checked without parsing the search stack:
+  // done, num_runs, depth and the number of pending backtracks
+  uint32 pending = 0;
+  for (SearchNode::Vec::iterator it = stack_.begin(); it != stack_.end(); ++it){
+    SearchNode *node = *it;
+    for (Thread::Set::iterator bit = node->backtrack_.begin();
+         bit != node->backtrack_.end(); ++bit) {
+      if (!node->IsDone(*bit))
+        pending++;
+    }
+  }
+  uint32 record[4];
+  record[0] = done_ ? 1 : 0;
+  record[1] = (uint32)num_runs_;
+  record[2] = (uint32)stack_.size();
+  record[3] = pending;
+  // write to a temporary file first, so readers never see half a record
+  std::string progress_name = db_name + ".progress";
+  std::string tmp_name = progress_name + ".tmp";
+  std::fstream out(tmp_name.c_str(),
+                   std::ios::out | std::ios::trunc | std::ios::binary);
+  out.write((const char *)record, sizeof(record));
+  out.close();
+  rename(tmp_name.c_str(), progress_name.c_str());
 }
 
 bool SearchInfo::CheckDivergence(SearchNode *node, State *state) {
@@ -78,10 +78,11 @@ class SearchNode {
 
   Thread *sel() { return sel_; }
   size_t idx() { return idx_; }
+  bool partial() { return partial_; }
   void set_sel(Thread *thd) { sel_ = thd; }
 
  protected:
-  SearchNode() : info_(NULL), idx_(0) {}
+  SearchNode() : info_(NULL), idx_(0), partial_(false) {}
   ~SearchNode() {}
 
   SearchInfo *info_;
@@ -90,6 +91,7 @@ class SearchNode {
   Thread::Set backtrack_;
   Thread::Set done_;
   ActionInfo::Map enabled_; // used for divergence check
+  bool partial_; // whether part of the subtree is explored elsewhere
 
  private:
   friend class SearchInfo;
@@ -105,6 +107,7 @@ class SearchInfo {
 
   bool Done() { return done_; }
   size_t StackSize() { return stack_.size(); }
+  SearchNode::Vec *Popped() { return &popped_; } // finished in last update
   SearchNode *GetNextNode(State *state); // create a new node if needed
   SearchNode *Prev(SearchNode *node);
   SearchNode *Next(SearchNode *node);
@@ -115,10 +118,12 @@ class SearchInfo {
  protected:
   // helper functions
   bool CheckDivergence(SearchNode *node, State *state);
+  void SaveProgress(const std::string &db_name);
 
   bool done_;
   int num_runs_;
   SearchNode::Vec stack_;
+  SearchNode::Vec popped_;
   size_t cursor_;
 
  private:
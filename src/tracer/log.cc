@@ -19,7 +19,10 @@
 #include "tracer/log.h"
 
 #include <cassert>
+#include <map>
+#include <set>
 #include <time.h>
+#include <zlib.h>
 #include <sys/stat.h>
 #include <sys/types.h>
 #include "core/logging.h"
@@ -31,8 +34,10 @@ namespace tracer {
 TraceLog::TraceLog(const std::string &path)
     : path_(path),
       mode_(OP_MODE_INVALID),
+      codec_(LOG_CODEC_RAW),
       meta_(NULL),
       curr_slice_(NULL),
+      index_(NULL),
       entry_cursor_(0),
       has_next_(false) {
   // empty
@@ -53,14 +58,9 @@ void TraceLog::OpenForRead() {
   meta_->ParseFromIstream(&meta_in);
   meta_in.close();
   // read the first slice
-  std::stringstream slice_ss;
-  slice_ss << path_ << "/1";
-  std::fstream slice_in;
-  slice_in.open(slice_ss.str().c_str(), std::ios::in | std::ios::binary);
-  assert(slice_in.is_open());
   curr_slice_ = new LogSliceProto;
-  curr_slice_->ParseFromIstream(&slice_in);
-  slice_in.close();
+  bool res = ReadSlice(1);
+  assert(res);
   DEBUG_ASSERT(meta_->uid() == curr_slice_->uid());
   // set cursor
   entry_cursor_ = 0;
@@ -78,10 +78,14 @@ void TraceLog::OpenForWrite() {
   meta_ = new LogMetaProto;
   meta_->set_uid(uid);
   meta_->set_slice_count(1);
+  meta_->set_codec(codec_);
   // create the current slice
   curr_slice_ = new LogSliceProto;
   curr_slice_->set_uid(uid);
   curr_slice_->set_slice_no(meta_->slice_count());
+  // create the index
+  index_ = new LogIndexProto;
+  index_->set_uid(uid);
 }
 
 void TraceLog::CloseForRead() {
@@ -92,14 +96,17 @@ void TraceLog::CloseForRead() {
 
 void TraceLog::CloseForWrite() {
   // write the current slice
-  std::stringstream slice_ss;
-  slice_ss << path_ << "/" << std::dec << curr_slice_->slice_no();
-  std::fstream slice_out;
-  slice_out.open(slice_ss.str().c_str(),
+  WriteSlice();
+  // write index
+  std::stringstream index_ss;
+  index_ss << path_ << "/index";
+  std::fstream index_out;
+  index_out.open(index_ss.str().c_str(),
                  std::ios::out | std::ios::trunc | std::ios::binary);
-  assert(slice_out.is_open());
-  curr_slice_->SerializeToOstream(&slice_out);
-  slice_out.close();
+  assert(index_out.is_open());
+  index_->SerializeToOstream(&index_out);
+  index_out.close();
+  index_->Clear();
   // write meta
   std::stringstream meta_ss;
   meta_ss << path_ << "/meta";
@@ -148,14 +155,7 @@ void TraceLog::SwitchSliceForRead() {
   uint32 curr_slice_no = curr_slice_->slice_no();
   uint32 next_slice_no = curr_slice_no + 1;
   curr_slice_->Clear();
-  // check whether the slice exists
-  std::stringstream slice_ss;
-  slice_ss << path_ << "/" << std::dec << next_slice_no;
-  std::fstream slice_in;
-  slice_in.open(slice_ss.str().c_str(), std::ios::in | std::ios::binary);
-  if (slice_in.is_open()) {
-    curr_slice_->ParseFromIstream(&slice_in);
-    slice_in.close();
+  if (ReadSlice(next_slice_no)) {
     DEBUG_ASSERT(curr_slice_->entry_size());
     entry_cursor_ = 0;
     has_next_ = true;
@@ -169,19 +169,152 @@ void TraceLog::SwitchSliceForWrite() {
   uint32 curr_slice_no = curr_slice_->slice_no();
   uint32 next_slice_no = curr_slice_no + 1;
   // save the current slice
+  WriteSlice();
+  curr_slice_->Clear();
+  // create the new slice
+  curr_slice_->set_uid(meta_->uid());
+  curr_slice_->set_slice_no(next_slice_no);
+  meta_->set_slice_count(next_slice_no);
+}
+
+bool TraceLog::ReadSlice(uint32 slice_no) {
+  std::stringstream slice_ss;
+  slice_ss << path_ << "/" << std::dec << slice_no;
+  std::fstream slice_in;
+  slice_in.open(slice_ss.str().c_str(), std::ios::in | std::ios::binary);
+  if (!slice_in.is_open())
+    return false;
+  if (meta_->codec() == LOG_CODEC_RAW) {
+    curr_slice_->ParseFromIstream(&slice_in);
+    slice_in.close();
+    return true;
+  }
+  std::stringstream data_ss;
+  data_ss << slice_in.rdbuf();
+  slice_in.close();
+  std::string data = data_ss.str();
+  assert(data.size() >= 8);
+  uLongf size = 0;
+  for (int i = 7; i >= 0; i--)
+    size = (size << 8) | (unsigned char)data[i];
+  std::string raw(size, '\0');
+  int res = uncompress((Bytef *)&raw[0], &size,
+                       (const Bytef *)data.data() + 8, data.size() - 8);
+  assert(res == Z_OK);
+  curr_slice_->ParseFromString(raw);
+  DecodeSlice();
+  return true;
+}
+
+void TraceLog::WriteSlice() {
+  DEBUG_ASSERT(mode_ == OP_MODE_WRITE);
+  IndexSlice();
   std::stringstream slice_ss;
-  slice_ss << path_ << "/" << std::dec << curr_slice_no;
+  slice_ss << path_ << "/" << std::dec << curr_slice_->slice_no();
   std::fstream slice_out;
   slice_out.open(slice_ss.str().c_str(),
                  std::ios::out | std::ios::trunc | std::ios::binary);
   assert(slice_out.is_open());
-  curr_slice_->SerializeToOstream(&slice_out);
+  if (meta_->codec() == LOG_CODEC_RAW) {
+    curr_slice_->SerializeToOstream(&slice_out);
+  } else {
+    EncodeSlice();
+    std::string raw;
+    curr_slice_->SerializeToString(&raw);
+    uLongf size = compressBound(raw.size());
+    std::string data(8 + size, '\0');
+    for (int i = 0; i < 8; i++)
+      data[i] = (char)((uint64)raw.size() >> (i * 8));
+    // favor speed, the recorder is on the critical path
+    int res = compress2((Bytef *)&data[8], &size,
+                        (const Bytef *)raw.data(), raw.size(), Z_BEST_SPEED);
+    assert(res == Z_OK);
+    slice_out.write(data.data(), 8 + size);
+  }
   slice_out.close();
-  curr_slice_->Clear();
-  // create the new slice
-  curr_slice_->set_uid(meta_->uid());
-  curr_slice_->set_slice_no(next_slice_no);
-  meta_->set_slice_count(next_slice_no);
+}
+
+void TraceLog::EncodeSlice() {
+  std::map<thread_id_t, timestamp_t> last_clk_map;
+  std::map<uint32, uint32> inst_index_map;
+  for (int i = 0; i < curr_slice_->entry_size(); i++) {
+    LogEntryProto *entry_proto = curr_slice_->mutable_entry(i);
+    if (entry_proto->has_thd_id() && entry_proto->has_thd_clk()) {
+      timestamp_t &last_clk = last_clk_map[entry_proto->thd_id()];
+      timestamp_t clk = entry_proto->thd_clk();
+      entry_proto->set_thd_clk(clk - last_clk);
+      last_clk = clk;
+    }
+    if (entry_proto->has_inst_id()) {
+      std::map<uint32, uint32>::iterator it
+          = inst_index_map.find(entry_proto->inst_id());
+      if (it == inst_index_map.end()) {
+        uint32 index = curr_slice_->inst_dict_size();
+        curr_slice_->add_inst_dict(entry_proto->inst_id());
+        it = inst_index_map.insert(
+            std::make_pair(entry_proto->inst_id(), index)).first;
+      }
+      entry_proto->set_inst_id(it->second);
+    }
+  }
+}
+
+void TraceLog::DecodeSlice() {
+  std::map<thread_id_t, timestamp_t> last_clk_map;
+  for (int i = 0; i < curr_slice_->entry_size(); i++) {
+    LogEntryProto *entry_proto = curr_slice_->mutable_entry(i);
+    if (entry_proto->has_thd_id() && entry_proto->has_thd_clk()) {
+      timestamp_t &last_clk = last_clk_map[entry_proto->thd_id()];
+      last_clk += entry_proto->thd_clk();
+      entry_proto->set_thd_clk(last_clk);
+    }
+    if (entry_proto->has_inst_id())
+      entry_proto->set_inst_id(curr_slice_->inst_dict(entry_proto->inst_id()));
+  }
+  curr_slice_->clear_inst_dict();
+}
+
+void TraceLog::IndexSlice() {
+  // entries are filled in after NewEntry returns, so a slice is
+  // indexed when it is written
+  typedef std::map<thread_id_t, std::pair<timestamp_t, timestamp_t> > ClkMap;
+  ClkMap clk_map;
+  std::set<uint32> inst_set;
+  std::set<uint32> type_set;
+  for (int i = 0; i < curr_slice_->entry_size(); i++) {
+    const LogEntryProto &entry_proto = curr_slice_->entry(i);
+    type_set.insert(entry_proto.type());
+    if (entry_proto.has_inst_id())
+      inst_set.insert(entry_proto.inst_id());
+    if (entry_proto.has_thd_id() && entry_proto.has_thd_clk()) {
+      timestamp_t clk = entry_proto.thd_clk();
+      ClkMap::iterator it = clk_map.find(entry_proto.thd_id());
+      if (it == clk_map.end()) {
+        clk_map[entry_proto.thd_id()] = std::make_pair(clk, clk);
+      } else {
+        if (clk < it->second.first)
+          it->second.first = clk;
+        if (clk > it->second.second)
+          it->second.second = clk;
+      }
+    }
+  }
+  LogSliceIndexProto *slice_index = index_->add_slice();
+  slice_index->set_slice_no(curr_slice_->slice_no());
+  for (ClkMap::iterator it = clk_map.begin(); it != clk_map.end(); ++it) {
+    LogThreadIndexProto *thread_index = slice_index->add_thread();
+    thread_index->set_thd_id(it->first);
+    thread_index->set_min_clk(it->second.first);
+    thread_index->set_max_clk(it->second.second);
+  }
+  for (std::set<uint32>::iterator it = inst_set.begin();
+       it != inst_set.end(); ++it) {
+    slice_index->add_inst_id(*it);
+  }
+  for (std::set<uint32>::iterator it = type_set.begin();
+       it != type_set.end(); ++it) {
+    slice_index->add_type(*it);
+  }
 }
 
 void TraceLog::PrepareDirForRead() {
@@ -106,6 +106,7 @@ class TraceLog {
   bool HasNextEntry();
   LogEntry NextEntry();
   LogEntry NewEntry();
+  void set_codec(LogCodec codec) { codec_ = codec; }
 
  protected:
   typedef enum {
@@ -117,13 +118,20 @@ class TraceLog {
   trace_log_uid_t GenUid();
   void SwitchSliceForRead();
   void SwitchSliceForWrite();
+  bool ReadSlice(uint32 slice_no);
+  void WriteSlice();
+  void IndexSlice();
+  void EncodeSlice();
+  void DecodeSlice();
   void PrepareDirForRead();
   void PrepareDirForWrite();
 
   std::string path_;
   OpMode mode_;
+  LogCodec codec_;
   LogMetaProto *meta_;
   LogSliceProto *curr_slice_;
+  LogIndexProto *index_;
   int entry_cursor_;
   bool has_next_;
 
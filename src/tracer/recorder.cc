@@ -37,6 +37,7 @@ void RecorderAnalyzer::Register() {
   knob_->RegisterBool("trace_malloc", "whether record memory allocation function", "1");
   knob_->RegisterBool("trace_syscall", "whether record system calls", "1");
   knob_->RegisterBool("trace_track_clk", "whether track per thread clockk", "1");
+  knob_->RegisterStr("trace_log_codec", "the trace slice encoding (raw or zlib)", "raw");
 }
 
 bool RecorderAnalyzer::Enabled() {
@@ -64,6 +65,8 @@ void RecorderAnalyzer::Setup(Mutex *lock) {
 
   // create trace log and open it
   trace_log_ = new TraceLog(knob_->ValueStr("trace_log_path"));
+  if (knob_->ValueStr("trace_log_codec") == "zlib")
+    trace_log_->set_codec(LOG_CODEC_ZLIB);
 }
 
 } // namespace tracer